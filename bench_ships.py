@@ -0,0 +1,105 @@
+# bench_ships.py
+# Spawn cost and memory per ship sprite: the old per-ship Surface + __dict__ model against the
+# slotted ShipState with shared hull images (sprite_atlas). Runs headless.
+#   python bench_ships.py [ship count]
+import os
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import pygame
+
+from port_engine import ShipState, SHIP_WIDTH, SHIP_HEIGHT, ZONE_OPEN_SEA
+from sprite_atlas import ShipImageAtlas, SIZE_CLASSES
+
+BLUE = (0, 0, 200)
+DARK_GREY = (100, 100, 100)
+WHITE = (255, 255, 255)
+
+
+class LegacyShip(pygame.sprite.DirtySprite):
+    """The previous ship sprite: open __dict__ state and its own Surface with the label rendered in."""
+    def __init__(self, ship_id, name, arrival_time, size, unloading_time, start_x, start_y, initial_speed, font):
+        super().__init__()
+        self.ship_id = ship_id
+        self.name = name
+        self.arrival_time = arrival_time
+        self.size = size
+        self.unloading_time = unloading_time
+        self.x = start_x
+        self.y = start_y
+        self.width = SHIP_WIDTH
+        self.height = SHIP_HEIGHT
+        self.original_pos = (start_x, start_y)
+        self.current_speed_kmh = initial_speed
+        self.current_zone = ZONE_OPEN_SEA
+        self.parked_terminal = None
+        self.is_dragging = False
+        self.heading = None
+        self.last_dist_to_port_center = None
+        self.movement_direction = None
+        self.drawn_position = None
+        self.image = pygame.Surface((self.width, self.height))
+        self.image.fill(BLUE)
+        pygame.draw.rect(self.image, DARK_GREY, (0, 0, self.width, self.height), 2)
+        text_surface = font.render(f"ID:{self.ship_id}", True, WHITE)
+        self.image.blit(text_surface, text_surface.get_rect(center=(self.width // 2, self.height // 2)))
+        self.offset_x = 0
+        self.offset_y = 0
+        self.is_selected_for_edit = False
+
+
+class AtlasShip(ShipState, pygame.sprite.DirtySprite):
+    """Same layout as ship_data.Ship: slotted state, hull image shared from the atlas."""
+    __slots__ = ("drawn_position", "offset_x", "offset_y", "is_selected_for_edit")
+    atlas = None
+
+    def __init__(self, ship_id, name, arrival_time, size, unloading_time, start_x, start_y, initial_speed):
+        ShipState.__init__(self, ship_id, name, arrival_time, size, unloading_time, start_x, start_y, initial_speed)
+        pygame.sprite.DirtySprite.__init__(self)
+        self.drawn_position = None
+        self.offset_x = 0
+        self.offset_y = 0
+        self.is_selected_for_edit = False
+
+    @property
+    def image(self):
+        return self.atlas.hull(self.size)
+
+
+def measure(label, make_ship, count, pixel_bytes_per_ship):
+    """Builds count ships; returns (microseconds per ship, bytes per ship)."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    ships = [make_ship(i) for i in range(count)]
+    elapsed = time.perf_counter() - started
+    python_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    per_ship_us = elapsed * 1e6 / count
+    per_ship_bytes = python_bytes / count + pixel_bytes_per_ship # SDL pixel buffers are invisible to tracemalloc
+    print(f"{label:<8} {per_ship_us:8.1f} us/ship {per_ship_bytes:10,.0f} bytes/ship")
+    del ships
+    return per_ship_us, per_ship_bytes
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    font = pygame.font.Font(None, 24)
+    AtlasShip.atlas = ShipImageAtlas(SHIP_WIDTH, SHIP_HEIGHT, BLUE, DARK_GREY, font, WHITE)
+    AtlasShip.atlas.convert()
+
+    print(f"{count} ships")
+    legacy_pixels = SHIP_WIDTH * SHIP_HEIGHT * pygame.Surface((SHIP_WIDTH, SHIP_HEIGHT)).get_bytesize()
+    legacy = measure("legacy", lambda i: LegacyShip(i, f"Ship-{i}", None, SIZE_CLASSES[i % 3], 8, 0, 0, 50, font),
+                     count, legacy_pixels)
+    atlas = measure("atlas", lambda i: AtlasShip(i, f"Ship-{i}", None, SIZE_CLASSES[i % 3], 8, 0, 0, 50),
+                    count, 0)
+    print(f"spawn {legacy[0] / atlas[0]:.1f}x faster, {legacy[1] / atlas[1]:.1f}x less memory per ship")
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
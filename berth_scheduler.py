@@ -0,0 +1,187 @@
+# berth_scheduler.py
+# Berth plan for the queued ships: which terminal slot each ship gets and when, keeping total waiting time low.
+import bisect # For the arrival-sorted pending list and checkpoint lookup
+import datetime
+import heapq # Berth free-time heap and ready-ship heap
+
+CHECKPOINT_INTERVAL = 256 # Decisions between saved sweep states (for incremental re-planning)
+
+
+def to_seconds(value):
+    """datetime or POSIX seconds -> POSIX seconds."""
+    return value.timestamp() if isinstance(value, datetime.datetime) else float(value)
+
+
+class BerthScheduler:
+    """
+    Plans berths for ships that have not docked yet, from their arrival_time and unloading_time.
+
+    Heap-based event sweep: a heap of berth free times decides when the next berth opens; every ship
+    that has arrived by then is moved into a ready heap, and the ready ship with the shortest
+    unloading time gets the berth (shortest-processing-time first keeps total waiting low).
+    O(n log n) for n ships.
+
+    Changes only mark the plan stale from the earliest affected time; the next read resumes the sweep
+    from the last saved checkpoint before that time instead of planning from scratch.
+    """
+    def __init__(self, terminals, start_time=None):
+        self._berth_order = [] # (terminal_id, slot), in terminal order
+        for terminal in terminals:
+            for slot in range(max(1, terminal.get('capacity', 1))):
+                self._berth_order.append((terminal['id'], slot))
+        self._busy_until = {} # (terminal_id, slot) -> seconds when the docked ship there leaves
+        self._start_time = to_seconds(start_time) if start_time is not None else None
+
+        self._ships = {} # ship_id -> (name, arrival seconds, unloading seconds)
+        self._pending = [] # Sorted (arrival seconds, ship_id)
+
+        self._assignments = [] # (ship_id, terminal_id, slot, arrival, start, end), in decision order
+        self._planned = {} # ship_id -> index into _assignments
+        self._checkpoint_times = [] # Clock before each checkpoint's decision (non-decreasing)
+        self._checkpoints = [] # (assignment count, pending index, ready heap, berth heap, clock, total wait)
+        self._total_wait = 0.0
+        self._stale_from = float("-inf") # Plan is valid for decisions before this time; +inf = up to date
+        self.replans = 0
+        self.resumed_decisions = 0 # Decisions kept from a checkpoint instead of recomputed
+
+    # --- Inputs ---
+    def set_ship(self, ship_id, name, arrival_time, unloading_hours):
+        """Adds a queued ship or updates its arrival/unloading time."""
+        arrival = to_seconds(arrival_time)
+        old = self._ships.get(ship_id)
+        if old is not None:
+            if old[1] == arrival and old[2] == unloading_hours * 3600:
+                self._ships[ship_id] = (name, arrival, old[2])
+                return
+            self._remove_pending(ship_id, old[1])
+            self._mark_stale(min(old[1], arrival))
+        else:
+            self._mark_stale(arrival)
+        self._ships[ship_id] = (name, arrival, unloading_hours * 3600)
+        bisect.insort(self._pending, (arrival, ship_id))
+
+    def remove_ship(self, ship_id):
+        """Takes a ship out of the plan (it docked, or was deleted)."""
+        old = self._ships.pop(ship_id, None)
+        if old is not None:
+            self._remove_pending(ship_id, old[1])
+            self._mark_stale(old[1])
+
+    def set_berth_busy(self, terminal_id, slot, until):
+        """Marks a berth as held by a docked ship until the given time (None frees it)."""
+        if until is None:
+            self._busy_until.pop((terminal_id, slot), None)
+        else:
+            self._busy_until[(terminal_id, slot)] = to_seconds(until)
+        self._stale_from = float("-inf") # Berth availability changes everything
+
+    def set_start_time(self, start_time):
+        """Nothing is scheduled before this time (defaults to now when the plan is read)."""
+        self._start_time = to_seconds(start_time)
+        self._stale_from = float("-inf")
+
+    # --- Outputs ---
+    def plan_for(self, ship_id):
+        """The assignment dict for one ship, or None if it is not in the plan."""
+        self._ensure_plan()
+        index = self._planned.get(ship_id)
+        return None if index is None else self._assignment_dict(self._assignments[index])
+
+    def get_plan(self):
+        """All assignments, in start order."""
+        self._ensure_plan()
+        return [self._assignment_dict(assignment) for assignment in self._assignments]
+
+    def total_wait_minutes(self):
+        self._ensure_plan()
+        return self._total_wait / 60
+
+    def summary(self):
+        self._ensure_plan()
+        return {
+            "ships": len(self._assignments),
+            "berths": len(self._berth_order),
+            "total_wait_minutes": round(self._total_wait / 60, 1),
+            "max_wait_minutes": round(max((a[4] - a[3] for a in self._assignments), default=0) / 60, 1),
+            "replans": self.replans,
+            "resumed_decisions": self.resumed_decisions,
+        }
+
+    def _assignment_dict(self, assignment):
+        ship_id, terminal_id, slot, arrival, start, end = assignment
+        return {
+            "ship_id": ship_id,
+            "ship_name": self._ships[ship_id][0],
+            "terminal_id": terminal_id,
+            "slot": slot,
+            "arrival_time": datetime.datetime.fromtimestamp(arrival).isoformat(),
+            "start_time": datetime.datetime.fromtimestamp(start).isoformat(),
+            "end_time": datetime.datetime.fromtimestamp(end).isoformat(),
+            "wait_minutes": round((start - arrival) / 60, 1),
+        }
+
+    # --- Sweep ---
+    def _mark_stale(self, from_time):
+        self._stale_from = min(self._stale_from, from_time)
+
+    def _remove_pending(self, ship_id, arrival):
+        i = bisect.bisect_left(self._pending, (arrival, ship_id))
+        del self._pending[i]
+
+    def _initial_state(self):
+        start = self._start_time if self._start_time is not None else datetime.datetime.now().timestamp()
+        berths = [(max(start, self._busy_until.get(berth, start)), order, berth[0], berth[1])
+                  for order, berth in enumerate(self._berth_order)]
+        heapq.heapify(berths)
+        return (0, 0, [], berths, start, 0.0)
+
+    def _ensure_plan(self):
+        if self._stale_from == float("inf"):
+            return
+        # Resume from the last checkpoint taken before any affected ship could have been released
+        k = bisect.bisect_left(self._checkpoint_times, self._stale_from) - 1
+        if k < 0 or not self._checkpoints:
+            del self._checkpoints[:], self._checkpoint_times[:]
+            state = self._initial_state()
+        else:
+            del self._checkpoints[k + 1:], self._checkpoint_times[k + 1:]
+            state = self._checkpoints[k]
+            self.resumed_decisions += state[0]
+        self._sweep(state)
+        self._stale_from = float("inf")
+        self.replans += 1
+
+    def _sweep(self, state):
+        count, i, ready, berths, clock, total_wait = state
+        ready = list(ready) # Checkpoints keep their own copies
+        berths = list(berths)
+        for ship_id, *_ in self._assignments[count:]:
+            del self._planned[ship_id]
+        del self._assignments[count:]
+
+        pending = self._pending
+        ships = self._ships
+        assignments = self._assignments
+        planned = self._planned
+        while berths and (i < len(pending) or ready):
+            if count % CHECKPOINT_INTERVAL == 0 and (not self._checkpoints or self._checkpoints[-1][0] != count):
+                self._checkpoints.append((count, i, list(ready), list(berths), clock, total_wait))
+                self._checkpoint_times.append(clock)
+
+            free_time, order, terminal_id, slot = heapq.heappop(berths)
+            clock = max(clock, free_time) # Decisions happen in time order
+            if not ready and pending[i][0] > clock:
+                clock = pending[i][0] # Berth idles until the next ship arrives
+            while i < len(pending) and pending[i][0] <= clock:
+                arrival, ship_id = pending[i]
+                heapq.heappush(ready, (ships[ship_id][2], arrival, ship_id))
+                i += 1
+
+            duration, arrival, ship_id = heapq.heappop(ready) # Shortest unloading first
+            end = clock + duration
+            total_wait += clock - arrival
+            planned[ship_id] = count
+            assignments.append((ship_id, terminal_id, slot, arrival, clock, end))
+            count += 1
+            heapq.heappush(berths, (end, order, terminal_id, slot))
+        self._total_wait = total_wait
@@ -0,0 +1,269 @@
+# fleet.py
+# Struct-of-arrays fleet for large headless runs: one NumPy pass per tick instead of one Python call per ship.
+# Same rules as PortEngine.update_ship; PortEngine stays the per-object engine the pygame frontend drags around.
+import datetime
+
+import numpy as np
+
+from port_engine import (
+    PORT_X, PORT_Y, PORT_WIDTH, PORT_HEIGHT, PORT_CENTER_X, PORT_CENTER_Y,
+    RED_ZONE_DIST_PX, DARK_GREEN_ZONE_DIST_PX, LIGHT_GREEN_ZONE_DIST_PX,
+    ZONE_OPEN_SEA, ZONE_LIGHT_GREEN, ZONE_DARK_GREEN, ZONE_RED, ZONE_PARKED,
+    SHIP_WIDTH, SHIP_HEIGHT, PIXELS_PER_SECOND_PER_KMH,
+    build_terminals, make_event_payload, parked_position,
+)
+from terminals import TerminalManager
+
+# Zone codes stored in FleetArrays.zone; ZONE_NAMES maps them back to the names sent to the server
+ZONE_CODE_OPEN_SEA = 0
+ZONE_CODE_LIGHT_GREEN = 1
+ZONE_CODE_DARK_GREEN = 2
+ZONE_CODE_RED = 3
+ZONE_CODE_PARKED = 4
+ZONE_NAMES = (ZONE_OPEN_SEA, ZONE_LIGHT_GREEN, ZONE_DARK_GREEN, ZONE_RED, ZONE_PARKED)
+
+# Movement direction codes; DIRECTION_NAMES matches ShipState.movement_direction
+DIRECTION_NONE = 0
+DIRECTION_INCOMING = 1
+DIRECTION_OUTGOING = 2
+DIRECTION_NAMES = (None, "incoming", "outgoing")
+
+# Distance bands: searchsorted(ZONE_THRESHOLDS, dist) gives 0 for dist <= RED_ZONE_DIST_PX ... 3 for open sea
+ZONE_THRESHOLDS = np.array([RED_ZONE_DIST_PX, DARK_GREEN_ZONE_DIST_PX, LIGHT_GREEN_ZONE_DIST_PX], dtype=np.float64)
+BAND_ZONE_CODES = np.array([ZONE_CODE_RED, ZONE_CODE_DARK_GREEN, ZONE_CODE_LIGHT_GREEN, ZONE_CODE_OPEN_SEA], dtype=np.int8)
+OPEN_SEA_BAND = 3
+# Per band random speed target (km/h): capped to it near the port, raised to it in open sea
+BAND_SPEED_LOW = np.array([5, 15, 30, 40], dtype=np.float64)
+BAND_SPEED_HIGH = np.array([15, 30, 50, 70], dtype=np.float64)
+
+DIRECTION_THRESHOLD_PX = 1 # Distance change below this counts as stationary
+
+# FleetArrays columns: (attribute, dtype, fill value for unused rows)
+COLUMNS = (
+    ("ship_id", np.int64, 0),
+    ("x", np.float64, 0),
+    ("y", np.float64, 0),
+    ("speed", np.float64, 0),
+    ("heading_x", np.float64, 0), # (0, 0) = not steered by step()
+    ("heading_y", np.float64, 0),
+    ("zone", np.int8, 0),
+    ("direction", np.int8, 0),
+    ("last_dist", np.float64, np.nan), # NaN until the first step
+    ("parked_terminal", np.int32, 0),
+    ("dragging", np.bool_, False),
+    ("step_px", np.float64, 0), # Distance moved by the latest step()
+)
+
+
+def column_bytes(dtype, capacity):
+    """Bytes one column takes in a shared buffer (rounded up to 8 for alignment)."""
+    return -(-np.dtype(dtype).itemsize * capacity // 8) * 8
+
+
+class FleetArrays:
+    """
+    Fleet state as parallel arrays, one row per ship. Rows are dense: removing a ship moves the
+    last row into its slot, so row numbers are only stable between add/remove calls; use row_of().
+    Positions are the top-left corner in pixels; every ship is SHIP_WIDTH x SHIP_HEIGHT.
+    The columns can also live in an external buffer (from_buffer), e.g. shared memory for fleet_shards.
+    """
+    def __init__(self, capacity=1024, seed=None):
+        self.count = 0
+        self.rng = np.random.default_rng(seed)
+        self._rows = {} # ship_id -> row
+        self.names = [] # Row-aligned ship names (only read when an event is built)
+        self.fixed_capacity = False # Buffer-backed fleets cannot grow
+        self._allocate(max(1, capacity))
+
+    @classmethod
+    def from_buffer(cls, buffer, capacity, seed=None):
+        """A fleet whose columns are views into buffer (at least buffer_size(capacity) bytes). Its capacity is fixed."""
+        fleet = cls.__new__(cls)
+        fleet.count = 0
+        fleet.rng = np.random.default_rng(seed)
+        fleet._rows = {}
+        fleet.names = []
+        fleet.fixed_capacity = True
+        fleet.capacity = capacity
+        offset = 0
+        for name, dtype, fill in COLUMNS:
+            setattr(fleet, name, np.ndarray(capacity, dtype=dtype, buffer=buffer, offset=offset))
+            offset += column_bytes(dtype, capacity)
+        return fleet
+
+    @staticmethod
+    def buffer_size(capacity):
+        return sum(column_bytes(dtype, capacity) for name, dtype, fill in COLUMNS)
+
+    def _allocate(self, capacity):
+        for name, dtype, fill in COLUMNS:
+            new = np.full(capacity, fill, dtype=dtype)
+            old = getattr(self, name, None)
+            if old is not None:
+                new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+        self.capacity = capacity
+
+    def __len__(self):
+        return self.count
+
+    def row_of(self, ship_id):
+        return self._rows[ship_id]
+
+    @property
+    def last_step_px(self):
+        """Row-aligned distance moved by the latest step()."""
+        return self.step_px[:self.count]
+
+    def add(self, ship_id, name, x, y, speed_kmh, heading=None):
+        if ship_id in self._rows:
+            raise ValueError(f"Ship {ship_id} is already in the fleet")
+        if self.count == self.capacity:
+            if self.fixed_capacity:
+                raise ValueError(f"Fleet is full ({self.capacity} ships)")
+            self._allocate(self.capacity * 2)
+        row = self.count
+        self.ship_id[row] = ship_id
+        self.x[row] = x
+        self.y[row] = y
+        self.speed[row] = speed_kmh
+        self.heading_x[row], self.heading_y[row] = heading or (0.0, 0.0)
+        self.zone[row] = ZONE_CODE_OPEN_SEA
+        self.direction[row] = DIRECTION_NONE
+        self.last_dist[row] = np.nan
+        self.parked_terminal[row] = 0
+        self.dragging[row] = False
+        self.step_px[row] = 0.0
+        self.names.append(name)
+        self._rows[ship_id] = row
+        self.count += 1
+        return row
+
+    def remove(self, ship_id):
+        row = self._rows.pop(ship_id)
+        last = self.count - 1
+        if row != last: # Move the last row into the hole
+            for name, dtype, fill in COLUMNS:
+                column = getattr(self, name)
+                column[row] = column[last]
+            self.names[row] = self.names[last]
+            self._rows[int(self.ship_id[row])] = row
+        self.names.pop()
+        self.count = last
+
+    def step(self, dt):
+        """
+        Moves steered ships and reclassifies the whole fleet in one vectorized pass.
+        Returns (changed_rows, at_port_rows, previous_zone): rows whose zone code changed,
+        steered rows now overlapping the port (docking candidates), and the zone codes before the step.
+        """
+        n = self.count
+        x, y, speed = self.x[:n], self.y[:n], self.speed[:n]
+        zone, direction, last_dist = self.zone[:n], self.direction[:n], self.last_dist[:n]
+        dragging = self.dragging[:n]
+        parked = zone == ZONE_CODE_PARKED
+        previous_zone = zone.copy()
+
+        # Move ships that have a heading, are not parked and are not held by the user
+        steered = (self.heading_x[:n] != 0) | (self.heading_y[:n] != 0)
+        moving = steered & ~parked & ~dragging
+        step_px = self.step_px[:n]
+        step_px[:] = np.where(moving, speed * (PIXELS_PER_SECOND_PER_KMH * dt), 0.0)
+        x += self.heading_x[:n] * step_px
+        y += self.heading_y[:n] * step_px
+
+        # Distance from the ship's centre to the port centre
+        dist = np.hypot(x + SHIP_WIDTH // 2 - PORT_CENTER_X, y + SHIP_HEIGHT // 2 - PORT_CENTER_Y)
+
+        # Movement direction from the distance change (kept as-is on the first step)
+        known = ~np.isnan(last_dist)
+        new_direction = np.where(dist < last_dist - DIRECTION_THRESHOLD_PX, DIRECTION_INCOMING,
+                                 np.where(dist > last_dist + DIRECTION_THRESHOLD_PX, DIRECTION_OUTGOING, DIRECTION_NONE))
+        direction[known] = new_direction[known]
+        direction[parked] = DIRECTION_NONE
+
+        # Zone from the distance band; parked ships keep their zone
+        band = np.searchsorted(ZONE_THRESHOLDS, dist, side="left")
+        zone[~parked] = BAND_ZONE_CODES[band[~parked]]
+
+        # Speed: capped near the port, raised in open sea (not while parked or dragged)
+        target = self.rng.uniform(BAND_SPEED_LOW[band], BAND_SPEED_HIGH[band])
+        adjusted = np.where(band == OPEN_SEA_BAND, np.maximum(speed, target), np.minimum(speed, target))
+        free = ~parked & ~dragging
+        speed[free] = adjusted[free]
+
+        last_dist[:] = dist
+
+        changed_rows = np.flatnonzero(zone != previous_zone)
+        at_port_rows = np.flatnonzero(moving & (x < PORT_X + PORT_WIDTH) & (x + SHIP_WIDTH > PORT_X)
+                                      & (y < PORT_Y + PORT_HEIGHT) & (y + SHIP_HEIGHT > PORT_Y))
+        return changed_rows, at_port_rows, previous_zone
+
+
+class FleetEngine:
+    """
+    Headless engine over FleetArrays: docking and event reporting for a fleet of thousands.
+    Events have the same payloads as PortEngine's and are only built for rows that changed.
+    """
+    def __init__(self, event_sink=None, clock=None, capacity=1024, seed=None):
+        self.event_sink = event_sink
+        self.clock = clock or datetime.datetime.now # Source of event timestamps
+        self.fleet = FleetArrays(capacity, seed)
+        self.terminals = TerminalManager(build_terminals())
+        self.terminals_data = self.terminals.terminals
+        self.sim_time = 0.0 # Seconds simulated so far
+
+    def add_ship(self, ship_id, name, x, y, speed_kmh, heading=None):
+        return self.fleet.add(ship_id, name, x, y, speed_kmh, heading)
+
+    def emit(self, row, event_type, additional_data=None):
+        if self.event_sink:
+            fleet = self.fleet
+            self.event_sink(make_event_payload(
+                int(fleet.ship_id[row]), fleet.names[row], ZONE_NAMES[fleet.zone[row]], float(fleet.speed[row]),
+                int(fleet.parked_terminal[row]) or None, event_type, self.clock(), additional_data))
+
+    def delete_ship(self, ship_id):
+        row = self.fleet.row_of(ship_id)
+        self.emit(row, "ship_deleted")
+        self.terminals.release(ship_id)
+        self.fleet.remove(ship_id)
+
+    def step(self, dt):
+        """Advances the simulation by dt seconds. Returns the number of zone changes."""
+        self.sim_time += dt
+        fleet = self.fleet
+        changed_rows, at_port_rows, previous_zone = fleet.step(dt)
+
+        if len(at_port_rows):
+            self._dock(at_port_rows)
+
+        for row in changed_rows:
+            if fleet.zone[row] != ZONE_CODE_PARKED: # Newly parked ships already reported "docked"
+                self.emit(row, "zone_change")
+        return len(changed_rows)
+
+    def _dock(self, rows):
+        """Parks the ships in rows at the nearest free terminals; the rest back off out of the port."""
+        fleet = self.fleet
+        waiting = rows
+        for i, row in enumerate(rows):
+            terminal = self.terminals.nearest_free(fleet.y[row] + SHIP_HEIGHT // 2)
+            if terminal is None: # Port is full; everyone after this waits too
+                waiting = rows[i:]
+                break
+            slot = self.terminals.occupy(terminal, int(fleet.ship_id[row]))
+            fleet.zone[row] = ZONE_CODE_PARKED
+            fleet.speed[row] = 0
+            fleet.parked_terminal[row] = terminal['id']
+            fleet.x[row], fleet.y[row] = parked_position(terminal, SHIP_WIDTH, SHIP_HEIGHT, slot)
+            fleet.heading_x[row] = fleet.heading_y[row] = 0.0
+            fleet.direction[row] = DIRECTION_NONE
+            self.emit(row, "docked", {"terminal_id": terminal['id']})
+        else:
+            return
+
+        # No free terminal: undo this tick's move and wait outside the port
+        fleet.x[waiting] -= fleet.heading_x[waiting] * fleet.last_step_px[waiting]
+        fleet.y[waiting] -= fleet.heading_y[waiting] * fleet.last_step_px[waiting]
+        fleet.direction[waiting] = DIRECTION_NONE
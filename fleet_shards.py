@@ -0,0 +1,295 @@
+# fleet_shards.py
+# Multi-process fleet: the sea around the port is cut into angular sectors, each a FleetArrays shard
+# living in shared memory and stepped by a worker process. A coordinator owns the terminals,
+# settles terminal claims, moves ships that cross into another sector and merges the events.
+import argparse
+import concurrent.futures
+import datetime
+import heapq
+import math
+import os
+import random
+import time
+from multiprocessing import shared_memory
+from operator import itemgetter
+
+import numpy as np
+
+from fleet import COLUMNS, FleetArrays, FleetEngine, ZONE_NAMES, ZONE_CODE_PARKED, DIRECTION_NONE
+from port_engine import (
+    PORT_CENTER_X, PORT_CENTER_Y, SHIP_WIDTH, SHIP_HEIGHT,
+    build_terminals, get_random_open_sea_position, make_event_payload, parked_position,
+)
+from terminals import TerminalManager
+
+DEFAULT_SHARD_CAPACITY = 65536 # Ships per shard (shared memory cannot grow)
+MAILBOX_HEADER = 3 # Mailbox starts with the number of changed, at-port and sector-crossing rows
+
+
+def sector_of(x, y, shard_count):
+    """Shard index (angular sector around the port centre) for ships with top-left corners x, y (arrays)."""
+    angle = np.arctan2(y + SHIP_HEIGHT // 2 - PORT_CENTER_Y, x + SHIP_WIDTH // 2 - PORT_CENTER_X)
+    return ((angle + np.pi) * (shard_count / (2 * np.pi))).astype(np.int64) % shard_count
+
+
+def shard_memory_size(capacity):
+    """Fleet columns followed by the mailbox."""
+    return FleetArrays.buffer_size(capacity) + (MAILBOX_HEADER + 3 * capacity) * 8
+
+
+def attach_shard(buffer, capacity):
+    """(FleetArrays, mailbox) views over a shard's shared memory."""
+    fleet = FleetArrays.from_buffer(buffer, capacity)
+    mailbox = np.ndarray(MAILBOX_HEADER + 3 * capacity, dtype=np.int64, buffer=buffer,
+                         offset=FleetArrays.buffer_size(capacity))
+    return fleet, mailbox
+
+
+# --- Worker Side ---
+_attached = {} # Shared memory name -> (SharedMemory, FleetArrays, mailbox), per worker process
+
+def step_shard(task):
+    """
+    Worker: advances one shard in place, then writes the rows that changed zone, the rows now at
+    the port (terminal claims) and the rows that left the shard's sector into its mailbox.
+    """
+    name, capacity, shard, shard_count, count, dt, seed, tick = task
+    entry = _attached.get(name)
+    if entry is None:
+        memory = shared_memory.SharedMemory(name=name) # The coordinator owns (and unlinks) it
+        entry = _attached[name] = (memory,) + attach_shard(memory.buf, capacity)
+    memory, fleet, mailbox = entry
+
+    fleet.count = count
+    fleet.rng = np.random.default_rng((seed, shard, tick)) # Same draws whichever worker runs the shard
+    changed_rows, at_port_rows, previous_zone = fleet.step(dt)
+    at_sea = fleet.zone[:count] != ZONE_CODE_PARKED
+    crossing_rows = np.flatnonzero(at_sea & (sector_of(fleet.x[:count], fleet.y[:count], shard_count) != shard))
+
+    mailbox[:MAILBOX_HEADER] = (len(changed_rows), len(at_port_rows), len(crossing_rows))
+    start = MAILBOX_HEADER
+    for rows in (changed_rows, at_port_rows, crossing_rows):
+        mailbox[start:start + len(rows)] = rows
+        start += capacity
+    return shard
+
+
+# --- Coordinator ---
+class ShardedFleet:
+    """
+    FleetEngine split across processes. Each shard's columns and mailbox sit in one shared memory
+    block; per tick only the task tuple goes to a worker and only its shard index comes back.
+    The coordinator then docks the ships at the port (in ship_id order, against one TerminalManager),
+    moves ships that crossed into another sector to that shard, and reports the tick's events to
+    event_sink as one stream ordered by ship_id (heapq.merge of the per-shard lists).
+    """
+    def __init__(self, shard_count=None, capacity_per_shard=DEFAULT_SHARD_CAPACITY, workers=None,
+                 event_sink=None, clock=None, seed=None):
+        self.shard_count = shard_count or os.cpu_count() or 1
+        self.capacity = capacity_per_shard
+        self.event_sink = event_sink
+        self.clock = clock or datetime.datetime.now # Source of event timestamps
+        self.seed = seed if seed is not None else random.randrange(2**32)
+        self.terminals = TerminalManager(build_terminals())
+        self.terminals_data = self.terminals.terminals
+        self.sim_time = 0.0 # Seconds simulated so far
+        self.tick = 0
+        self.migrations = 0 # Ships moved between shards so far
+        self.deferred_migrations = 0 # Crossings left in the old shard because the target shard was full
+
+        self._memory = []
+        self.shards = [] # FleetArrays per shard (coordinator's views)
+        self._mailboxes = []
+        for _ in range(self.shard_count):
+            memory = shared_memory.SharedMemory(create=True, size=shard_memory_size(self.capacity))
+            fleet, mailbox = attach_shard(memory.buf, self.capacity)
+            self._memory.append(memory)
+            self.shards.append(fleet)
+            self._mailboxes.append(mailbox)
+        self._shard_of = {} # ship_id -> shard index
+        self._pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers or self.shard_count)
+
+    def __len__(self):
+        return len(self._shard_of)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Stops the workers and frees the shared memory."""
+        if self._pool is None:
+            return
+        self._pool.shutdown()
+        self._pool = None
+        self.shards.clear() # Drop every view into the buffers before closing them
+        self._mailboxes.clear()
+        for memory in self._memory:
+            memory.close()
+            memory.unlink()
+        self._memory.clear()
+
+    # --- Ships ---
+    def add_ship(self, ship_id, name, x, y, speed_kmh, heading=None):
+        if ship_id in self._shard_of:
+            raise ValueError(f"Ship {ship_id} is already in the fleet")
+        shard = int(sector_of(np.array([x], dtype=np.float64), np.array([y], dtype=np.float64), self.shard_count)[0])
+        self.shards[shard].add(ship_id, name, x, y, speed_kmh, heading)
+        self._shard_of[ship_id] = shard
+
+    def delete_ship(self, ship_id):
+        shard = self._shard_of.pop(ship_id)
+        fleet = self.shards[shard]
+        self._emit(self._payload(fleet, fleet.row_of(ship_id), "ship_deleted", self.clock()))
+        self.terminals.release(ship_id)
+        fleet.remove(ship_id)
+
+    # --- Stepping ---
+    def step(self, dt):
+        """Advances every shard by dt seconds in parallel. Returns the number of events reported."""
+        self.sim_time += dt
+        self.tick += 1
+        tasks = [(memory.name, self.capacity, shard, self.shard_count, fleet.count, dt, self.seed, self.tick)
+                 for shard, (memory, fleet) in enumerate(zip(self._memory, self.shards))]
+        list(self._pool.map(step_shard, tasks))
+        timestamp = self.clock()
+
+        changed, at_port, crossing = [], [], []
+        for mailbox in self._mailboxes:
+            counts = mailbox[:MAILBOX_HEADER]
+            start = MAILBOX_HEADER
+            for rows, count in zip((changed, at_port, crossing), counts):
+                rows.append(mailbox[start:start + count].copy())
+                start += self.capacity
+
+        docked = self._claim_terminals(at_port, timestamp)
+
+        # One list per shard, sorted by ship_id: the docking reports plus every other zone change
+        streams = []
+        for shard, fleet in enumerate(self.shards):
+            events = docked[shard]
+            for row in changed[shard]:
+                if fleet.zone[row] != ZONE_CODE_PARKED: # Newly parked ships already reported "docked"
+                    events.append((int(fleet.ship_id[row]), self._payload(fleet, row, "zone_change", timestamp)))
+            events.sort(key=itemgetter(0))
+            streams.append(events)
+        reported = 0
+        for ship_id, payload in heapq.merge(*streams, key=itemgetter(0)):
+            self._emit(payload)
+            reported += 1
+
+        self._migrate(crossing)
+        return reported
+
+    def _claim_terminals(self, at_port, timestamp):
+        """Docks the ships that reached the port, lowest ship_id first; the rest back off. Returns per-shard docked events."""
+        docked = [[] for _ in self.shards]
+        claims = sorted((int(self.shards[shard].ship_id[row]), shard, int(row))
+                        for shard, rows in enumerate(at_port) for row in rows)
+        waiting = [[] for _ in self.shards]
+        for ship_id, shard, row in claims:
+            terminal = self.terminals.nearest_free(self.shards[shard].y[row] + SHIP_HEIGHT // 2)
+            if terminal is None: # Port is full
+                waiting[shard].append(row)
+                continue
+            fleet = self.shards[shard]
+            slot = self.terminals.occupy(terminal, ship_id)
+            fleet.zone[row] = ZONE_CODE_PARKED
+            fleet.speed[row] = 0
+            fleet.parked_terminal[row] = terminal['id']
+            fleet.x[row], fleet.y[row] = parked_position(terminal, SHIP_WIDTH, SHIP_HEIGHT, slot)
+            fleet.heading_x[row] = fleet.heading_y[row] = 0.0
+            fleet.direction[row] = DIRECTION_NONE
+            docked[shard].append((ship_id, self._payload(fleet, row, "docked", timestamp, {"terminal_id": terminal['id']})))
+
+        # No free terminal: undo this tick's move and wait outside the port
+        for fleet, rows in zip(self.shards, waiting):
+            if rows:
+                rows = np.array(rows)
+                fleet.x[rows] -= fleet.heading_x[rows] * fleet.step_px[rows]
+                fleet.y[rows] -= fleet.heading_y[rows] * fleet.step_px[rows]
+                fleet.direction[rows] = DIRECTION_NONE
+        return docked
+
+    def _migrate(self, crossing):
+        """
+        Moves ships that sailed into another sector to that sector's shard. If that shard is full
+        the ship stays where it is (it still steps correctly there) and is retried next crossing.
+        """
+        moves = []
+        for shard, rows in enumerate(crossing):
+            if not len(rows):
+                continue
+            fleet = self.shards[shard]
+            rows = rows[fleet.zone[rows] != ZONE_CODE_PARKED] # Docked this tick: stays put
+            targets = sector_of(fleet.x[rows], fleet.y[rows], self.shard_count) # After any backing off
+            moves.extend((int(fleet.ship_id[row]), shard, int(target))
+                         for row, target in zip(rows, targets) if target != shard)
+        for ship_id, source, target in moves: # By ship_id: rows shift as ships are removed
+            src, dst = self.shards[source], self.shards[target]
+            if dst.count >= dst.capacity: # Check before removing, so a full shard never loses the ship
+                self.deferred_migrations += 1
+                continue
+            row = src.row_of(ship_id)
+            values = [getattr(src, column)[row] for column, dtype, fill in COLUMNS]
+            name = src.names[row]
+            src.remove(ship_id)
+            new_row = dst.add(ship_id, name, 0.0, 0.0, 0.0)
+            for (column, dtype, fill), value in zip(COLUMNS, values):
+                getattr(dst, column)[new_row] = value
+            self._shard_of[ship_id] = target
+            self.migrations += 1
+
+    # --- Events ---
+    def _payload(self, fleet, row, event_type, timestamp, additional_data=None):
+        return make_event_payload(
+            int(fleet.ship_id[row]), fleet.names[row], ZONE_NAMES[fleet.zone[row]], float(fleet.speed[row]),
+            int(fleet.parked_terminal[row]) or None, event_type, timestamp, additional_data)
+
+    def _emit(self, payload):
+        if self.event_sink:
+            self.event_sink(payload)
+
+
+def add_random_ships(engine, count, seed=None):
+    """Ships spread over the open sea, each heading for the port centre."""
+    rng = random.Random(seed)
+    for ship_id in range(1, count + 1):
+        x, y = get_random_open_sea_position(rng)
+        dx, dy = PORT_CENTER_X - x, PORT_CENTER_Y - y
+        distance = math.hypot(dx, dy) or 1.0
+        engine.add_ship(ship_id, f"Ship-{ship_id}", x, y, rng.uniform(40, 60), (dx / distance, dy / distance))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded multi-process fleet simulation benchmark.")
+    parser.add_argument("--ships", type=int, default=50000)
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--dt", type=float, default=0.05, help="Seconds per step")
+    parser.add_argument("--shards", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    def run(engine, label):
+        events = [0]
+        engine.event_sink = lambda payload: events.__setitem__(0, events[0] + 1)
+        add_random_ships(engine, args.ships, args.seed)
+        started = time.perf_counter()
+        for _ in range(args.steps):
+            engine.step(args.dt)
+        elapsed = time.perf_counter() - started
+        print(f"{label:<22} {elapsed:6.2f} s  {args.ships * args.steps / elapsed:12,.0f} ship-steps/s  {events[0]} events")
+        return elapsed
+
+    print(f"{args.ships} ships x {args.steps} steps, {os.cpu_count()} CPUs")
+    single = run(FleetEngine(seed=args.seed, capacity=args.ships), "single process")
+    capacity = max(1024, 2 * args.ships // args.shards + 1024) # Headroom for uneven sectors
+    with ShardedFleet(args.shards, capacity_per_shard=capacity, seed=args.seed) as sharded:
+        elapsed = run(sharded, f"{args.shards} shards")
+        print(f"speed-up {single / elapsed:.2f}x, {sharded.migrations} ships changed shard")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# fleet_state.py
+import collections # For OrderedDict
+
+MAX_TOMBSTONES = 10000 # Deleted ships remembered for delta queries before falling back to a full snapshot
+
+
+class FleetState:
+    """
+    Current state per ship, maintained incrementally from logged events.
+    Each event is applied in O(1); ship_deleted removes the ship. Every change is stamped
+    with the event's seq, which doubles as the view's version, so clients can ask for only
+    what changed since the version they last saw.
+    """
+    def __init__(self):
+        self.ships = {} # ship_id -> state dict
+        self.version = 0
+        self._changes = collections.OrderedDict() # ship_id -> version of its last change, oldest first
+        self._tombstones = 0 # Removed ships still present in _changes
+        self._floor_version = 0 # Deltas from before this version are no longer available
+
+    def apply(self, event):
+        ship_id = event.get("ship_id")
+        event_type = event.get("event_type")
+        if ship_id is None or ship_id == 0: # 0 is used for global messages, not a ship
+            return
+        version = event.get("seq", self.version + 1)
+
+        if event_type == "ship_deleted":
+            if self.ships.pop(ship_id, None) is None:
+                return
+            self._tombstones += 1
+        else:
+            state = self.ships.get(ship_id)
+            if state is None:
+                if event_type in ("emergency", "emergency_global"):
+                    return # An emergency alone does not put a ship on the map
+                if ship_id in self._changes:
+                    self._tombstones -= 1 # Re-added after a delete
+                state = self.ships[ship_id] = {"ship_id": ship_id}
+            if event_type not in ("emergency", "emergency_global"):
+                state["ship_name"] = event.get("ship_name", state.get("ship_name"))
+                state["current_zone"] = event.get("current_zone", state.get("current_zone"))
+                state["current_speed_kmh"] = event.get("current_speed_kmh", state.get("current_speed_kmh"))
+                if event_type == "docked":
+                    state["parked_terminal"] = event.get("terminal_id", event.get("parked_terminal"))
+                elif event_type == "undocked":
+                    state["parked_terminal"] = None
+                else:
+                    state["parked_terminal"] = event.get("parked_terminal")
+            state["last_event"] = event_type
+            state["last_seen"] = event.get("server_received_timestamp")
+            state["version"] = version
+
+        self.version = version
+        self._changes[ship_id] = version
+        self._changes.move_to_end(ship_id)
+        if self._tombstones > MAX_TOMBSTONES:
+            self._compact()
+
+    def load(self, latest_events, version):
+        """
+        Rebuilds the view on startup from SQLiteEventArchive.latest_per_ship() (each ship's newest
+        non-emergency event, then its newest emergency if that came later) and sets it to
+        `version`, the log's last seq. A ship whose newest state event is ship_deleted stays
+        deleted; a trailing emergency only updates last_event, last_seen and version, as live.
+        Deltas from before the restart are unknown, so clients behind `version` get a full snapshot.
+        """
+        for event in latest_events:
+            if event.get("event_type") != "ship_deleted":
+                self.apply(event) # An emergency for a ship not (or no longer) on the map is ignored
+        self.version = version
+        self._floor_version = version
+
+    def snapshot(self, since_version=None):
+        """
+        Returns {"version", "full", "ships", "removed"}.
+        With since_version, only ships changed after it (and ids removed after it) are returned,
+        unless that version is too old, in which case a full snapshot is returned (full=True).
+        """
+        if since_version is None or since_version < self._floor_version:
+            return {"version": self.version, "full": True, "ships": list(self.ships.values()), "removed": []}
+
+        ships = []
+        removed = []
+        for ship_id in reversed(self._changes): # Newest first; stop at the first unchanged one
+            if self._changes[ship_id] <= since_version:
+                break
+            state = self.ships.get(ship_id)
+            if state is None:
+                removed.append(ship_id)
+            else:
+                ships.append(state)
+        return {"version": self.version, "full": False, "ships": ships, "removed": removed}
+
+    def _compact(self):
+        """Forgets tombstones; clients behind the current version get a full snapshot next time."""
+        for ship_id in [ship_id for ship_id in self._changes if ship_id not in self.ships]:
+            del self._changes[ship_id]
+        self._tombstones = 0
+        self._floor_version = self.version
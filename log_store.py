@@ -0,0 +1,714 @@
+# log_store.py
+import array
+import bisect
+import collections # For deque
+import datetime
+import json
+import logging
+import mmap
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger("port_server.log_store") # Goes through the server's queued log handler
+
+# Fast serializer when available; every event is encoded once and the bytes are reused
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def dumps_bytes(obj):
+    """Compact JSON encoding of obj as UTF-8 bytes."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError: # e.g. integers beyond 64 bits, which json handles
+            pass
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+MAX_MAPPED_SEGMENTS = 8 # Each mmap holds a file descriptor, so only the recently read segments stay mapped
+SCAN_CHUNK_EVENTS = 1000 # Segment events parsed per read when a query reaches past the index window
+CLOSE_WRITE_ATTEMPTS = 3 # Archive writes tried at shutdown before the remaining events are given up
+
+
+INDEXED_FIELDS = ("ship_id", "event_type", "current_zone") # Used as index keys, so they must be scalars
+
+
+class LogBacklogFull(RuntimeError):
+    """Raised by LogStore.append when the archive is too far behind to hold more events in RAM."""
+
+
+class LogBatchTooLarge(ValueError):
+    """Raised by LogStore.append for a batch bigger than the store could ever hold uncommitted."""
+    def __init__(self, max_events):
+        super().__init__(f"Batch is larger than the maximum of {max_events} events; split it and resend.")
+        self.max_events = max_events
+
+
+class InvalidEvent(ValueError):
+    """Raised by LogStore.append when an event cannot be logged; nothing from the batch is appended."""
+
+
+def event_error(event):
+    """Why the event cannot be logged (None if it can): it must be an object with scalar indexed fields."""
+    if not isinstance(event, dict):
+        return "Event must be a JSON object."
+    for field in INDEXED_FIELDS:
+        if isinstance(event.get(field), (dict, list)):
+            return f"{field} must be a string, number, boolean or null."
+    return None
+
+
+class LogSegment:
+    """
+    One append-only NDJSON file holding a contiguous run of spilled events.
+    Line start offsets are kept in memory (8 bytes per event) so a read seeks straight
+    to the requested events through mmap instead of scanning or parsing the whole file.
+    A small summary (ship ids, event types, zones and the received-time range) lets
+    queries older than the index window skip segments that cannot match.
+    """
+    def __init__(self, path, first_seq):
+        self.path = path
+        self.first_seq = first_seq
+        self.offsets = array.array("Q") # Byte offset of each event's line
+        self.size = 0 # Bytes written so far
+        self.ship_ids = set()
+        self.event_types = set()
+        self.zones = set()
+        self.min_time = None
+        self.max_time = None
+        self._file = open(path, "ab")
+        self._map = None
+        self._mapped_size = 0
+
+    @property
+    def last_seq(self):
+        return self.first_seq + len(self.offsets) - 1
+
+    def append(self, encoded_lines, events):
+        for line in encoded_lines:
+            self.offsets.append(self.size)
+            self.size += len(line)
+        for event in events:
+            self.ship_ids.add(event.get("ship_id"))
+            self.event_types.add(event.get("event_type"))
+            self.zones.add(event.get("current_zone"))
+            received = parse_timestamp(event.get("server_received_timestamp"))
+            if received is not None:
+                self.min_time = received if self.min_time is None else min(self.min_time, received)
+                self.max_time = received if self.max_time is None else max(self.max_time, received)
+        self._file.write(b"".join(encoded_lines))
+        self._file.flush() # Make the bytes visible to mmap readers (no fsync)
+
+    def may_contain(self, ship_id=None, event_type=None, zone=None, start_time=None, end_time=None):
+        """False when the summary rules out any event matching the filters."""
+        if ship_id is not None and ship_id not in self.ship_ids:
+            return False
+        if event_type is not None and event_type not in self.event_types:
+            return False
+        if zone is not None and zone not in self.zones:
+            return False
+        if start_time is not None and (self.max_time is None or self.max_time < start_time):
+            return False
+        if end_time is not None and (self.min_time is None or self.min_time > end_time):
+            return False
+        return True
+
+    def read_raw(self, start_seq, end_seq):
+        """Returns the encoded lines for seq in [start_seq, end_seq], without the trailing newline."""
+        if self._mapped_size != self.size:
+            # (Re)map after the file grew; a closed segment is only mapped once
+            if self._map is not None:
+                self._map.close()
+            with open(self.path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapped_size = self.size
+
+        first = start_seq - self.first_seq
+        last = end_seq - self.first_seq
+        lines = []
+        for i in range(first, last + 1):
+            end = self.offsets[i + 1] if i + 1 < len(self.offsets) else self.size
+            lines.append(self._map[self.offsets[i]:end - 1])
+        return lines
+
+    def seal(self):
+        """Closes the write handle once the segment is full; it stays readable through mmap."""
+        if not self._file.closed:
+            self._file.close()
+
+    def release_map(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+            self._mapped_size = 0
+
+    def close(self):
+        self.seal()
+        self.release_map()
+
+
+def parse_timestamp(value):
+    """ISO timestamp string -> POSIX seconds (None if missing or malformed)."""
+    try:
+        return datetime.datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def event_matches(event, ship_id=None, event_type=None, zone=None, start_time=None, end_time=None):
+    """True if the event passes every given filter (the same filters as LogIndex.query)."""
+    if ship_id is not None and event.get("ship_id") != ship_id:
+        return False
+    if event_type is not None and event.get("event_type") != event_type:
+        return False
+    if zone is not None and event.get("current_zone") != zone:
+        return False
+    if start_time is not None or end_time is not None:
+        received = parse_timestamp(event.get("server_received_timestamp"))
+        if received is None:
+            return False
+        if start_time is not None and received < start_time:
+            return False
+        if end_time is not None and received > end_time:
+            return False
+    return True
+
+
+class LogIndex:
+    """
+    Secondary indexes over the newest `window` events of the log, maintained on every append.
+    Per-ship, per-event-type and per-zone lists of seqs (compact arrays, sorted because
+    seqs only grow) plus a server_received_timestamp-sorted index searched with bisect.
+    Older seqs are trimmed in chunks once the window overflows; window=None keeps everything.
+    """
+    def __init__(self, window=None):
+        self.window = window
+        self.trim_batch = max(1, window // 10) if window else 0 # Trim in chunks to amortize the array shifts
+        self.first_seq = None # Oldest seq covered by the indexes
+        self.last_seq = 0
+        self.by_ship = collections.defaultdict(lambda: array.array("q"))
+        self.by_event_type = collections.defaultdict(lambda: array.array("q"))
+        self.by_zone = collections.defaultdict(lambda: array.array("q"))
+        self.times = array.array("d") # Sorted received times
+        self.time_seqs = array.array("q") # seq of each entry in self.times
+        self.times_in_seq_order = True # False once the server clock has gone backwards
+
+    def add(self, event):
+        seq = event["seq"]
+        if self.first_seq is None:
+            self.first_seq = seq
+        self.last_seq = seq
+        if event.get("ship_id") is not None:
+            self.by_ship[event["ship_id"]].append(seq)
+        if event.get("event_type") is not None:
+            self.by_event_type[event["event_type"]].append(seq)
+        if event.get("current_zone") is not None:
+            self.by_zone[event["current_zone"]].append(seq)
+
+        received = parse_timestamp(event.get("server_received_timestamp"))
+        if received is not None and self.times and received < self.times[-1]:
+            # Clock went backwards: keep the time index sorted
+            i = bisect.bisect_right(self.times, received)
+            self.times.insert(i, received)
+            self.time_seqs.insert(i, seq)
+            self.times_in_seq_order = False
+        elif received is not None:
+            self.times.append(received)
+            self.time_seqs.append(seq)
+        if self.window and seq - self.first_seq + 1 > self.window + self.trim_batch:
+            self.trim(seq - self.window + 1)
+
+    def trim(self, first_seq):
+        """Forgets every seq below first_seq."""
+        if self.first_seq is None or first_seq <= self.first_seq:
+            return
+        self.first_seq = first_seq
+        for index in (self.by_ship, self.by_event_type, self.by_zone):
+            for key in list(index):
+                seqs = index[key]
+                i = bisect.bisect_left(seqs, first_seq)
+                if i == len(seqs):
+                    del index[key]
+                elif i:
+                    del seqs[:i]
+        if self.times_in_seq_order:
+            i = bisect.bisect_left(self.time_seqs, first_seq)
+            del self.times[:i]
+            del self.time_seqs[:i]
+        else:
+            keep = [i for i, seq in enumerate(self.time_seqs) if seq >= first_seq]
+            self.times = array.array("d", (self.times[i] for i in keep))
+            self.time_seqs = array.array("q", (self.time_seqs[i] for i in keep))
+
+    def query(self, ship_id=None, event_type=None, zone=None, start_time=None, end_time=None, after_seq=0, limit=100):
+        """
+        Returns up to `limit` seqs (ascending, > after_seq) matching all given filters.
+        A single filter is a slice of its list. Several filters are intersected by leapfrogging:
+        each list bisects forward to the highest seq seen so far, so runs ruled out by another
+        filter are jumped over and the walk stops at `limit` results. When matches are rare
+        the cost can still approach the length of the shortest list in the window, never
+        the size of the log.
+        """
+        lists = []
+        for index, key in ((self.by_ship, ship_id), (self.by_event_type, event_type), (self.by_zone, zone)):
+            if key is not None:
+                if key not in index:
+                    return []
+                lists.append(index[key])
+
+        lo_seq = after_seq + 1
+        hi_seq = None
+        if start_time is not None or end_time is not None:
+            lo = bisect.bisect_left(self.times, start_time) if start_time is not None else 0
+            hi = bisect.bisect_right(self.times, end_time) if end_time is not None else len(self.times)
+            if lo >= hi:
+                return []
+            if self.times_in_seq_order:
+                # Time range maps to a contiguous seq range
+                lo_seq = max(lo_seq, self.time_seqs[lo])
+                hi_seq = self.time_seqs[hi - 1]
+            else:
+                lists.append(array.array("q", sorted(self.time_seqs[lo:hi])))
+
+        if not lists:
+            # Only a time/seq range: every seq in it matches
+            first = max(lo_seq, self.first_seq or 1)
+            last = hi_seq if hi_seq is not None else self.last_seq
+            return list(range(first, min(last, first + limit - 1) + 1))
+
+        lists.sort(key=len) # Shortest first: it proposes the fewest candidates
+        positions = [0] * len(lists)
+        candidate = lo_seq
+        results = []
+        while hi_seq is None or candidate <= hi_seq:
+            for k, seqs in enumerate(lists):
+                i = bisect.bisect_left(seqs, candidate, positions[k])
+                if i == len(seqs):
+                    return results
+                positions[k] = i
+                if seqs[i] != candidate:
+                    candidate = seqs[i] # Leap to the next seq this list allows and start over
+                    break
+            else:
+                results.append(candidate)
+                if len(results) >= limit:
+                    break
+                candidate += 1
+        return results
+
+
+class SQLiteEventArchive:
+    """
+    Durable copy of the event log in SQLite (WAL mode).
+    Ingest only hands events to a queue; a dedicated writer thread commits them in batched
+    transactions, so nothing on the request path waits on disk. With synchronous=NORMAL in
+    WAL mode, commits do not fsync (only checkpoints do).
+    A batch that fails is retried with backoff until it commits; later batches wait behind it,
+    so committed_seq never skips over events that are not in the database.
+    """
+    def __init__(self, path, batch_size=500, batch_interval=0.2, retry_delay=0.1, max_retry_delay=5.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._queue = queue.SimpleQueue() # Unbounded: appends never block (LogStore caps what it holds)
+        self.committed_seq = 0 # Highest seq known to be in the database; every seq up to it is stored
+        self._closing = threading.Event() # Set by close(); cuts retry waits short
+        self._writer_conn = self._connect()
+        self._writer_conn.executescript("""
+            CREATE TABLE IF NOT EXISTS events (
+                seq INTEGER PRIMARY KEY,
+                ship_id INTEGER,
+                event_type TEXT,
+                server_received_timestamp TEXT,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_events_ship_id ON events (ship_id);
+            CREATE INDEX IF NOT EXISTS idx_events_event_type ON events (event_type);
+            CREATE INDEX IF NOT EXISTS idx_events_received ON events (server_received_timestamp);
+        """)
+        self._reader_conn = self._connect() # WAL lets reads run alongside the writer
+        self._reader_lock = threading.Lock()
+        self._stop = object() # Sentinel that tells the writer to finish
+        self._thread = threading.Thread(target=self._run, name="SQLiteEventWriter", daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def submit(self, events):
+        self._queue.put(events)
+
+    def load_recent(self, limit):
+        """Returns (last_seq, newest `limit` events oldest first) for rebuilding state on startup."""
+        with self._reader_lock:
+            last_seq = self._reader_conn.execute("SELECT MAX(seq) FROM events").fetchone()[0] or 0
+            rows = self._reader_conn.execute("SELECT data FROM events ORDER BY seq DESC LIMIT ?", (limit,)).fetchall()
+        self.committed_seq = last_seq
+        return last_seq, [json.loads(row[0]) for row in reversed(rows)]
+
+    def latest_per_ship(self):
+        """
+        Returns, oldest first, every ship's newest non-emergency event (its zone, speed and
+        berth) and, when newer, its newest event of any type (its last_event and last_seen).
+        Replaying these through FleetState.apply gives the same state as replaying the whole log.
+        """
+        with self._reader_lock:
+            rows = self._reader_conn.execute(
+                "SELECT data FROM events WHERE seq IN ("
+                "SELECT MAX(seq) FROM events WHERE ship_id IS NOT NULL"
+                " AND event_type NOT IN ('emergency', 'emergency_global') GROUP BY ship_id"
+                " UNION SELECT MAX(seq) FROM events WHERE ship_id IS NOT NULL GROUP BY ship_id) ORDER BY seq").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def read_raw(self, start_seq, end_seq):
+        """Returns the stored JSON text of events with seq in [start_seq, end_seq]."""
+        with self._reader_lock:
+            rows = self._reader_conn.execute(
+                "SELECT data FROM events WHERE seq BETWEEN ? AND ? ORDER BY seq", (start_seq, end_seq)).fetchall()
+        return [row[0] for row in rows]
+
+    def query(self, ship_id=None, event_type=None, zone=None, start_time=None, end_time=None,
+              after_seq=0, before_seq=None, limit=100):
+        """Filtered query over the stored history (for events older than the in-memory indexes)."""
+        clauses = ["seq > ?"]
+        params = [after_seq]
+        if before_seq is not None:
+            clauses.append("seq < ?")
+            params.append(before_seq)
+        if ship_id is not None:
+            clauses.append("ship_id = ?")
+            params.append(ship_id)
+        if event_type is not None:
+            clauses.append("event_type = ?")
+            params.append(event_type)
+        if zone is not None:
+            clauses.append("json_extract(data, '$.current_zone') = ?")
+            params.append(zone)
+        if start_time is not None:
+            clauses.append("server_received_timestamp >= ?")
+            params.append(datetime.datetime.fromtimestamp(start_time).isoformat())
+        if end_time is not None:
+            clauses.append("server_received_timestamp <= ?")
+            params.append(datetime.datetime.fromtimestamp(end_time).isoformat())
+        params.append(limit)
+        with self._reader_lock:
+            rows = self._reader_conn.execute(
+                f"SELECT data FROM events WHERE {' AND '.join(clauses)} ORDER BY seq LIMIT ?", params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def close(self):
+        """Flushes everything still queued, then closes the database."""
+        self._closing.set()
+        self._queue.put(self._stop)
+        self._thread.join()
+        self._writer_conn.close()
+        self._reader_conn.close()
+
+    def _write(self, batch):
+        rows = [(event["seq"], event.get("ship_id"), event.get("event_type"),
+                 event.get("server_received_timestamp"), json.dumps(event)) for event in batch]
+        with self._writer_conn: # One transaction per batch
+            self._writer_conn.executemany(
+                "INSERT OR REPLACE INTO events (seq, ship_id, event_type, server_received_timestamp, data) VALUES (?, ?, ?, ?, ?)",
+                rows)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is self._stop:
+                break
+            batch = list(item)
+            deadline = time.monotonic() + self.batch_interval
+            # Keep collecting until the batch is big enough or the window closes
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is self._stop:
+                    stopping = True
+                    break
+                batch.extend(item)
+            if batch and not self._commit(batch):
+                break
+
+    def _commit(self, batch):
+        """Writes the batch, retrying with backoff until it commits. Returns False if given up at shutdown."""
+        delay = self.retry_delay
+        attempt = 0
+        while True:
+            try:
+                self._write(batch)
+                self.committed_seq = batch[-1]["seq"]
+                return True
+            except sqlite3.Error as e:
+                attempt += 1
+                fields = {"db": self.path, "first_seq": batch[0]["seq"], "events": len(batch), "attempt": attempt, "error": str(e)}
+                if self._closing.is_set() and attempt >= CLOSE_WRITE_ATTEMPTS:
+                    logger.critical("Giving up writing events to the archive at shutdown; they are lost", extra={"fields": fields})
+                    return False
+                logger.error("Error writing events to the archive; retrying", extra={"fields": {**fields, "retry_in": delay}})
+                self._closing.wait(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+
+
+class LogStore:
+    """
+    Event log with a bounded in-RAM ring of recent events.
+    Every event gets a monotonic sequence number ("seq"), starting at 1. The newest
+    `memory_events` events are kept as dicts in a deque; older ones are spilled to
+    append-only segment files of up to `segment_bytes` each and read back through mmap
+    when a query or cursor reaches into them. The query indexes cover the newest
+    `index_events` events (default 10x memory_events); filtered queries over older events
+    scan the segments whose summaries can match (or the archive). Besides the ring and the
+    index window, RAM only grows by the 8-byte line offset of each spilled event.
+
+    With an `archive` (SQLiteEventArchive) every event is also persisted; older events are
+    then simply dropped from the ring and read back from the database instead of segments,
+    and the sequence counter and ring are rebuilt from the database on startup.
+    Events the archive has not committed yet cannot be dropped, so while it is failing or
+    behind the ring grows, up to `max_memory_events` (default 10x memory_events); beyond that
+    append() raises LogBacklogFull instead of accepting events that could be lost.
+    """
+    def __init__(self, segment_dir, memory_events=10000, segment_bytes=16 * 1024 * 1024, archive=None, max_memory_events=None,
+                 index_events=None):
+        self.segment_dir = segment_dir
+        self.memory_events = max(1, memory_events)
+        self.max_memory_events = max(self.memory_events, max_memory_events or 10 * self.memory_events)
+        self.segment_bytes = segment_bytes
+        self.spill_batch = max(1, self.memory_events // 10) # Spill in chunks to amortize file writes
+        self.archive = archive
+        self.last_seq = 0
+        self._ring = collections.deque()
+        self._ring_encoded = collections.deque() # Encoded JSON of each ring event, parallel to _ring
+        self._ring_first_seq = 1 # seq of self._ring[0]
+        self._segments = []
+        self._segment_first_seqs = [] # Parallel to _segments, for bisect
+        self._mapped_segments = collections.OrderedDict() # LRU of segments holding an open mmap
+        # The window always covers the ring, so only spilled events are ever outside it
+        self.index = LogIndex(window=max(index_events or 10 * self.memory_events, self.memory_events + self.spill_batch))
+
+        if archive is not None:
+            self.last_seq, recent = archive.load_recent(self.memory_events)
+            self._ring.extend(recent)
+            self._ring_encoded.extend(dumps_bytes(event) for event in recent)
+            self._ring_first_seq = self.last_seq - len(recent) + 1
+            for event in recent:
+                self.index.add(event)
+            return
+
+        # Segments are a spill area for this process only, so start from a clean directory
+        os.makedirs(segment_dir, exist_ok=True)
+        for name in os.listdir(segment_dir):
+            if name.startswith("segment_") and name.endswith(".ndjson"):
+                os.remove(os.path.join(segment_dir, name))
+
+    def __len__(self):
+        return self.last_seq
+
+    def append(self, events):
+        """
+        Assigns sequence numbers to the events and appends them in one operation.
+        Either the whole batch is appended or none of it: raises InvalidEvent if any event fails
+        event_error, LogBatchTooLarge if the batch can never fit (max_memory_events, archive
+        only) and LogBacklogFull if the archive is too far behind to take it right now.
+        """
+        if not events:
+            return
+        for event in events:
+            error = event_error(event)
+            if error is not None:
+                raise InvalidEvent(error)
+        if self.archive is not None and len(events) > self.max_memory_events:
+            raise LogBatchTooLarge(self.max_memory_events) # Retrying cannot help, unlike LogBacklogFull
+        if self.archive is not None and len(self._ring) + len(events) > self.max_memory_events:
+            self._spill(len(self._ring)) # Make room by dropping everything the archive has committed
+            if len(self._ring) + len(events) > self.max_memory_events:
+                logger.error("Rejecting events: archive backlog is full", extra={"fields": {
+                    "db": self.archive.path, "committed_seq": self.archive.committed_seq,
+                    "last_seq": self.last_seq, "events": len(events)}})
+                raise LogBacklogFull(f"{len(self._ring)} events are waiting for the archive "
+                                     f"(committed through seq {self.archive.committed_seq})")
+        for seq, event in enumerate(events, self.last_seq + 1):
+            event["seq"] = seq
+        encoded = [dumps_bytes(event) for event in events]
+        # Nothing below can fail on a validated event, so seq, ring and index move together
+        for event in events:
+            self.index.add(event)
+        self.last_seq += len(events)
+        self._ring.extend(events)
+        self._ring_encoded.extend(encoded)
+        if self.archive is not None:
+            self.archive.submit(events)
+        if len(self._ring) > self.memory_events + self.spill_batch:
+            self._spill(len(self._ring) - self.memory_events)
+
+    def read_events(self, since, limit):
+        """Returns up to `limit` events with seq > since, oldest first."""
+        return self._read_range(since, limit, raw=False)
+
+    def read_raw(self, since, limit):
+        """Like read_events, but returns each event's already-encoded JSON bytes (no re-encoding)."""
+        return self._read_range(since, limit, raw=True)
+
+    def _read_range(self, since, limit, raw):
+        start = max(0, since) + 1
+        end = min(self.last_seq, start + limit - 1)
+        if start > end:
+            return []
+
+        events = []
+        if start < self._ring_first_seq:
+            # Part of the range is on disk
+            disk_end = min(end, self._ring_first_seq - 1)
+            lines = self._read_disk_raw(start, disk_end)
+            if raw:
+                events.extend(line if isinstance(line, bytes) else line.encode("utf-8") for line in lines)
+            else:
+                events.extend(json.loads(line) for line in lines)
+            start = disk_end + 1
+        if start <= end:
+            ring = self._ring_encoded if raw else self._ring
+            offset = start - self._ring_first_seq
+            events.extend(ring[i] for i in range(offset, offset + end - start + 1))
+        return events
+
+    def get_event(self, seq):
+        if seq >= self._ring_first_seq:
+            return self._ring[seq - self._ring_first_seq]
+        return json.loads(self._read_disk_raw(seq, seq)[0])
+
+    def query(self, ship_id=None, event_type=None, zone=None, start_time=None, end_time=None, after_seq=0, limit=100):
+        """
+        Returns up to `limit` events (oldest first, seq > after_seq) matching all given filters.
+        Times are POSIX seconds compared against server_received_timestamp.
+        """
+        filters = dict(ship_id=ship_id, event_type=event_type, zone=zone, start_time=start_time, end_time=end_time)
+        events = []
+        indexed_from = self.index.first_seq or self.last_seq + 1
+        if after_seq + 1 < indexed_from:
+            # Older than the index window (or from before this process started, with an archive)
+            if self.archive is not None:
+                events = self.archive.query(after_seq=after_seq, before_seq=indexed_from, limit=limit, **filters)
+            else:
+                events = self._query_segments(after_seq, indexed_from, limit, filters)
+            if len(events) >= limit:
+                return events
+            after_seq = indexed_from - 1
+        seqs = self.index.query(after_seq=after_seq, limit=limit - len(events), **filters)
+        events.extend(self.get_event(seq) for seq in seqs)
+        return events
+
+    def stats(self):
+        return {
+            "last_seq": self.last_seq,
+            "memory_events": len(self._ring),
+            "archive_committed_seq": self.archive.committed_seq if self.archive is not None else None,
+            "segments": len(self._segments),
+            "archive": self.archive.path if self.archive is not None else None,
+            "disk_bytes": sum(segment.size for segment in self._segments),
+        }
+
+    def close(self):
+        for segment in self._segments:
+            segment.close()
+        if self.archive is not None:
+            self.archive.close()
+
+    def _spill(self, count):
+        """Moves the `count` oldest ring events to the current segment file."""
+        if self.archive is not None:
+            # Forget events the archive has committed; the rest stay in RAM until the writer catches up
+            count = min(count, self.archive.committed_seq - self._ring_first_seq + 1)
+            for _ in range(count):
+                self._ring.popleft()
+                self._ring_encoded.popleft()
+            self._ring_first_seq += max(0, count)
+            return
+
+        spilled = []
+        lines = []
+        for _ in range(count):
+            spilled.append(self._ring.popleft())
+            lines.append(self._ring_encoded.popleft() + b"\n")
+
+        first_seq = self._ring_first_seq
+        self._ring_first_seq += count
+        while lines:
+            segment = self._segments[-1] if self._segments else None
+            if segment is None or segment.size >= self.segment_bytes:
+                segment = self._new_segment(first_seq)
+            # Fill the current segment up to its size limit, then roll over
+            room = self.segment_bytes - segment.size
+            take = 0
+            taken_bytes = 0
+            while take < len(lines) and (take == 0 or taken_bytes + len(lines[take]) <= room):
+                taken_bytes += len(lines[take])
+                take += 1
+            segment.append(lines[:take], spilled[:take])
+            lines = lines[take:]
+            spilled = spilled[take:]
+            first_seq += take
+
+    def _query_segments(self, after_seq, before_seq, limit, filters):
+        """Filters spilled events with after_seq < seq < before_seq, skipping segments whose summary rules them out."""
+        events = []
+        index = max(0, bisect.bisect_right(self._segment_first_seqs, after_seq + 1) - 1)
+        for segment in self._segments[index:]:
+            if segment.first_seq >= before_seq:
+                break
+            if not segment.may_contain(**filters):
+                continue
+            start = max(after_seq + 1, segment.first_seq)
+            end = min(before_seq - 1, segment.last_seq)
+            while start <= end: # In chunks, so a query that fills up early stops reading
+                chunk_end = min(end, start + SCAN_CHUNK_EVENTS - 1)
+                for line in self._read_disk_raw(start, chunk_end):
+                    event = json.loads(line)
+                    if event_matches(event, **filters):
+                        events.append(event)
+                        if len(events) >= limit:
+                            return events
+                start = chunk_end + 1
+        return events
+
+    def _new_segment(self, first_seq):
+        if self._segments:
+            self._segments[-1].seal()
+        path = os.path.join(self.segment_dir, f"segment_{first_seq:012d}.ndjson")
+        segment = LogSegment(path, first_seq)
+        self._segments.append(segment)
+        self._segment_first_seqs.append(first_seq)
+        return segment
+
+    def _read_disk_raw(self, start, end):
+        """Reads events that are no longer in the ring from the archive or the segments."""
+        if self.archive is not None:
+            return self.archive.read_raw(start, end)
+
+        lines = []
+        index = bisect.bisect_right(self._segment_first_seqs, start) - 1
+        while start <= end:
+            segment = self._segments[index]
+            segment_end = min(end, segment.last_seq)
+            lines.extend(segment.read_raw(start, segment_end))
+            self._mapped_segments[segment] = None
+            self._mapped_segments.move_to_end(segment)
+            if len(self._mapped_segments) > MAX_MAPPED_SEGMENTS:
+                self._mapped_segments.popitem(last=False)[0].release_map()
+            start = segment_end + 1
+            index += 1
+        return lines
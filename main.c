@@ -9,6 +9,8 @@
 #include <sys/time.h>      // For select, fd_set
 #include <termios.h>       // For non-blocking terminal input (Linux/macOS)
 #include <fcntl.h>         // For fcntl (Linux/macOS)
+#include <strings.h>       // For strncasecmp
+#include <ctype.h>         // For isspace
 
 // --- Data Structures for C Client's Internal State ---
 #define MAX_SHIPS 100 // Max number of ships to track internally
@@ -71,6 +73,26 @@ static size_t WriteMemoryCallback(void *contents, size_t size, size_t nmemb, voi
     return realsize;
 }
 
+// --- ETag Capture for Conditional Polling ---
+#define ETAG_SIZE 128
+
+// Header callback: copies the value of the ETag response header into userp (a char[ETAG_SIZE])
+static size_t HeaderCallback(char *buffer, size_t size, size_t nitems, void *userp) {
+    size_t realsize = size * nitems;
+    char *etag = (char *)userp;
+    if (realsize > 5 && strncasecmp(buffer, "ETag:", 5) == 0) {
+        size_t start = 5;
+        while (start < realsize && isspace((unsigned char)buffer[start])) start++;
+        size_t end = realsize;
+        while (end > start && isspace((unsigned char)buffer[end - 1])) end--; // Strip trailing CRLF
+        size_t len = end - start;
+        if (len >= ETAG_SIZE) len = ETAG_SIZE - 1;
+        memcpy(etag, buffer + start, len);
+        etag[len] = '\0';
+    }
+    return realsize;
+}
+
 // --- Helper Functions for Ship Management ---
 
 // Find a ship by ID. Returns pointer to Ship struct or NULL if not found.
@@ -177,7 +199,11 @@ void send_emergency_message(const char* message_content) {
 // --- Main Program Loop ---
 int main(void) {
     CURL *curl_handle;
-    long last_log_entry_count = 0; // To keep track of already processed logs
+    long last_log_cursor = 0; // Sequence number of the last processed log event
+    char logs_url[128];
+    char logs_etag[ETAG_SIZE] = ""; // ETag of the last /get_logs response, sent back as If-None-Match
+    char response_etag[ETAG_SIZE];
+    char if_none_match_header[ETAG_SIZE + 20];
     const int poll_interval_ms = 1000; // Poll every 1000ms (1 second)
 
     // Set stdin to non-blocking mode
@@ -207,18 +233,38 @@ int main(void) {
         if (curl_handle) {
             // Set the URL for the GET request to fetch logs
             // IMPORTANT: Update this URL if your FastAPI server is on a different IP/port
-            curl_easy_setopt(curl_handle, CURLOPT_URL, "http://127.0.0.1:8000/get_logs");
+            // Only ask for events newer than the last one we processed
+            snprintf(logs_url, sizeof(logs_url), "http://127.0.0.1:8000/get_logs?since=%ld", last_log_cursor);
+            curl_easy_setopt(curl_handle, CURLOPT_URL, logs_url);
             curl_easy_setopt(curl_handle, CURLOPT_WRITEFUNCTION, WriteMemoryCallback);
             curl_easy_setopt(curl_handle, CURLOPT_WRITEDATA, (void *)&chunk);
             curl_easy_setopt(curl_handle, CURLOPT_TIMEOUT, 5L); // Timeout after 5 seconds
+            curl_easy_setopt(curl_handle, CURLOPT_ACCEPT_ENCODING, ""); // Accept any compression curl supports (gzip/deflate)
+
+            // Conditional request: the server answers 304 with no body if nothing changed
+            struct curl_slist *poll_headers = NULL;
+            if (logs_etag[0] != '\0') {
+                snprintf(if_none_match_header, sizeof(if_none_match_header), "If-None-Match: %s", logs_etag);
+                poll_headers = curl_slist_append(poll_headers, if_none_match_header);
+                curl_easy_setopt(curl_handle, CURLOPT_HTTPHEADER, poll_headers);
+            }
+            response_etag[0] = '\0';
+            curl_easy_setopt(curl_handle, CURLOPT_HEADERFUNCTION, HeaderCallback);
+            curl_easy_setopt(curl_handle, CURLOPT_HEADERDATA, (void *)response_etag);
 
             CURLcode res = curl_easy_perform(curl_handle);
 
             long http_code = 0;
             curl_easy_getinfo(curl_handle, CURLINFO_RESPONSE_CODE, &http_code);
+            if (res == CURLE_OK && response_etag[0] != '\0') {
+                strncpy(logs_etag, response_etag, sizeof(logs_etag) - 1);
+                logs_etag[sizeof(logs_etag) - 1] = '\0';
+            }
 
             if (res != CURLE_OK) {
                 fprintf(stderr, "curl_easy_perform() failed: %s\n", curl_easy_strerror(res));
+            } else if (http_code == 304) {
+                // Not modified: no new events since the last poll
             } else if (http_code != 200) {
                  fprintf(stderr, "HTTP Request failed with status code %ld: %s\n", http_code, chunk.memory);
             } else {
@@ -231,13 +277,24 @@ int main(void) {
                 } else {
                     json_t *status_obj = json_object_get(root, "status");
                     json_t *logs_array = json_object_get(root, "logs");
+                    json_t *next_cursor_obj = json_object_get(root, "next_cursor");
+                    json_t *latest_seq_obj = json_object_get(root, "latest_seq");
 
                     if (json_is_string(status_obj) && strcmp(json_string_value(status_obj), "success") == 0 && json_is_array(logs_array)) {
-                        long current_total_logs = json_array_size(logs_array);
+                        long new_logs = json_array_size(logs_array); // Server only sends events after our cursor
+
+                        // A server restarted without its archive numbers events from 1 again, below our cursor
+                        if (json_is_integer(latest_seq_obj) && (long)json_integer_value(latest_seq_obj) < last_log_cursor) {
+                            long server_cursor = json_is_integer(next_cursor_obj) ? (long)json_integer_value(next_cursor_obj)
+                                                                                 : (long)json_integer_value(latest_seq_obj);
+                            fprintf(stderr, "Server log restarted (latest seq %ld < our cursor %ld); continuing from %ld.\n",
+                                    (long)json_integer_value(latest_seq_obj), last_log_cursor, server_cursor);
+                            last_log_cursor = server_cursor;
+                        }
 
-                        if (current_total_logs > last_log_entry_count) {
-                            // printf("\n--- Processing New Events (%ld total logs) ---\n", current_total_logs);
-                            for (long i = last_log_entry_count; i < current_total_logs; i++) {
+                        if (new_logs > 0) {
+                            // printf("\n--- Processing New Events (%ld new logs) ---\n", new_logs);
+                            for (long i = 0; i < new_logs; i++) {
                                 json_t *log_entry = json_array_get(logs_array, i);
                                 if (json_is_object(log_entry)) {
                                     json_t *ship_id_obj = json_object_get(log_entry, "ship_id");
@@ -280,7 +337,9 @@ int main(void) {
                                     }
                                 }
                             }
-                            last_log_entry_count = current_total_logs; // Update the count
+                            if (json_is_integer(next_cursor_obj)) {
+                                last_log_cursor = (long)json_integer_value(next_cursor_obj); // Resume after the last event we got
+                            }
                             // Re-print current active ships after updates
                             printf("\n--- Current Active Ships (%d total) ---\n", num_active_ships);
                             for (int i = 0; i < num_active_ships; i++) {
@@ -298,6 +357,7 @@ int main(void) {
                 }
             }
             curl_easy_cleanup(curl_handle);
+            curl_slist_free_all(poll_headers);
             free(chunk.memory); // Free the allocated memory for the response chunk
         } else {
             fprintf(stderr, "Error: Could not initialize curl handle.\n");
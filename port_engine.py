@@ -0,0 +1,368 @@
+# port_engine.py
+# Headless port simulation: zones, speeds, docking and terminals, with no rendering dependency.
+# ship_data.py is the pygame frontend over this engine; servers and tests can drive it directly.
+import datetime
+import math
+import random
+
+from terminals import TerminalManager # Indexed berth allocation
+
+# --- Constants ---
+SCREEN_WIDTH = 1200
+SCREEN_HEIGHT = 800
+
+# Port dimensions and positions
+PORT_WIDTH = 300
+PORT_HEIGHT = 280 # Adjusted for 7 terminals
+TERMINAL_COUNT = 7
+TERMINAL_HEIGHT = PORT_HEIGHT // TERMINAL_COUNT
+
+# Control Panel (left side)
+CONTROL_PANEL_X = 20
+CONTROL_PANEL_Y = 20
+CONTROL_PANEL_WIDTH = 280
+CONTROL_PANEL_HEIGHT = SCREEN_HEIGHT - 40 # Almost full height
+
+# Main Ocean/Simulation Area
+OCEAN_START_X = CONTROL_PANEL_X + CONTROL_PANEL_WIDTH + 10 # Ocean starts right of control panel
+OCEAN_WIDTH = SCREEN_WIDTH - OCEAN_START_X
+OCEAN_HEIGHT = SCREEN_HEIGHT
+
+# Center the port within the new ocean area
+PORT_X = OCEAN_START_X + (OCEAN_WIDTH // 2) - (PORT_WIDTH // 2)
+PORT_Y = SCREEN_HEIGHT // 2 - PORT_HEIGHT // 2
+PORT_CENTER_X = PORT_X + PORT_WIDTH // 2
+PORT_CENTER_Y = PORT_Y + PORT_HEIGHT // 2
+
+# Zone distances (from port's closest edge)
+RED_ZONE_DIST_PX = 100
+DARK_GREEN_ZONE_DIST_PX = 250
+LIGHT_GREEN_ZONE_DIST_PX = 400
+
+# Zone names, as reported to the server
+ZONE_OPEN_SEA = "Open Sea"
+ZONE_LIGHT_GREEN = "Light Green Zone"
+ZONE_DARK_GREEN = "Dark Green Zone"
+ZONE_RED = "Red Zone"
+ZONE_PARKED = "Parked"
+
+# Define a buffer zone around the port to ensure "open sea" is truly outside all gradient zones
+OPEN_SEA_BUFFER = 50 # pixels beyond the light green zone
+# These now refer to the actual ocean area bounds
+MIN_OPEN_SEA_X = OCEAN_START_X + 50
+MAX_OPEN_SEA_X = SCREEN_WIDTH - 50
+MIN_OPEN_SEA_Y = 0 + 50
+MAX_OPEN_SEA_Y = SCREEN_HEIGHT - 50
+
+# Assuming a generic ship size for spawning, or pass it in
+SHIP_WIDTH = 60
+SHIP_HEIGHT = 30
+SHIP_WIDTH_FOR_SPAWN = SHIP_WIDTH
+SHIP_HEIGHT_FOR_SPAWN = SHIP_HEIGHT
+
+# Movement for ships driven by step(dt) (those with a heading)
+PIXELS_PER_SECOND_PER_KMH = 0.5
+
+
+def get_random_open_sea_position(rng=random):
+    """Returns a random (x, y) coordinate for a ship to be entirely within open sea."""
+    while True:
+        # Choose a random point within the ocean area bounds, with some margin for the ship size
+        x = rng.randint(MIN_OPEN_SEA_X, MAX_OPEN_SEA_X - SHIP_WIDTH_FOR_SPAWN)
+        y = rng.randint(MIN_OPEN_SEA_Y, MAX_OPEN_SEA_Y - SHIP_HEIGHT_FOR_SPAWN)
+
+        # Calculate distance from the *center* of the potential ship position to the port center
+        ship_center_x = x + SHIP_WIDTH_FOR_SPAWN // 2
+        ship_center_y = y + SHIP_HEIGHT_FOR_SPAWN // 2
+        dist_to_port_center = ((ship_center_x - PORT_CENTER_X)**2 + (ship_center_y - PORT_CENTER_Y)**2)**0.5
+
+        # Ensure the point is outside the light green zone + buffer
+        if dist_to_port_center > LIGHT_GREEN_ZONE_DIST_PX + OPEN_SEA_BUFFER:
+            return x, y
+
+
+def build_terminals():
+    """Creates the terminal table: one entry per berth, stacked down the port."""
+    terminals = []
+    for i in range(TERMINAL_COUNT):
+        terminal_id = i + 1
+        capacity = 1 if terminal_id in [1, 2] else 1 # Simplified capacity for now
+        terminals.append({
+            'id': terminal_id,
+            'x': PORT_X,
+            'y': PORT_Y + i * TERMINAL_HEIGHT,
+            'width': PORT_WIDTH,
+            'height': TERMINAL_HEIGHT,
+            'capacity': capacity,
+            'occupied_by': None # Ship ID if occupied
+        })
+    return terminals
+
+
+def make_event_payload(ship_id, name, zone, speed_kmh, parked_terminal, event_type, timestamp, additional_data=None):
+    """Builds the event body sent to the server's /log_event(s) endpoints."""
+    payload = {
+        "ship_id": ship_id,
+        "ship_name": name,
+        "current_zone": zone,
+        "current_speed_kmh": round(speed_kmh, 1),
+        "timestamp": timestamp.isoformat(),
+        "event_type": event_type # e.g., "ship_deleted", "zone_change", "undocked"
+    }
+    if zone == ZONE_PARKED and parked_terminal: # Only add parked_terminal if actually parked
+        payload["parked_terminal"] = parked_terminal
+
+    if additional_data:
+        payload.update(additional_data) # Add any specific data for the event
+    return payload
+
+
+def parked_position(terminal, width, height, slot=0):
+    """Top-left position of a docked ship: at the right edge of the terminal, vertically centred.
+    Further slots of a multi-ship terminal line up to the left of the first."""
+    return (terminal['x'] + terminal['width'] - (width + 5) * (slot + 1),
+            int(terminal['y'] + terminal['height'] / 2 - height / 2))
+
+
+class ShipState:
+    """Simulation state of one ship on the map. Positions are the top-left corner, in pixels."""
+    # Fixed attribute set: no per-instance __dict__, which matters with thousands of ships
+    __slots__ = ("ship_id", "name", "arrival_time", "size", "unloading_time", "x", "y", "width", "height",
+                 "original_pos", "current_speed_kmh", "current_zone", "parked_terminal", "is_dragging",
+                 "heading", "last_dist_to_port_center", "movement_direction")
+
+    def __init__(self, ship_id, name, arrival_time, size, unloading_time, start_x, start_y, initial_speed=0,
+                 width=SHIP_WIDTH, height=SHIP_HEIGHT):
+        self.ship_id = ship_id
+        self.name = name
+        self.arrival_time = arrival_time # datetime object
+        self.size = size # e.g., 'small', 'medium', 'large'
+        self.unloading_time = unloading_time # hours (conceptual)
+        self.x = start_x
+        self.y = start_y
+        self.width = width
+        self.height = height
+        self.original_pos = (start_x, start_y) # Where to snap back to if parking fails
+
+        self.current_speed_kmh = initial_speed # Fabricated speed in km/h
+        self.current_zone = ZONE_OPEN_SEA # "Open Sea", "Light Green", "Dark Green", "Red Zone", "Parked"
+        self.parked_terminal = None
+        self.is_dragging = False
+        self.heading = None # Optional (dx, dy) unit vector: step(dt) moves the ship along it
+        self.last_dist_to_port_center = None # Track previous distance for movement direction
+        self.movement_direction = None # "incoming", "outgoing", or None
+
+    @property
+    def centerx(self):
+        return self.x + self.width // 2
+
+    @property
+    def centery(self):
+        return self.y + self.height // 2
+
+    def overlaps(self, x, y, width, height):
+        return self.x < x + width and x < self.x + self.width and self.y < y + height and y < self.y + self.height
+
+    def event_payload(self, event_type, timestamp, additional_data=None):
+        return make_event_payload(self.ship_id, self.name, self.current_zone, self.current_speed_kmh,
+                                  self.parked_terminal, event_type, timestamp, additional_data)
+
+
+class PortEngine:
+    """
+    The port simulation without any display.
+    Holds the active ships and terminals, applies the zone/speed/docking rules and reports
+    events through event_sink (a callable taking the event payload dict).
+    step(dt) advances the simulation; it can be called as fast as the caller likes.
+    """
+    def __init__(self, event_sink=None, clock=None, rng=None, verbose=False):
+        self.event_sink = event_sink
+        self.clock = clock or datetime.datetime.now # Source of event timestamps
+        self.rng = rng or random.Random()
+        self.verbose = verbose # Print what happens, like the interactive simulation does
+        self.terminals = TerminalManager(build_terminals())
+        self.terminals_data = self.terminals.terminals # Plain dicts, in berth order, for drawing
+        self.ships = {} # ship_id -> ShipState, ships currently on the map
+        self.sim_time = 0.0 # Seconds simulated so far
+
+    def log(self, message):
+        if self.verbose:
+            print(message)
+
+    def emit(self, ship, event_type, additional_data=None):
+        if self.event_sink:
+            self.event_sink(ship.event_payload(event_type, self.clock(), additional_data))
+
+    # --- Ships ---
+    def add_ship(self, ship):
+        self.ships[ship.ship_id] = ship
+        return ship
+
+    def delete_ship(self, ship):
+        """Removes a ship from the map (drag-to-delete), freeing its terminal."""
+        self.emit(ship, "ship_deleted")
+        self.release_terminal(ship)
+        self.ships.pop(ship.ship_id, None)
+
+    def start_drag(self, ship):
+        ship.is_dragging = True
+        # Store original position in case parking fails or for undocking
+        ship.original_pos = (ship.x, ship.y)
+
+    def stop_drag(self, ship):
+        ship.is_dragging = False
+
+    def move_ship(self, ship, x, y):
+        """Moves a ship (e.g. while dragged) and applies the zone rules at its new position."""
+        ship.x = x
+        ship.y = y
+        self.update_ship(ship)
+
+    def step(self, dt):
+        """Advances the simulation by dt seconds."""
+        self.sim_time += dt
+        for ship in list(self.ships.values()):
+            if ship.is_dragging: # Only update automatically if not dragging
+                continue
+            if ship.heading is not None and ship.current_zone != ZONE_PARKED:
+                ship.original_pos = (ship.x, ship.y)
+                distance = ship.current_speed_kmh * PIXELS_PER_SECOND_PER_KMH * dt
+                ship.x += ship.heading[0] * distance # Kept fractional; slow ships move less than a pixel a tick
+                ship.y += ship.heading[1] * distance
+            self.update_ship(ship)
+
+    # --- Zone, Speed and Docking Rules ---
+    def update_ship(self, ship):
+        # Calculate distance to port's center
+        dist_to_port_center = ((ship.centerx - PORT_CENTER_X)**2 + \
+                               (ship.centery - PORT_CENTER_Y)**2)**0.5
+
+        prev_zone = ship.current_zone
+
+        # Determine movement direction based on distance change
+        if ship.last_dist_to_port_center is not None:
+            if dist_to_port_center < ship.last_dist_to_port_center - 1: # Moving closer (with a small threshold)
+                ship.movement_direction = "incoming"
+            elif dist_to_port_center > ship.last_dist_to_port_center + 1: # Moving farther (with a small threshold)
+                ship.movement_direction = "outgoing"
+            else:
+                ship.movement_direction = None # Stationary or very slight movement
+
+        # Only update zone and speed if not parked
+        if ship.current_zone != ZONE_PARKED:
+            if dist_to_port_center <= RED_ZONE_DIST_PX:
+                ship.current_zone = ZONE_RED
+                if not ship.is_dragging: # Only auto-adjust speed if not actively dragging
+                    ship.current_speed_kmh = min(ship.current_speed_kmh, self.rng.uniform(5, 15)) # Slow down
+            elif dist_to_port_center <= DARK_GREEN_ZONE_DIST_PX:
+                ship.current_zone = ZONE_DARK_GREEN
+                if not ship.is_dragging:
+                    ship.current_speed_kmh = min(ship.current_speed_kmh, self.rng.uniform(15, 30))
+            elif dist_to_port_center <= LIGHT_GREEN_ZONE_DIST_PX:
+                ship.current_zone = ZONE_LIGHT_GREEN
+                if not ship.is_dragging:
+                    ship.current_speed_kmh = min(ship.current_speed_kmh, self.rng.uniform(30, 50))
+            else:
+                ship.current_zone = ZONE_OPEN_SEA
+                if not ship.is_dragging:
+                    ship.current_speed_kmh = max(ship.current_speed_kmh, self.rng.uniform(40, 70)) # Speed up if far
+        else: # If currently parked, no movement
+            ship.movement_direction = None
+
+        # Simulate parking if collision with port AND was dragging (or steering in) AND not already parked
+        approaching = ship.is_dragging or ship.heading is not None
+        if approaching and ship.current_zone != ZONE_PARKED and ship.overlaps(PORT_X, PORT_Y, PORT_WIDTH, PORT_HEIGHT):
+            # Attempt to park
+            terminal = self.get_available_terminal(ship)
+            if terminal:
+                self.dock(ship, terminal)
+            else:
+                # No available terminal, can't park here
+                self.log(f"No available terminal for Ship {ship.name}. Cannot park.")
+                # Snap back to previous position and stop dragging
+                ship.x, ship.y = ship.original_pos
+                self.stop_drag(ship)
+                # If it snaps back, its movement direction should revert to what it was before attempting to park
+                # This requires more complex state, for now, just reset to None
+                ship.movement_direction = None
+
+        # If zone changed, "send API data" (only if not parked, or if newly parked)
+        if prev_zone != ship.current_zone:
+            # Only send zone_change if it's not the initial parking event
+            # or if it's specifically transitioning *out* of parked state
+            if ship.current_zone != ZONE_PARKED or prev_zone == ZONE_PARKED:
+                self.emit(ship, "zone_change")
+                self.log(f"Ship {ship.name} entered {ship.current_zone}")
+
+        ship.last_dist_to_port_center = dist_to_port_center # Update last distance for next frame
+
+    # --- Terminals ---
+    def get_available_terminal(self, ship):
+        # Find the nearest terminal with a free slot
+        return self.terminals.nearest_free(ship.centery)
+
+    def parked_terminal_position(self, ship, terminal_id, slot=0):
+        # Calculate the position to snap the ship to once parked
+        terminal = self.terminals.get(terminal_id)
+        if terminal is None:
+            return (0,0) # Should not happen
+        return parked_position(terminal, ship.width, ship.height, slot)
+
+    def dock(self, ship, terminal):
+        ship.current_zone = ZONE_PARKED
+        ship.current_speed_kmh = 0
+        ship.parked_terminal = terminal['id']
+        slot = self.terminals.occupy(terminal, ship.ship_id)
+        ship.x, ship.y = self.parked_terminal_position(ship, terminal['id'], slot)
+        self.stop_drag(ship) # Stop dragging once parked
+        ship.heading = None
+        ship.movement_direction = None # No movement when parked
+        self.log(f"Ship {ship.name} (ID:{ship.ship_id}) parked at Terminal {ship.parked_terminal}")
+        self.emit(ship, "docked", {"terminal_id": ship.parked_terminal}) # API call for docking
+
+    def release_terminal(self, ship):
+        return self.terminals.release(ship.ship_id)
+
+    def undock(self, ship):
+        """Releases the ship's terminal and puts it back out in the Light Green Zone. Returns False if it was not parked."""
+        if ship.current_zone != ZONE_PARKED:
+            return False
+        self.log(f"Undocking selected ship {ship.name} (ID:{ship.ship_id}) from terminal {ship.parked_terminal}")
+
+        # Make API call for leaving the terminal
+        self.emit(ship, "undocked", {"terminal_id": ship.parked_terminal})
+
+        # Release terminal
+        self.release_terminal(ship)
+
+        ship.parked_terminal = None
+        ship.current_zone = ZONE_LIGHT_GREEN # User requested "green area"
+        ship.current_speed_kmh = self.rng.uniform(40, 70) # Give it some speed
+
+        # Place ship in the Light Green Zone (circular annulus)
+        min_dist_for_green_zone = DARK_GREEN_ZONE_DIST_PX + 20 # Just outside dark green
+        max_dist_for_green_zone = LIGHT_GREEN_ZONE_DIST_PX - 20 # Just inside light green
+
+        # Randomly pick a distance within the light green zone range
+        # Ensure min_dist is less than max_dist to avoid errors if zones are too close
+        if min_dist_for_green_zone >= max_dist_for_green_zone:
+            # Fallback if zones overlap too much, pick a point near the center of the outer green zone
+            target_dist = (DARK_GREEN_ZONE_DIST_PX + LIGHT_GREEN_ZONE_DIST_PX) / 2
+        else:
+            target_dist = self.rng.uniform(min_dist_for_green_zone, max_dist_for_green_zone)
+
+        # Randomly pick an angle (0 to 2*pi radians)
+        angle = self.rng.uniform(0, 2 * math.pi)
+
+        # Calculate new coordinates
+        new_x = PORT_CENTER_X + target_dist * math.cos(angle) - ship.width // 2
+        new_y = PORT_CENTER_Y + target_dist * math.sin(angle) - ship.height // 2
+
+        # Ensure it stays within screen bounds (basic check for the whole ocean area)
+        new_x = max(OCEAN_START_X, min(new_x, SCREEN_WIDTH - ship.width))
+        new_y = max(0, min(new_y, SCREEN_HEIGHT - ship.height))
+
+        ship.x, ship.y = int(new_x), int(new_y)
+        ship.movement_direction = "outgoing" # Set direction for subsequent zone calls
+        self.emit(ship, "zone_change") # Update status via API (now in light green)
+        return True
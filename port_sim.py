@@ -0,0 +1,246 @@
+# port_sim.py
+# Discrete-event fast-forward simulation: jumps from event to event instead of ticking at 60 FPS,
+# so weeks of port traffic replay in seconds. Emits the same event payloads as the interactive
+# simulation (zone_change, docked, undocked, ship_deleted), stamped with simulated time.
+import argparse
+import collections # For Counter
+import datetime
+import heapq # The event queue
+import random
+import time
+
+from port_engine import (
+    RED_ZONE_DIST_PX, DARK_GREEN_ZONE_DIST_PX, LIGHT_GREEN_ZONE_DIST_PX,
+    PORT_Y, PORT_HEIGHT, SHIP_HEIGHT,
+    ZONE_OPEN_SEA, ZONE_LIGHT_GREEN, ZONE_DARK_GREEN, ZONE_RED, ZONE_PARKED,
+    build_terminals, make_event_payload,
+)
+from terminals import TerminalManager
+
+# Map scale for travel times: how many km one pixel of the port map stands for
+KM_PER_PIXEL = 0.05 # 400 px Light Green radius = 20 km
+PORT_APPROACH_DIST_PX = 30 # From the Red Zone's inner edge to a berth
+
+# Zone bands a ship passes through on its way in: (zone, outer radius px, inner radius px, speed range km/h)
+# Speeds follow PortEngine.update_ship: capped near the port, faster further out.
+APPROACH_BANDS = (
+    (ZONE_LIGHT_GREEN, LIGHT_GREEN_ZONE_DIST_PX, DARK_GREEN_ZONE_DIST_PX, (30, 50)),
+    (ZONE_DARK_GREEN, DARK_GREEN_ZONE_DIST_PX, RED_ZONE_DIST_PX, (15, 30)),
+    (ZONE_RED, RED_ZONE_DIST_PX, PORT_APPROACH_DIST_PX, (5, 15)),
+)
+OPEN_SEA_SPEED_RANGE = (40, 70)
+
+# Internal event kinds (ordered so that, at the same instant, berths free up before new ships ask for them)
+EVENT_UNLOADED = 0 # Unloading finished: undock and head out
+EVENT_DEPART = 1 # Left the Light Green Zone on the way out
+EVENT_ARRIVAL = 2 # Reached the Light Green Zone boundary (the ship's arrival_time)
+EVENT_ZONE = 3 # Crossed into the next approach band
+EVENT_AT_PORT = 4 # Reached the port: dock or wait for a berth
+
+
+class SimShip:
+    """Per-ship state of the discrete-event simulation."""
+    __slots__ = ("ship_id", "name", "arrival", "unloading_hours", "zone", "speed", "band",
+                 "terminal_id", "approach_y", "queued_at")
+
+    def __init__(self, ship_id, name, arrival, unloading_hours, approach_y):
+        self.ship_id = ship_id
+        self.name = name
+        self.arrival = arrival # datetime the ship reaches the Light Green Zone
+        self.unloading_hours = unloading_hours
+        self.zone = ZONE_OPEN_SEA
+        self.speed = 0.0
+        self.band = -1 # Index into APPROACH_BANDS
+        self.terminal_id = None
+        self.approach_y = approach_y # Vertical position it reaches the port at (picks the nearest berth)
+        self.queued_at = None # When it started waiting for a berth
+
+
+class PortSimulator:
+    """
+    Event-driven port: a heap of (time, kind, seq, ship_id) entries processed in time order.
+    Arrivals, zone crossings, docking, unloading completion and undocking are all scheduled
+    events; nothing happens between them, so the clock jumps straight to the next one.
+    Ships that reach a full port wait in the Red Zone and take the next berth to free up (first come, first served).
+    """
+    def __init__(self, event_sink=None, terminals=None, seed=None):
+        self.event_sink = event_sink
+        self.rng = random.Random(seed)
+        self.terminals = TerminalManager(terminals if terminals is not None else build_terminals())
+        self.ships = {} # ship_id -> SimShip, until it leaves
+        self.now = None # Simulated datetime of the event being processed
+        self._events = []
+        self._seq = 0 # Tie-breaker for events at the same time and kind
+        self._waiting = collections.deque() # Ships at the port with no free berth, in arrival order
+        self.events_processed = 0
+        self.emitted = collections.Counter()
+        self.total_wait_hours = 0.0
+        self.max_queue = 0
+
+    # --- Setup ---
+    def add_ship(self, ship_id, name, arrival_time, unloading_hours):
+        approach_y = self.rng.uniform(PORT_Y, PORT_Y + PORT_HEIGHT - SHIP_HEIGHT) + SHIP_HEIGHT // 2
+        ship = SimShip(ship_id, name, arrival_time, unloading_hours, approach_y)
+        ship.speed = self.rng.uniform(*OPEN_SEA_SPEED_RANGE)
+        self.ships[ship_id] = ship
+        self._schedule(arrival_time, EVENT_ARRIVAL, ship_id)
+        return ship
+
+    def add_random_ships(self, count, start_time, span_hours, first_id=1):
+        """Ships with arrivals spread uniformly over span_hours and 4-24 h unloading, like the UI's random ships."""
+        for i in range(count):
+            arrival = start_time + datetime.timedelta(hours=self.rng.uniform(0, span_hours))
+            self.add_ship(first_id + i, f"Ship-{first_id + i}", arrival, self.rng.randint(4, 24))
+
+    # --- Running ---
+    def run(self, until=None, max_events=None):
+        """Processes events in time order until the queue is empty, `until` (datetime) or max_events. Returns the count."""
+        processed = 0
+        while self._events and (max_events is None or processed < max_events):
+            if until is not None and self._events[0][0] > until:
+                break
+            self.step()
+            processed += 1
+        return processed
+
+    def step(self):
+        """Processes the next event."""
+        event_time, kind, _, ship_id = heapq.heappop(self._events)
+        self.now = event_time
+        self.events_processed += 1
+        ship = self.ships.get(ship_id)
+        if ship is None:
+            return
+        if kind == EVENT_ARRIVAL:
+            self._enter_band(ship, 0)
+        elif kind == EVENT_ZONE:
+            self._enter_band(ship, ship.band + 1)
+        elif kind == EVENT_AT_PORT:
+            self._reach_port(ship)
+        elif kind == EVENT_UNLOADED:
+            self._undock(ship)
+        elif kind == EVENT_DEPART:
+            self._depart(ship)
+
+    def get_stats(self):
+        return {
+            "sim_time": self.now.isoformat() if self.now else None,
+            "events_processed": self.events_processed,
+            "pending_events": len(self._events),
+            "emitted": dict(self.emitted),
+            "ships_in_port_area": len(self.ships),
+            "waiting_for_berth": len(self._waiting),
+            "max_waiting_for_berth": self.max_queue,
+            "total_wait_hours": round(self.total_wait_hours, 2),
+        }
+
+    # --- Event Handlers ---
+    def _enter_band(self, ship, band):
+        if band >= len(APPROACH_BANDS):
+            self._schedule_after(ship, 0, EVENT_AT_PORT)
+            return
+        zone, outer, inner, speed_range = APPROACH_BANDS[band]
+        ship.band = band
+        ship.zone = zone
+        ship.speed = min(ship.speed, self.rng.uniform(*speed_range)) # Slow down approaching the port
+        self._emit(ship, "zone_change")
+        next_kind = EVENT_ZONE if band + 1 < len(APPROACH_BANDS) else EVENT_AT_PORT
+        self._schedule_after(ship, self._travel_hours(outer - inner, ship.speed), next_kind)
+
+    def _reach_port(self, ship):
+        terminal = self.terminals.nearest_free(ship.approach_y)
+        if terminal is None:
+            ship.queued_at = self.now
+            ship.speed = 0.0 # At anchor in the Red Zone
+            self._waiting.append(ship)
+            self.max_queue = max(self.max_queue, len(self._waiting))
+            return
+        self._dock(ship, terminal)
+
+    def _dock(self, ship, terminal):
+        if ship.queued_at is not None:
+            self.total_wait_hours += (self.now - ship.queued_at).total_seconds() / 3600
+            ship.queued_at = None
+        self.terminals.occupy(terminal, ship.ship_id)
+        ship.terminal_id = terminal['id']
+        ship.zone = ZONE_PARKED
+        ship.speed = 0.0
+        self._emit(ship, "docked", {"terminal_id": ship.terminal_id})
+        self._schedule_after(ship, ship.unloading_hours, EVENT_UNLOADED)
+
+    def _undock(self, ship):
+        # Same pair of events as PortEngine.undock: "undocked" while still parked, then back in the Light Green Zone
+        self._emit(ship, "undocked", {"terminal_id": ship.terminal_id})
+        self.terminals.release(ship.ship_id)
+        ship.terminal_id = None
+        ship.zone = ZONE_LIGHT_GREEN
+        ship.speed = self.rng.uniform(*OPEN_SEA_SPEED_RANGE)
+        self._emit(ship, "zone_change")
+        self._schedule_after(ship, self._travel_hours(LIGHT_GREEN_ZONE_DIST_PX - DARK_GREEN_ZONE_DIST_PX, ship.speed),
+                             EVENT_DEPART)
+
+        # The freed berth goes to the ship that has waited longest
+        if self._waiting:
+            waiting_ship = self._waiting.popleft()
+            self._dock(waiting_ship, self.terminals.nearest_free(waiting_ship.approach_y))
+
+    def _depart(self, ship):
+        ship.zone = ZONE_OPEN_SEA
+        self._emit(ship, "zone_change")
+        self._emit(ship, "ship_deleted", {"reason": "departed"}) # Gone from the map
+        del self.ships[ship.ship_id]
+
+    # --- Helpers ---
+    def _travel_hours(self, distance_px, speed_kmh):
+        return distance_px * KM_PER_PIXEL / max(speed_kmh, 1.0)
+
+    def _schedule(self, when, kind, ship_id):
+        self._seq += 1
+        heapq.heappush(self._events, (when, kind, self._seq, ship_id))
+
+    def _schedule_after(self, ship, hours, kind):
+        self._schedule(self.now + datetime.timedelta(hours=hours), kind, ship.ship_id)
+
+    def _emit(self, ship, event_type, additional_data=None):
+        self.emitted[event_type] += 1
+        if self.event_sink:
+            self.event_sink(make_event_payload(ship.ship_id, ship.name, ship.zone, ship.speed, ship.terminal_id,
+                                               event_type, self.now, additional_data))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fast-forward port simulation (discrete-event).")
+    parser.add_argument("--ships", type=int, default=80, help="Number of ships to simulate")
+    parser.add_argument("--days", type=float, default=7, help="Arrivals are spread over this many days")
+    parser.add_argument("--start", default=None, help="Simulated start time, ISO format (default: now)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--server", default=None,
+                        help="Base URL of the FastAPI server (e.g. http://127.0.0.1:8000) to post the events to")
+    args = parser.parse_args()
+
+    sender = None
+    if args.server:
+        from telemetry import TelemetrySender
+        sender = TelemetrySender(f"{args.server}/log_events", max_queue_size=5000, batch_size=500, batch_interval=0.1, timeout=10)
+        sender.start()
+
+    start_time = datetime.datetime.fromisoformat(args.start) if args.start else datetime.datetime.now()
+    sim = PortSimulator(event_sink=(lambda payload: sender.submit(payload, block=True)) if sender else None, seed=args.seed)
+    sim.add_random_ships(args.ships, start_time, args.days * 24)
+
+    started = time.perf_counter()
+    sim.run()
+    elapsed = time.perf_counter() - started
+    if sender:
+        sender.stop(timeout=60)
+        print(sender.format_stats())
+
+    stats = sim.get_stats()
+    print(f"Simulated {args.ships} ships up to {stats['sim_time']}: {stats['events_processed']} events "
+          f"in {elapsed:.2f} s ({stats['events_processed'] / max(elapsed, 1e-9):,.0f} events/s)")
+    print(f"Emitted: {stats['emitted']}")
+    print(f"Berth queue: max {stats['max_waiting_for_berth']} ships waiting, {stats['total_wait_hours']} ship-hours waited")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,22 @@
 # fastapi_server.py
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI, Request, Response, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 import uvicorn
+import asyncio
 import datetime
 import json
 import collections # For deque
+import gzip
+import logging
+import os
+import uuid
+import zlib
+from log_store import LogStore, LogBacklogFull, LogBatchTooLarge, InvalidEvent, SQLiteEventArchive, dumps_bytes, event_error
+from fleet_state import FleetState
+from berth_scheduler import BerthScheduler
+from port_engine import build_terminals
+from structured_log import setup_logger
 
 app = FastAPI(
     title="Port Data Logger & Messenger",
@@ -12,12 +24,198 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# --- Server Logging Settings ---
+# Console output is formatted and written by a background thread, never on the request path.
+# PORT_SERVER_LOG_FORMAT: "json" (compact JSON lines), "text" (readable) or "off"
+SERVER_LOG_LEVEL = os.environ.get("PORT_SERVER_LOG_LEVEL", "INFO")
+SERVER_LOG_FORMAT = os.environ.get("PORT_SERVER_LOG_FORMAT", "json")
+logger, log_listener = setup_logger("port_server", level=SERVER_LOG_LEVEL, fmt=SERVER_LOG_FORMAT)
+
+# --- Log Store Settings ---
+# The newest LOG_MEMORY_EVENTS events stay in RAM; older ones spill to mmap-read segment files
+LOG_MEMORY_EVENTS = int(os.environ.get("PORT_LOG_MEMORY_EVENTS", 10000))
+LOG_SEGMENT_BYTES = int(os.environ.get("PORT_LOG_SEGMENT_BYTES", 16 * 1024 * 1024))
+LOG_SEGMENT_DIR = os.environ.get("PORT_LOG_SEGMENT_DIR", "port_log_segments")
+# Filtered queries are indexed over the newest LOG_INDEX_EVENTS events; older ones are scanned from disk
+LOG_INDEX_EVENTS = int(os.environ.get("PORT_LOG_INDEX_EVENTS", 10 * LOG_MEMORY_EVENTS))
+# With PORT_LOG_DB, events the database has not committed yet stay in RAM; past this many, ingest answers 503
+# (and a /log_events batch bigger than this answers 413)
+LOG_MAX_MEMORY_EVENTS = int(os.environ.get("PORT_LOG_MAX_MEMORY_EVENTS", 10 * LOG_MEMORY_EVENTS))
+# Optional durable backend: set to a SQLite file path (e.g. port_events.db) to keep the log across restarts
+LOG_DB_PATH = os.environ.get("PORT_LOG_DB", "")
+
 #memory storage for the logs from pygame - p
-log_data = []
+# Every logged event gets a monotonic sequence number ("seq"), starting at 1.
+log_archive = SQLiteEventArchive(LOG_DB_PATH) if LOG_DB_PATH else None
+log_store = LogStore(LOG_SEGMENT_DIR, memory_events=LOG_MEMORY_EVENTS, segment_bytes=LOG_SEGMENT_BYTES, archive=log_archive,
+                     max_memory_events=LOG_MAX_MEMORY_EVENTS, index_events=LOG_INDEX_EVENTS)
+
+# Current state per ship, updated on every logged event (served by /ship_states)
+fleet_state = FleetState()
+if log_archive is not None:
+    fleet_state.load(log_archive.latest_per_ship(), log_store.last_seq)
+    logger.info("Loaded event log", extra={"fields": {"db": LOG_DB_PATH, "last_seq": log_store.last_seq, "ships": len(fleet_state.ships)}})
+DEFAULT_LOGS_LIMIT = 500 # Page size for /get_logs when no limit is given
+MAX_LOGS_LIMIT = 5000
+
+# --- Conditional GET and Compression for Polling Endpoints ---
+# ETags are derived from the log seq (or a message version) plus a per-process id, so a restart
+# without the SQLite backend (seq starting over) can never produce a false 304.
+SERVER_INSTANCE_ID = uuid.uuid4().hex[:8]
+COMPRESS_MIN_BYTES = 1024 # Smaller bodies are not worth compressing
+
+def make_etag(*parts):
+    return 'W/"' + "-".join(str(part) for part in (SERVER_INSTANCE_ID,) + parts) + '"'
+
+def etag_matches(request, etag):
+    """True if the request's If-None-Match covers etag (weak comparison)."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag.removeprefix("W/") for tag in tags)
+
+def negotiate_encoding(request):
+    """Picks gzip or deflate from Accept-Encoding, or None for an uncompressed body."""
+    accepted = set()
+    for item in request.headers.get("accept-encoding", "").lower().split(","):
+        name, _, params = item.strip().partition(";")
+        if params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(name.strip())
+    if "gzip" in accepted:
+        return "gzip"
+    if "deflate" in accepted:
+        return "deflate"
+    return None
+
+def compress_body(body, encoding):
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    return zlib.compress(body, 6) # HTTP "deflate" is the zlib format
+
+def polling_response(request, etag, get_body, allow_not_modified=True):
+    """
+    304 Not Modified if the client already has this etag; otherwise the body (from get_body(encoding)),
+    compressed when the client accepts it and the body is large enough.
+    """
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if allow_not_modified and etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    body, encoding = get_body(negotiate_encoding(request))
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def encoded_variant(variants, encoding):
+    """Returns (body, encoding) from variants (encoding -> bytes, with the plain body under None), compressing once on demand."""
+    plain = variants[None]
+    if encoding is None or len(plain) < COMPRESS_MIN_BYTES:
+        return plain, None
+    if encoding not in variants:
+        variants[encoding] = compress_body(plain, encoding)
+    return variants[encoding], encoding
+
+# Encoded /get_logs bodies, valid until the next append (keyed on the query; flushed when last_seq moves)
+LOGS_RESPONSE_CACHE_SIZE = 64
+logs_response_cache = collections.OrderedDict()
+logs_response_cache_seq = 0
+
+def cached_logs_response(request, key, build_body):
+    """
+    Returns the response for key at the current log seq. The encoded body (and its compressed
+    variants) is cached until the next append; unchanged polls with a matching ETag get a 304.
+    """
+    global logs_response_cache_seq
+    if logs_response_cache_seq != log_store.last_seq:
+        logs_response_cache.clear()
+        logs_response_cache_seq = log_store.last_seq
+
+    def get_body(encoding):
+        variants = logs_response_cache.get(key)
+        if variants is None:
+            variants = logs_response_cache[key] = {None: build_body()}
+            if len(logs_response_cache) > LOGS_RESPONSE_CACHE_SIZE:
+                logs_response_cache.popitem(last=False)
+        return encoded_variant(variants, encoding)
+    return polling_response(request, make_etag("logs", log_store.last_seq, *key), get_body)
+
+def encode_logs_body(raw_events, next_cursor, latest_seq):
+    """Builds the /get_logs JSON body around events that are already encoded, without re-encoding them."""
+    return (b'{"status":"success","logs":[' + b",".join(raw_events) +
+            b'],"next_cursor":' + str(next_cursor).encode() + b',"latest_seq":' + str(latest_seq).encode() + b"}")
+
+# Live log subscribers (SSE and WebSocket streams)
+SUBSCRIBER_QUEUE_SIZE = 256 # Events buffered per subscriber before it falls back to catching up from the log
+STREAM_CATCHUP_CHUNK = 500 # Events read from the log per catch-up step
+STREAM_KEEPALIVE_SECONDS = 15
+log_subscribers = set()
+
+class LogSubscriber:
+    """
+    One live stream consumer.
+    Newly logged events are pushed into a bounded queue. If the subscriber is too slow and the
+    queue fills up, the queue is dropped and the subscriber re-reads the missed events from the
+    log itself (needs_catchup), so ingest never waits on it and it never loses events.
+    """
+    def __init__(self, since):
+        self.cursor = min(since, log_store.last_seq) # seq of the last event delivered to this subscriber
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.needs_catchup = self.cursor < log_store.last_seq
+
+    def push(self, events):
+        if self.needs_catchup:
+            return # Will be read from the log
+        for event in events:
+            try:
+                self.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Too slow: forget the buffered events, they will be re-read from the log
+                while not self.queue.empty():
+                    self.queue.get_nowait()
+                self.needs_catchup = True
+                return
+
+    async def next_events(self, timeout):
+        """Returns the next events after the cursor, or [] if nothing arrived within timeout."""
+        if self.needs_catchup:
+            events = read_events(self.cursor, STREAM_CATCHUP_CHUNK)
+            if not events or events[-1]["seq"] >= log_store.last_seq:
+                self.needs_catchup = False # Caught up; live events arrive through the queue again
+        else:
+            try:
+                events = [await asyncio.wait_for(self.queue.get(), timeout)]
+            except asyncio.TimeoutError:
+                return []
+            while not self.queue.empty():
+                events.append(self.queue.get_nowait())
+        events = [event for event in events if event["seq"] > self.cursor]
+        if events:
+            self.cursor = events[-1]["seq"]
+        return events
+
+def append_events(events):
+    """
+    Assigns sequence numbers to the events, appends them to the log in one operation,
+    updates the fleet state view and pushes the events to live subscribers.
+    """
+    log_store.append(events)
+    for event in events:
+        fleet_state.apply(event)
+    for subscriber in log_subscribers:
+        subscriber.push(events)
+
+def read_events(since, limit):
+    """Returns up to `limit` events with seq > since, oldest first."""
+    return log_store.read_events(since, limit)
 
 # In-memory storage for messages from C client to Pygame
 # Using a deque to keep a limited number of recent messages
 pygame_messages = collections.deque(maxlen=10) # Store last 10 messages
+# Long-polling readers of /get_messages_for_pygame park on this until a message arrives
+pygame_messages_condition = asyncio.Condition()
+MAX_MESSAGE_WAIT_SECONDS = 60
+EMPTY_MESSAGES_BODY = dumps_bytes({"status": "success", "messages": []})
+pygame_messages_version = 0 # Bumped on every new message; used as the ETag of /get_messages_for_pygame
 
 # Configure CORS
 app.add_middleware(
@@ -45,31 +243,278 @@ async def log_event(request: Request):
     """
     try:
         data = await request.json()
+        error = event_error(data)
+        if error is not None:
+            raise InvalidEvent(error)
 
         # Add server-received timestamp
         data["server_received_timestamp"] = datetime.datetime.now().isoformat()
 
-        # Append to log_data
-        log_data.append(data)
-        print(f"\n--- LOGGED EVENT ({data['server_received_timestamp']}) ---")
-        print(json.dumps(data, indent=2))
-        print("---------------------------------------------")
+        # Append to the log store (also assigns data["seq"])
+        append_events([data])
+        logger.info("LOGGED EVENT", extra={"fields": {"event": data}})
 
         return {"status": "success", "message": "Event received and logged."}
+    except InvalidEvent as e:
+        logger.warning("Rejected invalid event", extra={"fields": {"client": request.client.host, "endpoint": "/log_event", "error": str(e)}})
+        raise HTTPException(status_code=400, detail=str(e))
+    except LogBacklogFull as e:
+        raise HTTPException(status_code=503, detail=f"Event log is not accepting events: {e}")
     except json.JSONDecodeError:
-        print(f"Error: Received invalid JSON from {request.client.host}")
+        logger.warning("Received invalid JSON", extra={"fields": {"client": request.client.host, "endpoint": "/log_event"}})
         raise HTTPException(status_code=400, detail="Invalid JSON payload.")
     except Exception as e:
-        print(f"An unexpected error occurred in /log_event: {e}")
+        logger.error("An unexpected error occurred in /log_event", extra={"fields": {"error": str(e)}})
         raise HTTPException(status_code=500, detail=f"Server error: {e}")
 
+@app.post("/log_events")
+async def log_events(request: Request):
+    """
+    Batch version of /log_event for clients reporting many events at once.
+    Accepts either a JSON array of event objects or an NDJSON body (one event object per line).
+    All accepted events share one server_received_timestamp and are appended in one operation.
+    With PORT_LOG_DB a batch may hold at most LOG_MAX_MEMORY_EVENTS events (413 otherwise).
+    Responds with a per-item status so the client can retry only the items that failed:
+    {
+        "status": "success" | "partial" | "error",
+        "accepted": int,
+        "rejected": int,
+        "results": [{"index": int, "status": "ok", "seq": int} | {"index": int, "status": "error", "detail": str}]
+    }
+    """
+    try:
+        body = (await request.body()).decode("utf-8")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Request body must be UTF-8.")
+
+    # A JSON array starts with '['; anything else is treated as NDJSON
+    items = []
+    if body.lstrip().startswith("["):
+        try:
+            parsed = json.loads(body)
+        except json.JSONDecodeError:
+            logger.warning("Received invalid JSON array", extra={"fields": {"client": request.client.host, "endpoint": "/log_events"}})
+            raise HTTPException(status_code=400, detail="Invalid JSON payload.")
+        items = [(item, None) for item in parsed]
+    else:
+        for line in body.splitlines():
+            if not line.strip():
+                continue # Skip blank lines between records
+            try:
+                items.append((json.loads(line), None))
+            except json.JSONDecodeError as e:
+                items.append((None, f"Invalid JSON: {e.msg}"))
+
+    received_timestamp = datetime.datetime.now().isoformat() # Stamped once per batch
+    accepted = []
+    results = []
+    for index, (item, error) in enumerate(items):
+        if error is None:
+            error = event_error(item)
+        if error is not None:
+            results.append({"index": index, "status": "error", "detail": error})
+            continue
+        item["server_received_timestamp"] = received_timestamp
+        accepted.append(item)
+        results.append({"index": index, "status": "ok"})
+
+    try:
+        append_events(accepted) # One append for the whole batch
+    except LogBatchTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except LogBacklogFull as e:
+        raise HTTPException(status_code=503, detail=f"Event log is not accepting events: {e}")
+    ok_results = [result for result in results if result["status"] == "ok"]
+    for result, event in zip(ok_results, accepted):
+        result["seq"] = event["seq"]
+    rejected = len(results) - len(accepted)
+    logger.info("LOGGED BATCH", extra={"fields": {"server_received_timestamp": received_timestamp, "accepted": len(accepted), "rejected": rejected}})
+    if accepted and logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Batch events", extra={"fields": {"events": accepted}})
+
+    if not rejected:
+        status = "success"
+    elif accepted:
+        status = "partial"
+    else:
+        status = "error"
+    return {"status": status, "accepted": len(accepted), "rejected": rejected, "results": results}
+
 @app.get("/get_logs")
-async def get_logs():
+async def get_logs(request: Request, since: int = 0, limit: int = DEFAULT_LOGS_LIMIT, full: bool = False):
     """
-    Retrieves all stored log data for polling by C client.
+    Retrieves log data for polling by C client.
+    Incremental by default: returns up to `limit` events with seq > `since`, plus
+    `next_cursor` to pass as `since` on the next poll (it equals `since` when nothing is new).
+    `full=true` returns the whole history in one response (the old behavior).
+    Send the returned ETag back as If-None-Match to get an empty 304 while nothing has changed.
     """
     # print(f"\n--- Logs requested by C client ({datetime.datetime.now().isoformat()}) ---")
-    return {"status": "success", "logs": log_data}
+    # Served from pre-encoded event bytes; repeated polls with no new events reuse the cached body
+    last_seq = log_store.last_seq
+    if full:
+        return cached_logs_response(request, ("full",), lambda: encode_logs_body(log_store.read_raw(0, last_seq), last_seq, last_seq))
+
+    since = max(0, min(since, last_seq))
+    limit = max(1, min(limit, MAX_LOGS_LIMIT))
+
+    def build_body():
+        raw_events = log_store.read_raw(since, limit)
+        next_cursor = since + len(raw_events) # seqs are contiguous
+        return encode_logs_body(raw_events, next_cursor, last_seq)
+    return cached_logs_response(request, (since, limit), build_body)
+
+@app.get("/logs")
+async def query_logs(ship_id: int = None, event_type: str = None, zone: str = None,
+                     start: str = None, end: str = None, last_minutes: float = None,
+                     since: int = 0, limit: int = DEFAULT_LOGS_LIMIT):
+    """
+    Filtered query over the event log, e.g. /logs?ship_id=12, /logs?event_type=emergency
+    or /logs?last_minutes=10. Filters combine with AND:
+      ship_id, event_type, zone (current_zone),
+      start / end (ISO timestamps, inclusive, against server_received_timestamp),
+      last_minutes (shorthand for start = now - N minutes).
+    Results are oldest first, after seq `since`; pass `next_cursor` as `since` for the next page.
+    """
+    try:
+        start_time = datetime.datetime.fromisoformat(start).timestamp() if start else None
+        end_time = datetime.datetime.fromisoformat(end).timestamp() if end else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start/end must be ISO timestamps (YYYY-MM-DDTHH:MM:SS).")
+    if last_minutes is not None:
+        start_time = (datetime.datetime.now() - datetime.timedelta(minutes=last_minutes)).timestamp()
+
+    limit = max(1, min(limit, MAX_LOGS_LIMIT))
+    logs = log_store.query(ship_id=ship_id, event_type=event_type, zone=zone,
+                           start_time=start_time, end_time=end_time, after_seq=max(0, since), limit=limit)
+    next_cursor = logs[-1]["seq"] if logs else since
+    return {"status": "success", "logs": logs, "count": len(logs), "next_cursor": next_cursor}
+
+@app.get("/ship_states")
+async def get_ship_states(request: Request, since_version: int = None):
+    """
+    Current state of every ship on the map: zone, speed, parked terminal, last event and last seen.
+    With since_version=<version> only ships that changed after it are returned, plus the ids of
+    ships removed after it. Use the returned `version` for the next call. If `full` is true the
+    response is a complete snapshot and the client should replace its state.
+    Supports If-None-Match / ETag like /get_logs.
+    """
+    def get_body(encoding):
+        return encoded_variant({None: dumps_bytes({"status": "success", **fleet_state.snapshot(since_version)})}, encoding)
+    return polling_response(request, make_etag("ships", fleet_state.version, since_version), get_body)
+
+# --- Berth Planning ---
+latest_berth_plan = None # Encoded variants of the last plan computed by POST /berth_plan
+berth_plan_version = 0
+
+def plan_berths(ships, terminals, start_time):
+    """Runs the berth scheduler over the posted ships (called in a worker thread)."""
+    scheduler = BerthScheduler(terminals, start_time=start_time)
+    for ship in ships:
+        scheduler.set_ship(ship["ship_id"], ship.get("ship_name", f"Ship {ship['ship_id']}"),
+                           datetime.datetime.fromisoformat(ship["arrival_time"]), float(ship["unloading_time"]))
+    return {"status": "success", "summary": scheduler.summary(), "assignments": scheduler.get_plan()}
+
+@app.post("/berth_plan")
+async def compute_berth_plan(request: Request):
+    """
+    Computes a berth plan that keeps total waiting time low, and keeps it for GET /berth_plan.
+    Expected data: {"ships": [{"ship_id": 1, "ship_name": "Ship-A", "arrival_time": "2025-07-01T14:20:00",
+                               "unloading_time": 6}, ...],
+                    "terminals": [{"id": 1, "capacity": 1}, ...],   (optional, defaults to the port's terminals)
+                    "start_time": "2025-07-01T12:00:00"}             (optional, defaults to now)
+    """
+    global latest_berth_plan, berth_plan_version
+    try:
+        data = await request.json()
+    except json.JSONDecodeError:
+        logger.warning("Received invalid JSON", extra={"fields": {"client": request.client.host, "endpoint": "/berth_plan"}})
+        raise HTTPException(status_code=400, detail="Invalid JSON payload.")
+    ships = data.get("ships") if isinstance(data, dict) else None
+    if not isinstance(ships, list):
+        raise HTTPException(status_code=400, detail="Expected {\"ships\": [...]}.")
+    terminals = data.get("terminals") or build_terminals()
+    try:
+        start_time = datetime.datetime.fromisoformat(data["start_time"]) if data.get("start_time") else None
+        plan = await asyncio.to_thread(plan_berths, ships, terminals, start_time)
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid ship or terminal entry: {e}")
+    latest_berth_plan = {None: dumps_bytes(plan)}
+    berth_plan_version += 1
+    logger.info("Berth plan computed", extra={"fields": plan["summary"]})
+    return plan
+
+@app.get("/berth_plan")
+async def get_berth_plan(request: Request):
+    """The last plan computed by POST /berth_plan (404 if none yet). Supports If-None-Match / ETag."""
+    if latest_berth_plan is None:
+        raise HTTPException(status_code=404, detail="No berth plan has been computed yet.")
+    def get_body(encoding):
+        return encoded_variant(latest_berth_plan, encoding)
+    return polling_response(request, make_etag("berth_plan", berth_plan_version), get_body)
+
+@app.get("/stream_logs")
+async def stream_logs(request: Request, since: int = -1):
+    """
+    Server-Sent Events stream of log events, pushed as soon as they are logged.
+    Each event is sent as `id: <seq>` / `data: <json>`. To resume after a reconnect, pass
+    `since=<seq>` or let the browser/EventSource send the Last-Event-ID header.
+    Without either, the stream starts with the next new event.
+    """
+    if since < 0:
+        last_event_id = request.headers.get("last-event-id", "")
+        since = int(last_event_id) if last_event_id.isdigit() else log_store.last_seq
+
+    subscriber = LogSubscriber(since)
+    log_subscribers.add(subscriber)
+
+    async def event_stream():
+        try:
+            while True:
+                events = await subscriber.next_events(STREAM_KEEPALIVE_SECONDS)
+                if not events:
+                    yield ": keepalive\n\n" # Comment line keeps proxies from closing an idle stream
+                    continue
+                yield "".join(f"id: {event['seq']}\nevent: log\ndata: {json.dumps(event)}\n\n" for event in events)
+        finally:
+            log_subscribers.discard(subscriber)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.websocket("/ws/logs")
+async def websocket_logs(websocket: WebSocket, since: int = -1):
+    """
+    WebSocket stream of log events, one JSON event object per text message.
+    Pass `since=<seq>` to resume after a reconnect; otherwise it starts with the next new event.
+    """
+    await websocket.accept()
+    subscriber = LogSubscriber(since if since >= 0 else log_store.last_seq)
+    log_subscribers.add(subscriber)
+    # Sends alone never notice a client that leaves while the log is idle, so listen for the close too
+    disconnected = asyncio.ensure_future(wait_for_disconnect(websocket))
+    try:
+        while True:
+            waiting = asyncio.ensure_future(subscriber.next_events(STREAM_KEEPALIVE_SECONDS))
+            await asyncio.wait((waiting, disconnected), return_when=asyncio.FIRST_COMPLETED)
+            if disconnected.done():
+                waiting.cancel()
+                break
+            for event in waiting.result():
+                await websocket.send_text(json.dumps(event))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        disconnected.cancel()
+        log_subscribers.discard(subscriber)
+
+async def wait_for_disconnect(websocket):
+    """Returns once the WebSocket client has gone away; anything the client sends is ignored."""
+    try:
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+    except (WebSocketDisconnect, RuntimeError): # RuntimeError: receive after the socket closed
+        pass
 
 @app.post("/send_message_to_pygame")
 async def send_message_to_pygame(request: Request):
@@ -77,6 +522,7 @@ async def send_message_to_pygame(request: Request):
     Receives a message from the C client intended for Pygame.
     Expected data: {"message": "Your emergency text"}
     """
+    global pygame_messages_version
     try:
         data = await request.json()
         message_text = data.get("message")
@@ -88,33 +534,55 @@ async def send_message_to_pygame(request: Request):
             "timestamp": datetime.datetime.now().isoformat(),
             "content": message_text
         }
-        pygame_messages.append(message_entry) # Add to the deque
-        print(f"\n--- MESSAGE FROM C CLIENT FOR PYGAME ({message_entry['timestamp']}) ---")
-        print(json.dumps(message_entry, indent=2))
-        print("---------------------------------------------------------------")
+        async with pygame_messages_condition:
+            pygame_messages.append(message_entry) # Add to the deque
+            pygame_messages_version += 1 # Invalidates the pollers' ETags
+            pygame_messages_condition.notify_all() # Wake up any long-polling Pygame client
+        logger.info("MESSAGE FROM C CLIENT FOR PYGAME", extra={"fields": {"message": message_entry}})
         return {"status": "success", "message": "Message sent for Pygame."}
     except json.JSONDecodeError:
-        print(f"Error: Received invalid JSON from {request.client.host}")
+        logger.warning("Received invalid JSON", extra={"fields": {"client": request.client.host, "endpoint": "/send_message_to_pygame"}})
         raise HTTPException(status_code=400, detail="Invalid JSON payload.")
     except Exception as e:
-        print(f"An unexpected error occurred in /send_message_to_pygame: {e}")
+        logger.error("An unexpected error occurred in /send_message_to_pygame", extra={"fields": {"error": str(e)}})
         raise HTTPException(status_code=500, detail=f"Server error: {e}")
 
 # This endpoint is for Pygame to poll for messages from the C client
 @app.get("/get_messages_for_pygame")
-async def get_messages_for_pygame():
+async def get_messages_for_pygame(request: Request, wait: float = 0):
     """
     Pygame polls this endpoint to retrieve messages sent from the C client.
     After retrieval, messages are cleared from the server-side queue.
+    With `wait=<seconds>` this is a long poll: if nothing is queued, the request is held until
+    a message arrives (returned immediately) or the timeout expires (returns an empty list).
+    A poller that sends back the last ETag gets an empty 304 instead of an empty list.
     """
+    wait = max(0.0, min(wait, MAX_MESSAGE_WAIT_SECONDS))
+    if wait and not pygame_messages:
+        async with pygame_messages_condition:
+            try:
+                await asyncio.wait_for(pygame_messages_condition.wait_for(lambda: len(pygame_messages) > 0), timeout=wait)
+            except asyncio.TimeoutError:
+                pass # Nothing arrived, return an empty list
+
+    etag = make_etag("messages", pygame_messages_version)
+    if not pygame_messages:
+        # The common case: nothing new, the body is encoded once
+        return polling_response(request, etag, lambda encoding: (EMPTY_MESSAGES_BODY, None))
+
     messages_to_send = list(pygame_messages) # Get all current messages
     pygame_messages.clear() # Clear them after retrieval (one-time fetch)
-    if messages_to_send:
-        print(f"\n--- Messages delivered to Pygame ({datetime.datetime.now().isoformat()}) ---")
-        print(json.dumps(messages_to_send, indent=2))
-        print("-------------------------------------------------")
-    return {"status": "success", "messages": messages_to_send}
+    logger.info("Messages delivered to Pygame", extra={"fields": {"messages": messages_to_send}})
+    body = dumps_bytes({"status": "success", "messages": messages_to_send})
+    # Messages were just taken off the queue, so they must be delivered even if the ETag matched
+    return polling_response(request, etag, lambda encoding: encoded_variant({None: body}, encoding), allow_not_modified=False)
+
 
+@app.on_event("shutdown")
+async def close_log_store():
+    log_store.close()
+    if log_listener is not None:
+        log_listener.stop() # Flush pending log lines
 
 @app.get("/")
 async def root():
@@ -4,16 +4,28 @@ import datetime
 import random
 import json
 import requests # Import the requests library for API calls
-import math # Import math for circular positioning
 import time # For message polling timer
 import collections # For deque
+import threading # For the background message poller
+from telemetry import TelemetrySender # Background, batched event sender
+from text_cache import TextCache # LRU cache of rendered text surfaces
+from sprite_atlas import ShipImageAtlas # Shared ship hull images and ID label glyphs
+from berth_scheduler import BerthScheduler # Berth plan for the queued ships
+from ship_registry import ShipRegistry # Ships by ship_id: queued (dropdown) and active (on the map)
+from timetable import TimetableIndex # Sorted rows of the "Active Ships on Ocean" table
+import port_engine
+from port_engine import ( # Headless simulation rules; this script is the pygame frontend over them
+    PortEngine, ShipState, get_random_open_sea_position,
+    SCREEN_WIDTH, SCREEN_HEIGHT, PORT_X, PORT_Y, PORT_WIDTH, PORT_HEIGHT, PORT_CENTER_X, PORT_CENTER_Y,
+    CONTROL_PANEL_X, CONTROL_PANEL_Y, CONTROL_PANEL_WIDTH, CONTROL_PANEL_HEIGHT,
+    OCEAN_START_X, ZONE_PARKED,
+)
 
 # --- Pygame Initialization ---
 pygame.init()
 
 # --- Constants ---
-SCREEN_WIDTH = 1200
-SCREEN_HEIGHT = 800
+# Screen, port and zone geometry live in port_engine
 FPS = 60
 
 # Colors
@@ -29,32 +41,6 @@ DARK_GREY = (100, 100, 100)
 YELLOW = (255, 255, 0)
 ORANGE = (255, 165, 0)
 
-# Port dimensions and positions
-PORT_WIDTH = 300
-PORT_HEIGHT = 280 # Adjusted for 7 terminals
-TERMINAL_COUNT = 7
-TERMINAL_HEIGHT = PORT_HEIGHT // TERMINAL_COUNT
-
-# Control Panel (left side)
-CONTROL_PANEL_X = 20
-CONTROL_PANEL_Y = 20
-CONTROL_PANEL_WIDTH = 280
-CONTROL_PANEL_HEIGHT = SCREEN_HEIGHT - 40 # Almost full height
-
-# Main Ocean/Simulation Area
-OCEAN_START_X = CONTROL_PANEL_X + CONTROL_PANEL_WIDTH + 10 # Ocean starts right of control panel
-OCEAN_WIDTH = SCREEN_WIDTH - OCEAN_START_X
-OCEAN_HEIGHT = SCREEN_HEIGHT
-
-# Center the port within the new ocean area
-PORT_X = OCEAN_START_X + (OCEAN_WIDTH // 2) - (PORT_WIDTH // 2)
-PORT_Y = SCREEN_HEIGHT // 2 - PORT_HEIGHT // 2
-
-# Zone distances (from port's closest edge)
-RED_ZONE_DIST_PX = 100
-DARK_GREEN_ZONE_DIST_PX = 250
-LIGHT_GREEN_ZONE_DIST_PX = 400
-
 # Delete Zone (top-right corner of the *entire screen*)
 DELETE_ZONE_RECT = pygame.Rect(SCREEN_WIDTH - 200, 0, 200, 100)
 
@@ -64,8 +50,12 @@ DELETE_ZONE_RECT = pygame.Rect(SCREEN_WIDTH - 200, 0, 200, 100)
 # If running on a different machine on your local Wi-Fi (e.g., 172.16.3.228): http://172.16.3.228:8000
 BASE_API_URL = "http://127.0.0.1:8000"
 LOG_EVENT_API_URL = f"{BASE_API_URL}/log_event"
+LOG_EVENTS_API_URL = f"{BASE_API_URL}/log_events" # Batch ingest endpoint
 GET_MESSAGES_API_URL = f"{BASE_API_URL}/get_messages_for_pygame"
 
+# Events are queued and sent by a background thread so the game loop never waits on the network
+telemetry_sender = TelemetrySender(LOG_EVENTS_API_URL, max_queue_size=1000, batch_size=50, batch_interval=0.25)
+
 # --- Game Setup ---
 screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
 pygame.display.set_caption("Advanced Port Simulation")
@@ -73,6 +63,10 @@ clock = pygame.time.Clock()
 font = pygame.font.Font(None, 24)
 large_font = pygame.font.Font(None, 32)
 title_font = pygame.font.Font(None, 48)
+small_font = pygame.font.Font(None, 18)
+text_cache = TextCache(max_entries=512) # Shared by every widget, ship and panel that draws text
+ship_atlas = ShipImageAtlas(port_engine.SHIP_WIDTH, port_engine.SHIP_HEIGHT, BLUE, DARK_GREY, font, WHITE) # Hulls + ID glyphs
+ship_atlas.convert()
 
 # --- Helper Functions ---
 def interpolate_color(color1, color2, factor):
@@ -82,38 +76,6 @@ def interpolate_color(color1, color2, factor):
     b = int(color1[2] + (color2[2] - color1[2]) * factor)
     return (r, g, b)
 
-# Define a buffer zone around the port to ensure "open sea" is truly outside all gradient zones
-OPEN_SEA_BUFFER = 50 # pixels beyond the light green zone
-# These now refer to the actual ocean area bounds
-MIN_OPEN_SEA_X = OCEAN_START_X + 50
-MAX_OPEN_SEA_X = SCREEN_WIDTH - 50
-MIN_OPEN_SEA_Y = 0 + 50
-MAX_OPEN_SEA_Y = SCREEN_HEIGHT - 50
-
-# Assuming a generic ship size for spawning, or pass it in
-SHIP_WIDTH_FOR_SPAWN = 60
-SHIP_HEIGHT_FOR_SPAWN = 30
-
-def get_random_open_sea_position():
-    """Returns a random (x, y) coordinate for a ship to be entirely within open sea."""
-    while True:
-        # Choose a random point within the ocean area bounds, with some margin for the ship size
-        x = random.randint(MIN_OPEN_SEA_X, MAX_OPEN_SEA_X - SHIP_WIDTH_FOR_SPAWN)
-        y = random.randint(MIN_OPEN_SEA_Y, MAX_OPEN_SEA_Y - SHIP_HEIGHT_FOR_SPAWN)
-        
-        # Calculate distance from the potential spawn point to the port center
-        port_center_x = PORT_X + PORT_WIDTH // 2
-        port_center_y = PORT_Y + PORT_HEIGHT // 2
-        
-        # Calculate distance from the *center* of the potential ship position to the port center
-        ship_center_x = x + SHIP_WIDTH_FOR_SPAWN // 2
-        ship_center_y = y + SHIP_HEIGHT_FOR_SPAWN // 2
-        dist_to_port_center = ((ship_center_x - port_center_x)**2 + (ship_center_y - port_center_y)**2)**0.5
-
-        # Ensure the point is outside the light green zone + buffer
-        if dist_to_port_center > LIGHT_GREEN_ZONE_DIST_PX + OPEN_SEA_BUFFER:
-            return x, y
-
 # --- UI Element Classes ---
 
 class Button:
@@ -130,7 +92,7 @@ class Button:
         current_color = self.hover_color if self.is_hovered else self.color
         pygame.draw.rect(surface, current_color, self.rect, border_radius=5)
         pygame.draw.rect(surface, BLACK, self.rect, 2, border_radius=5) # Border
-        text_surface = font.render(self.text, True, self.text_color)
+        text_surface = text_cache.render(font, self.text, self.text_color)
         text_rect = text_surface.get_rect(center=self.rect.center)
         surface.blit(text_surface, text_rect)
 
@@ -143,41 +105,127 @@ class Button:
         return False
 
 class Dropdown:
-    def __init__(self, x, y, width, height, options, default_text="Select Ship"):
+    """
+    Options are (value, label) pairs (plain strings are their own value), or an option source:
+    any object with dropdown_options() and a version counter (e.g. ShipRegistry), read only when needed.
+
+    Virtualized: only the max_visible_rows options in the scroll window are drawn, each from a cached
+    row surface. While open, the mouse wheel and arrow/page keys scroll and typing filters the labels
+    (Backspace edits the filter, Enter picks the first visible option, Escape closes).
+    """
+    def __init__(self, x, y, width, height, options, default_text="Select Ship", max_visible_rows=8, row_cache_size=64):
         self.rect = pygame.Rect(x, y, width, height)
-        self.selected_option = None
+        self.selected_option = None # Label shown on the button
+        self.selected_value = None # Value of the chosen option (e.g. a ship_id)
         self.is_open = False
         self.default_text = default_text
-        self._options = [] # Internal storage for options
-        self.option_rects = []
-        self.set_options(options) # Initialize with options and build rects
+        self.max_visible_rows = max_visible_rows
+        self.scroll = 0 # Index of the first visible option
+        self.filter_text = ""
+        self._options = [] # Internal storage for options (a list or an option source)
+        self._version = 0 # Bumped when a list of options is set
+        self._filtered = [] # Options matching filter_text
+        self._filtered_key = None # (options version, filter_text) _filtered was built for
+        self._search_options = [] # Options snapshot the lower-cased search labels belong to
+        self._search_labels = []
+        self._search_version = None
+        self._row_cache = collections.OrderedDict() # label -> rendered row surface (LRU)
+        self.row_cache_size = row_cache_size
+        self.set_options(options)
 
     @property
     def options(self):
-        return self._options
+        """The current (value, label) pairs."""
+        if hasattr(self._options, 'dropdown_options'):
+            return self._options.dropdown_options()
+        return [option if isinstance(option, tuple) else (option, option) for option in self._options]
 
     @options.setter
     def options(self, new_options):
         self._options = new_options
-        self._rebuild_option_rects() # Call helper method to rebuild rects
-
-    def _rebuild_option_rects(self):
-        """Rebuilds the list of rectangles for each dropdown option."""
-        self.option_rects = []
-        for i, option in enumerate(self._options):
-            option_rect = pygame.Rect(self.rect.x, self.rect.y + self.rect.height * (i + 1), self.rect.width, self.rect.height)
-            self.option_rects.append(option_rect)
+        self._version += 1
 
     def set_options(self, new_options):
-        # This method uses the property setter to ensure rebuild
         self.options = new_options
 
+    def options_version(self):
+        """Changes whenever the options do."""
+        if hasattr(self._options, 'dropdown_options'):
+            return (id(self._options), self._options.version)
+        return self._version
+
+    def signature(self):
+        """Everything draw() shows (for the control panel's redraw check)."""
+        return (self.is_open, self.selected_option, self.options_version(), self.filter_text, self.scroll)
+
+    def clear_selection(self):
+        self.selected_option = None
+        self.selected_value = None
+
+    def filtered_options(self):
+        """Options whose label contains filter_text (case-insensitive); recomputed only when either changes."""
+        version = self.options_version()
+        key = (version, self.filter_text)
+        if key != self._filtered_key:
+            needle = self.filter_text.lower()
+            if not needle:
+                self._filtered = self.options
+            else:
+                if self._search_version != version: # Lower-cased labels, built once per options change
+                    self._search_options = self.options
+                    self._search_labels = [label.lower() for value, label in self._search_options]
+                    self._search_version = version
+                self._filtered = [option for option, label in zip(self._search_options, self._search_labels) if needle in label]
+            self._filtered_key = key
+            self.scroll_to(self.scroll) # Keep the window inside the (possibly shorter) list
+        return self._filtered
+
+    def visible_row_count(self):
+        return min(self.max_visible_rows, len(self.filtered_options()))
+
+    def scroll_to(self, first):
+        max_scroll = max(0, len(self._filtered) - self.max_visible_rows)
+        self.scroll = max(0, min(first, max_scroll))
+
+    def option_rect(self, row):
+        """Rectangle of the row-th visible option: rows stack directly below the button."""
+        return pygame.Rect(self.rect.x, self.rect.y + self.rect.height * (row + 1), self.rect.width, self.rect.height)
+
+    def option_at(self, pos):
+        """Index into filtered_options() of the option under pos, or None. Constant time: rows are equal height."""
+        if not (self.rect.left <= pos[0] < self.rect.right) or pos[1] < self.rect.bottom:
+            return None
+        row = (pos[1] - self.rect.bottom) // self.rect.height
+        if row >= self.visible_row_count():
+            return None
+        return self.scroll + row
+
+    def _row_surface(self, label):
+        """The option row (background, border and text), rendered once per label."""
+        surface = self._row_cache.get(label)
+        if surface is not None:
+            self._row_cache.move_to_end(label)
+            return surface
+        surface = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+        row_rect = surface.get_rect()
+        pygame.draw.rect(surface, WHITE, row_rect, border_radius=5)
+        pygame.draw.rect(surface, BLACK, row_rect, 1, border_radius=5)
+        text_surface = font.render(label, True, BLACK) # Cached here as part of the row, not in text_cache
+        surface.blit(text_surface, text_surface.get_rect(center=row_rect.center))
+        self._row_cache[label] = surface
+        if len(self._row_cache) > self.row_cache_size:
+            self._row_cache.popitem(last=False) # Least recently used
+        return surface
+
     def draw(self, surface):
-        # Draw main button
-        display_text = self.selected_option if self.selected_option else self.default_text
+        # Draw main button (shows the filter while typing into an open list)
+        if self.is_open and self.filter_text:
+            display_text = f"Filter: {self.filter_text}"
+        else:
+            display_text = self.selected_option if self.selected_option else self.default_text
         pygame.draw.rect(surface, LIGHT_GREY, self.rect, border_radius=5)
         pygame.draw.rect(surface, BLACK, self.rect, 2, border_radius=5)
-        text_surface = font.render(display_text, True, BLACK)
+        text_surface = text_cache.render(font, display_text, BLACK)
         text_rect = text_surface.get_rect(center=self.rect.center)
         surface.blit(text_surface, text_rect)
 
@@ -189,23 +237,21 @@ class Dropdown:
         ]
         pygame.draw.polygon(surface, BLACK, arrow_points)
 
-        # Draw options if open
+        # Draw the visible window of options if open
         if self.is_open:
-            # Re-verify and rebuild if somehow out of sync (shouldn't happen with property setter)
-            if len(self.options) != len(self.option_rects):
-                 self._rebuild_option_rects()
-
-            for i, option in enumerate(self.options):
-                if i < len(self.option_rects): # Defensive check
-                    option_rect = self.option_rects[i]
-                else: # Fallback, though _rebuild_option_rects should prevent this
-                    option_rect = pygame.Rect(self.rect.x, self.rect.y + self.rect.height * (i + 1), self.rect.width, self.rect.height)
-
-                pygame.draw.rect(surface, WHITE, option_rect, border_radius=5)
-                pygame.draw.rect(surface, BLACK, option_rect, 1, border_radius=5)
-                option_text_surface = font.render(option, True, BLACK)
-                option_text_rect = option_text_surface.get_rect(center=option_rect.center)
-                surface.blit(option_text_surface, option_text_rect)
+            options = self.filtered_options()
+            rows = self.visible_row_count()
+            for row in range(rows):
+                value, label = options[self.scroll + row]
+                surface.blit(self._row_surface(label), self.option_rect(row))
+
+            # Scrollbar when not everything fits
+            if len(options) > rows:
+                track = pygame.Rect(self.rect.right - 6, self.rect.bottom, 4, self.rect.height * rows)
+                thumb_height = max(8, track.height * rows // len(options))
+                thumb_y = track.y + (track.height - thumb_height) * self.scroll // (len(options) - rows)
+                pygame.draw.rect(surface, LIGHT_GREY, track)
+                pygame.draw.rect(surface, DARK_GREY, (track.x, thumb_y, track.width, thumb_height))
 
     def handle_event(self, event):
         if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
@@ -214,14 +260,46 @@ class Dropdown:
                 return True # Event handled
 
             if self.is_open:
-                for i, option_rect in enumerate(self.option_rects):
-                    if option_rect.collidepoint(event.pos):
-                        if i < len(self.options): # Defensive check
-                            self.selected_option = self.options[i]
-                            self.is_open = False
-                            return True # Event handled
+                i = self.option_at(event.pos)
+                if i is not None:
+                    self._select(i)
+                    return True # Event handled
+
+        if not self.is_open:
+            return False # Event not handled by this dropdown
+
+        if event.type == pygame.MOUSEWHEEL:
+            self.filtered_options()
+            self.scroll_to(self.scroll - event.y * 3)
+            return True
+        if event.type == pygame.KEYDOWN:
+            if event.key in (pygame.K_UP, pygame.K_DOWN, pygame.K_PAGEUP, pygame.K_PAGEDOWN, pygame.K_RETURN):
+                self.filtered_options() # Filter typing is applied once, when the list is next drawn
+            if event.key == pygame.K_ESCAPE:
+                self.is_open = False
+            elif event.key == pygame.K_UP:
+                self.scroll_to(self.scroll - 1)
+            elif event.key == pygame.K_DOWN:
+                self.scroll_to(self.scroll + 1)
+            elif event.key == pygame.K_PAGEUP:
+                self.scroll_to(self.scroll - self.max_visible_rows)
+            elif event.key == pygame.K_PAGEDOWN:
+                self.scroll_to(self.scroll + self.max_visible_rows)
+            elif event.key == pygame.K_RETURN:
+                if self._filtered:
+                    self._select(self.scroll)
+            elif event.key == pygame.K_BACKSPACE:
+                self.filter_text = self.filter_text[:-1]
+            elif event.unicode and event.unicode.isprintable():
+                self.filter_text += event.unicode
+            return True
         return False # Event not handled by this dropdown
 
+    def _select(self, i):
+        self.selected_value, self.selected_option = self._filtered[i]
+        self.is_open = False
+        self.filter_text = ""
+
 class TextInputBox:
     def __init__(self, x, y, width, height, font, initial_text='', text_color=BLACK, active_color=BLUE, inactive_color=LIGHT_GREY):
         self.rect = pygame.Rect(x, y, width, height)
@@ -231,7 +309,7 @@ class TextInputBox:
         self.inactive_color = inactive_color
         self.text_color = text_color
         self.text = initial_text
-        self.txt_surface = font.render(self.text, True, self.text_color)
+        self.txt_surface = text_cache.render(font, self.text, self.text_color)
         self.active = False
         self.cursor_visible = True
         self.cursor_timer = pygame.time.get_ticks()
@@ -253,7 +331,7 @@ class TextInputBox:
                     pass
                 else:
                     self.text += event.unicode
-                self.txt_surface = self.font.render(self.text, True, self.text_color)
+                self.txt_surface = text_cache.render(self.font, self.text, self.text_color)
                 self.cursor_timer = pygame.time.get_ticks() # Reset cursor blink
 
     def draw(self, surface):
@@ -327,14 +405,14 @@ class AddShipDialog:
         pygame.draw.rect(surface, WHITE, self.rect, border_radius=10)
         pygame.draw.rect(surface, BLACK, self.rect, 3, border_radius=10)
 
-        title = large_font.render("Add New Ship", True, BLACK)
+        title = text_cache.render(large_font, "Add New Ship", BLACK)
         surface.blit(title, (self.rect.x + 20, self.rect.y + 10))
 
-        name_label = font.render("Ship Name:", True, BLACK)
+        name_label = text_cache.render(font, "Ship Name:", BLACK)
         surface.blit(name_label, (self.rect.x + 20, self.rect.y + 40))
         self.name_input.draw(surface)
 
-        time_label = font.render("Arrival Time (YYYY-MM-DD HH:MM):", True, BLACK)
+        time_label = text_cache.render(font, "Arrival Time (YYYY-MM-DD HH:MM):", BLACK)
         surface.blit(time_label, (self.rect.x + 20, self.rect.y + 110))
         self.arrival_time_input.draw(surface)
 
@@ -342,7 +420,7 @@ class AddShipDialog:
         self.cancel_button.draw(surface)
 
         if self.error_message:
-            error_surface = font.render(self.error_message, True, RED)
+            error_surface = text_cache.render(font, self.error_message, RED)
             surface.blit(error_surface, (self.rect.x + 20, self.rect.y + self.rect.height - 60))
             if pygame.time.get_ticks() - self.error_timer > 3000: # Clear error after 3 seconds
                 self.error_message = ""
@@ -391,10 +469,10 @@ class EmergencyMessageDialog:
         pygame.draw.rect(surface, WHITE, self.rect, border_radius=10)
         pygame.draw.rect(surface, BLACK, self.rect, 3, border_radius=10)
 
-        title = large_font.render("Send Emergency Message", True, BLACK)
+        title = text_cache.render(large_font, "Send Emergency Message", BLACK)
         surface.blit(title, (self.rect.x + 20, self.rect.y + 10))
 
-        message_label = font.render("Message:", True, BLACK)
+        message_label = text_cache.render(font, "Message:", BLACK)
         surface.blit(message_label, (self.rect.x + 20, self.rect.y + 40))
         self.message_input.draw(surface)
 
@@ -402,223 +480,138 @@ class EmergencyMessageDialog:
         self.cancel_button.draw(surface)
 
         if self.error_message:
-            error_surface = font.render(self.error_message, True, RED)
+            error_surface = text_cache.render(font, self.error_message, RED)
             surface.blit(error_surface, (self.rect.x + 20, self.rect.y + self.rect.height - 60))
             if pygame.time.get_ticks() - self.error_timer > 3000: # Clear error after 3 seconds
                 self.error_message = ""
 
 # --- Ship Class ---
-class Ship(pygame.sprite.Sprite):
+class Ship(ShipState, pygame.sprite.DirtySprite):
+    """A ShipState with a sprite image; the engine moves it, this class only draws and drags it."""
+    __slots__ = ("drawn_position", "offset_x", "offset_y", "is_selected_for_edit")
+
     def __init__(self, ship_id, name, arrival_time, size, unloading_time, start_x, start_y, initial_speed=0):
-        super().__init__()
-        self.ship_id = ship_id
-        self.name = name
-        self.arrival_time = arrival_time # datetime object
-        self.size = size # e.g., 'small', 'medium', 'large'
-        self.unloading_time = unloading_time # hours (conceptual)
-        self.image = pygame.Surface((60, 30))
-        self.image.fill(BLUE)
-        pygame.draw.rect(self.image, DARK_GREY, (0, 0, 60, 30), 2) # Border
-        text_surface = font.render(f"ID:{self.ship_id}", True, WHITE)
-        text_rect = text_surface.get_rect(center=(30, 15))
-        self.image.blit(text_surface, text_rect)
-        self.rect = self.image.get_rect(topleft=(start_x, start_y))
-
-        self.original_pos = self.rect.topleft
-        self.is_dragging = False
+        ShipState.__init__(self, ship_id, name, arrival_time, size, unloading_time, start_x, start_y, initial_speed)
+        pygame.sprite.DirtySprite.__init__(self)
+        self._layer = SHIP_LAYER
+        self.drawn_position = None # Top-left last drawn in dirty mode
         self.offset_x = 0
         self.offset_y = 0
-
-        self.current_speed_kmh = initial_speed # Fabricated speed in km/h
-        self.current_zone = "Open Sea" # "Open Sea", "Light Green", "Dark Green", "Red Zone", "Parked"
-        self.parked_terminal = None
         self.is_selected_for_edit = False # For UI editing
-        self.last_dist_to_port_center = None # Track previous distance for movement direction
-        self.movement_direction = None # "incoming", "outgoing", or None
+
+    @property
+    def image(self):
+        # Shared hull for the ship's size class; the ID label is drawn separately (draw_ship_labels)
+        return ship_atlas.hull(self.size)
+
+    @property
+    def rect(self):
+        # Built from the engine-owned position, so the sprite never drifts from the simulation
+        return pygame.Rect(self.x, self.y, self.width, self.height)
 
     def draw(self, screen):
         screen.blit(self.image, self.rect)
+        ship_atlas.draw_label(screen, self.ship_id, self.rect)
         # Display ship name and speed near the ship
-        name_text = font.render(f"{self.name}", True, BLACK)
-        speed_text = font.render(f"{self.current_speed_kmh:.1f} km/h", True, BLACK)
-        screen.blit(name_text, (self.rect.x, self.rect.y - 20))
-        screen.blit(speed_text, (self.rect.x, self.rect.y + self.rect.height + 5))
+        name_text = text_cache.render(font, f"{self.name}", BLACK)
+        speed_text = text_cache.render(font, f"{self.current_speed_kmh:.1f} km/h", BLACK)
+        screen.blit(name_text, (self.x, self.y - 20))
+        screen.blit(speed_text, (self.x, self.y + self.height + 5))
 
         if self.is_selected_for_edit:
             pygame.draw.rect(screen, YELLOW, self.rect, 3) # Highlight if selected for edit
 
     def start_drag(self, mouse_pos):
-        self.is_dragging = True
-        self.offset_x = self.rect.x - mouse_pos[0]
-        self.offset_y = self.rect.y - mouse_pos[1]
-        # Store original position in case parking fails or for undocking
-        self.original_pos = self.rect.topleft 
-
+        self.offset_x = self.x - mouse_pos[0]
+        self.offset_y = self.y - mouse_pos[1]
+        engine.start_drag(self)
 
     def stop_drag(self):
-        self.is_dragging = False
+        engine.stop_drag(self)
 
     def drag(self, mouse_pos):
         if self.is_dragging:
-            self.rect.x = mouse_pos[0] + self.offset_x
-            self.rect.y = mouse_pos[1] + self.offset_y # Corrected line
-            self.update_speed_and_zone()
-
-    def update_speed_and_zone(self):
-        # Calculate distance to port's center
-        port_center_x = PORT_X + PORT_WIDTH // 2
-        port_center_y = PORT_Y + PORT_HEIGHT // 2
-        
-        dist_to_port_center = ((self.rect.centerx - port_center_x)**2 + \
-                               (self.rect.centery - port_center_y)**2)**0.5
-
-        prev_zone = self.current_zone
-        
-        # Determine movement direction based on distance change
-        if self.last_dist_to_port_center is not None:
-            if dist_to_port_center < self.last_dist_to_port_center - 1: # Moving closer (with a small threshold)
-                self.movement_direction = "incoming"
-            elif dist_to_port_center > self.last_dist_to_port_center + 1: # Moving farther (with a small threshold)
-                self.movement_direction = "outgoing"
-            else:
-                self.movement_direction = None # Stationary or very slight movement
-
-        # Only update zone and speed if not parked
-        if self.current_zone != "Parked":
-            if dist_to_port_center <= RED_ZONE_DIST_PX:
-                self.current_zone = "Red Zone"
-                if not self.is_dragging: # Only auto-adjust speed if not actively dragging
-                    self.current_speed_kmh = min(self.current_speed_kmh, random.uniform(5, 15)) # Slow down
-            elif dist_to_port_center <= DARK_GREEN_ZONE_DIST_PX:
-                self.current_zone = "Dark Green Zone"
-                if not self.is_dragging:
-                    self.current_speed_kmh = min(self.current_speed_kmh, random.uniform(15, 30))
-            elif dist_to_port_center <= LIGHT_GREEN_ZONE_DIST_PX:
-                self.current_zone = "Light Green Zone"
-                if not self.is_dragging:
-                    self.current_speed_kmh = min(self.current_speed_kmh, random.uniform(30, 50))
-            else:
-                self.current_zone = "Open Sea"
-                if not self.is_dragging:
-                    self.current_speed_kmh = max(self.current_speed_kmh, random.uniform(40, 70)) # Speed up if far
-        else: # If currently parked, no movement
-            self.movement_direction = None
-
-        # Simulate parking if collision with port AND was dragging AND not already parked
-        port_rect = pygame.Rect(PORT_X, PORT_Y, PORT_WIDTH, PORT_HEIGHT)
-        if port_rect.colliderect(self.rect) and self.is_dragging and self.current_zone != "Parked":
-            # Attempt to park
-            terminal = self.get_available_terminal()
-            if terminal:
-                self.current_zone = "Parked"
-                self.current_speed_kmh = 0
-                self.parked_terminal = terminal['id']
-                self.rect.topleft = self.parked_terminal_position(terminal['id'])
-                self.stop_drag() # Stop dragging once parked
-                terminal['occupied_by'] = self.ship_id
-                self.movement_direction = None # No movement when parked
-                print(f"Ship {self.name} (ID:{self.ship_id}) parked at Terminal {self.parked_terminal}")
-                self.send_api_data("docked", {"terminal_id": self.parked_terminal}) # API call for docking
-            else:
-                # No available terminal, can't park here
-                print(f"No available terminal for Ship {self.name}. Cannot park.")
-                # Snap back to previous position and stop dragging
-                self.rect.topleft = self.original_pos
-                self.stop_drag()
-                # If it snaps back, its movement direction should revert to what it was before attempting to park
-                # This requires more complex state, for now, just reset to None
-                self.movement_direction = None
-
-
-        # If zone changed, "send API data" (only if not parked, or if newly parked)
-        if prev_zone != self.current_zone:
-            # Only send zone_change if it's not the initial parking event
-            # or if it's specifically transitioning *out* of parked state
-            if self.current_zone != "Parked" or prev_zone == "Parked":
-                self.send_api_data("zone_change")
-                print(f"Ship {self.name} entered {self.current_zone}")
-
-
-        self.last_dist_to_port_center = dist_to_port_center # Update last distance for next frame
-
-
-    def get_available_terminal(self):
-        # Find the nearest available terminal
-        
-        # Sort terminals by proximity to the ship's current position
-        sorted_terminals = sorted(terminals_data, key=lambda t: ((self.rect.centery - (t['y'] + t['height']/2))**2)**0.5)
-
-        for terminal in sorted_terminals:
-            if terminal['occupied_by'] is None: # Check if available
-                # Consider terminal capacity (not yet fully implemented for multiple ships per terminal)
-                # For now, if capacity is 1, it's strictly one ship. If capacity > 1, it's effectively 1 ship still.
-                # `occupied_by` would need to be a list. For now, it's binary.
-                return terminal
-        return None # No available terminal
-
-    def parked_terminal_position(self, terminal_id):
-        # Calculate the position to snap the ship to once parked
-        for terminal in terminals_data:
-            if terminal['id'] == terminal_id:
-                # Place ship at the right edge of the terminal
-                return (terminal['x'] + terminal['width'] - self.rect.width - 5,
-                        terminal['y'] + terminal['height'] / 2 - self.rect.height / 2)
-        return (0,0) # Should not happen
-
-    def send_api_data(self, event_type, additional_data=None):
-        """
-        Sends ship event data to the FastAPI server.
-        event_type: A string describing the type of event (e.g., "zone_change", "docked", "undocked", "ship_deleted", "emergency").
-        additional_data: Optional dictionary for event-specific data.
-        """
-        payload = {
-            "ship_id": self.ship_id,
-            "ship_name": self.name,
-            "current_zone": self.current_zone,
-            "current_speed_kmh": round(self.current_speed_kmh, 1),
-            "timestamp": datetime.datetime.now().isoformat(),
-            "event_type": event_type # e.g., "ship_deleted", "zone_change", "undocked"
-        }
-        if self.current_zone == "Parked" and self.parked_terminal: # Only add parked_terminal if actually parked
-            payload["parked_terminal"] = self.parked_terminal
-        
-        if additional_data:
-            payload.update(additional_data) # Add any specific data for the event
-
-        try:
-            response = requests.post(LOG_EVENT_API_URL, json=payload, timeout=1) # Added timeout
-            response.raise_for_status() # Raise an exception for HTTP errors (4xx or 5xx)
-            # print(f"API call successful for {event_type} (Ship ID: {self.ship_id}): {response.json()}")
-        except requests.exceptions.RequestException as e:
-            print(f"API call failed for {event_type} (Ship ID: {self.ship_id}): {e}")
+            engine.move_ship(self, mouse_pos[0] + self.offset_x, mouse_pos[1] + self.offset_y)
 
 
 # --- Game State Variables ---
-all_sprites = pygame.sprite.Group()
+all_sprites = pygame.sprite.LayeredDirty() # Everything drawn in dirty mode: ships and the control panel sprite
+all_sprites.set_timing_threshold(1000.0 / FPS) # Fall back to whole-screen updates if dirty tracking gets too slow
 active_ships = pygame.sprite.Group() # Group for ships currently on the map
 
 selected_ship_on_map = None # The ship currently being dragged or selected for speed edit
 
-# --- Terminal Data ---
-terminals_data = []
-for i in range(TERMINAL_COUNT):
-    terminal_id = i + 1
-    terminal_x = PORT_X
-    terminal_y = PORT_Y + i * TERMINAL_HEIGHT
-    capacity = 1 if terminal_id in [1, 2] else 1 # Simplified capacity for now
-    terminals_data.append({
-        'id': terminal_id,
-        'x': terminal_x,
-        'y': terminal_y,
-        'width': PORT_WIDTH,
-        'height': TERMINAL_HEIGHT,
-        'capacity': capacity,
-        'occupied_by': None # Ship ID if occupied
-    })
+def submit_event(payload):
+    """Engine event sink: only an enqueue here; the TelemetrySender thread does the actual POST."""
+    track_berth_event(payload)
+    track_timetable_event(payload)
+    if not telemetry_sender.submit(payload):
+        print(f"Telemetry queue full, dropped {payload['event_type']} (Ship ID: {payload['ship_id']})")
+
+# --- Simulation Engine ---
+engine = PortEngine(event_sink=submit_event, verbose=True)
+terminals_data = engine.terminals_data # Owned by the engine; read here for drawing
+
+# --- Berth Plan ---
+# Every ship that has not docked yet is planned onto a terminal slot; docked ships hold their berth
+# for their unloading time. The plan is recomputed lazily (and incrementally) when it is read.
+berth_scheduler = BerthScheduler(terminals_data)
+
+def track_berth_event(payload):
+    """Keeps the berth plan in step with docking, undocking and deletion (called for every engine event)."""
+    event_type = payload['event_type']
+    ship_id = payload['ship_id']
+    if event_type not in ("docked", "undocked", "ship_deleted"):
+        return
+    terminal = engine.terminals.terminal_of(ship_id) # Engine reports these before releasing the berth
+    if event_type == "docked":
+        berth_scheduler.remove_ship(ship_id)
+        ship = engine.ships.get(ship_id)
+        if terminal and ship:
+            unloading_done = datetime.datetime.now() + datetime.timedelta(hours=ship.unloading_time)
+            berth_scheduler.set_berth_busy(terminal['id'], terminal['occupants'].index(ship_id), unloading_done)
+    else:
+        if terminal:
+            berth_scheduler.set_berth_busy(terminal['id'], terminal['occupants'].index(ship_id), None)
+        if event_type == "ship_deleted":
+            berth_scheduler.remove_ship(ship_id)
+
+def berth_plan_text(ship):
+    """One-line berth plan for a ship, for the edit panel."""
+    if ship.current_zone == ZONE_PARKED:
+        return f"Berth: docked at Terminal {ship.parked_terminal}"
+    plan = berth_scheduler.plan_for(ship.ship_id)
+    if plan is None:
+        return "Berth plan: none"
+    start = datetime.datetime.fromisoformat(plan['start_time'])
+    return f"Berth plan: Terminal {plan['terminal_id']} at {start.strftime('%H:%M')} (wait {plan['wait_minutes']:.0f} min)"
+
+def shift_selected_arrival(minutes):
+    """+/- 20 Mins buttons: moves the selected ship's arrival time and re-plans from there."""
+    ship = selected_ship_on_map
+    if ship is None:
+        return False
+    ship.arrival_time += datetime.timedelta(minutes=minutes)
+    if ship.current_zone != ZONE_PARKED:
+        berth_scheduler.set_ship(ship.ship_id, ship.name, ship.arrival_time, ship.unloading_time)
+    timetable.update(ship) # Arrival time is a sort key
+    print(f"Ship {ship.name} (ID:{ship.ship_id}) arrival moved to {ship.arrival_time.strftime('%Y-%m-%d %H:%M')}")
+    return True
 
 # --- Ship Data Management ---
 next_ship_id = 1
-all_ship_data = [] # List of dictionaries holding all ship data (active or not)
+ship_registry = ShipRegistry() # Every ship by ship_id: queued ship data (the dropdown) and active Ship sprites
+timetable = TimetableIndex(page_size=5) # Active ships for the timetable, re-sorted only when one changes
+
+def track_timetable_event(payload):
+    """Re-files a ship in the timetable when the engine reports a zone change, docking or deletion."""
+    event_type = payload['event_type']
+    if event_type == "ship_deleted":
+        timetable.remove(payload['ship_id'])
+    elif event_type in ("zone_change", "docked", "undocked"):
+        ship = engine.ships.get(payload['ship_id'])
+        if ship:
+            timetable.update(ship)
 
 # --- Function Definitions ---
 def add_new_random_ship_data():
@@ -637,9 +630,9 @@ def add_new_random_ship_data():
         "unloading_time": unloading_time,
         "initial_speed": random.uniform(40, 60) # Default speed when spawned
     }
-    all_ship_data.append(new_data)
+    ship_registry.add_queued(new_data)
+    berth_scheduler.set_ship(new_data['ship_id'], ship_name, arrival_time, unloading_time)
     next_ship_id += 1
-    update_dropdown_options()
 
 def add_custom_ship_data(name, arrival_time):
     """Adds a new ship with custom name and arrival time."""
@@ -652,19 +645,12 @@ def add_custom_ship_data(name, arrival_time):
         "unloading_time": random.randint(4, 24),
         "initial_speed": random.uniform(40, 60)
     }
-    all_ship_data.append(new_data)
+    ship_registry.add_queued(new_data)
+    berth_scheduler.set_ship(new_data['ship_id'], name, arrival_time, new_data['unloading_time'])
     next_ship_id += 1
-    update_dropdown_options()
     print(f"Custom Ship '{name}' added. Arriving at {arrival_time.strftime('%Y-%m-%d %H:%M')}")
 
 
-def update_dropdown_options():
-    # Only include ships not currently active on the map in the dropdown
-    active_ship_ids = {s.ship_id for s in active_ships}
-    available_ships_for_dropdown = [s for s in all_ship_data if s['ship_id'] not in active_ship_ids]
-    dropdown_options = [f"ID:{s['ship_id']} - {s['name']} (Arr: {s['arrival_time'].strftime('%H:%M')})" for s in available_ships_for_dropdown]
-    ship_dropdown.set_options(dropdown_options) # Use the setter method
-
 # --- UI Elements ---
 # Add Ship Dialog (State management)
 add_ship_dialog = None
@@ -700,7 +686,7 @@ def on_send_emergency_message_unified(message_content):
     
     if selected_ship_on_map:
         # Ship-specific emergency
-        selected_ship_on_map.send_api_data("emergency", {
+        engine.emit(selected_ship_on_map, "emergency", {
             "message": message_content
         })
         print(f"Ship-specific emergency sent for {selected_ship_on_map.name}: {message_content}")
@@ -715,12 +701,10 @@ def on_send_emergency_message_unified(message_content):
             "event_type": "emergency_global", # Distinct event type for global emergency
             "message": message_content
         }
-        try:
-            response = requests.post(LOG_EVENT_API_URL, json=payload, timeout=1)
-            response.raise_for_status()
-            print(f"Global Emergency API call successful: {response.json()}")
-        except requests.exceptions.RequestException as e:
-            print(f"Global Emergency API call failed: {e}")
+        if telemetry_sender.submit(payload):
+            print(f"Global Emergency queued for sending: {message_content}")
+        else:
+            print("Global Emergency dropped: telemetry queue full")
 
     is_emergency_dialog_active = False
     emergency_message_dialog = None
@@ -746,7 +730,7 @@ add_ship_button_y = CONTROL_PANEL_Y + large_font.get_height() + 30
 add_ship_button = Button(CONTROL_PANEL_X + 15, add_ship_button_y, 120, 35, "Add New Ship", LIGHT_GREY, DARK_GREY, action=activate_add_ship_dialog)
 
 ship_dropdown_y = add_ship_button.rect.y + add_ship_button.rect.height + 10
-ship_dropdown = Dropdown(CONTROL_PANEL_X + 15, ship_dropdown_y, 250, 40, [])
+ship_dropdown = Dropdown(CONTROL_PANEL_X + 15, ship_dropdown_y, 250, 40, ship_registry) # Lists the queued ships
 
 # Removed the separate 'emergency_button' (Global)
 # The 'emergency_button_edit_ship' will now be the unified button.
@@ -757,14 +741,35 @@ for _ in range(3): # Start with 3 ships
     add_new_random_ship_data()
 
 
+# "Active Ships on Ocean" timetable at the bottom of the control panel, with paging and sort buttons
+TIMETABLE_HEIGHT = 200 # Fixed height for the timetable
+timetable_rect = pygame.Rect(CONTROL_PANEL_X + 10, CONTROL_PANEL_Y + CONTROL_PANEL_HEIGHT - TIMETABLE_HEIGHT - 10, # 10 pixels from bottom
+                             CONTROL_PANEL_WIDTH - 20, TIMETABLE_HEIGHT)
+TIMETABLE_SORT_LABELS = {"name": "By Name", "zone": "By Zone", "arrival": "By Arrival"}
+
+def cycle_timetable_sort():
+    timetable.next_sort_key()
+    timetable_sort_button.text = TIMETABLE_SORT_LABELS[timetable.sort_key]
+    return True
+
+timetable_bar_y = timetable_rect.bottom - 32
+timetable_prev_button = Button(timetable_rect.x + 10, timetable_bar_y, 28, 24, "<", LIGHT_GREY, DARK_GREY, action=timetable.page_up)
+timetable_next_button = Button(timetable_rect.x + 42, timetable_bar_y, 28, 24, ">", LIGHT_GREY, DARK_GREY, action=timetable.page_down)
+timetable_sort_button = Button(timetable_rect.right - 94, timetable_bar_y, 84, 24, TIMETABLE_SORT_LABELS[timetable.sort_key],
+                               LIGHT_GREY, DARK_GREY, action=cycle_timetable_sort)
+timetable_buttons = (timetable_prev_button, timetable_next_button, timetable_sort_button)
+
 # Edit panel for selected ship (global definition, positions will be updated dynamically)
 speed_up_button = Button(0, 0, 80, 30, "+ Speed", GREEN, DARK_GREEN)
 speed_down_button = Button(0, 0, 80, 30, "- Speed", RED, (150,0,0))
-arrival_time_plus_button = Button(0, 0, 120, 30, "+ 20 Mins", YELLOW, ORANGE)
-arrival_time_minus_button = Button(0, 0, 120, 30, "- 20 Mins", YELLOW, ORANGE)
+arrival_time_plus_button = Button(0, 0, 120, 30, "+ 20 Mins", YELLOW, ORANGE, action=lambda: shift_selected_arrival(20))
+arrival_time_minus_button = Button(0, 0, 120, 30, "- 20 Mins", YELLOW, ORANGE, action=lambda: shift_selected_arrival(-20))
 remove_from_terminal_button = Button(0, 0, 90, 30, "Undock", BLUE, (0,0,150))
 # Unified Emergency Button for Edit Ship Block (will also handle global if no ship selected)
 emergency_button_unified = Button(0, 0, 100, 30, "Emergency", RED, (150,0,0), action=activate_unified_emergency_dialog)
+# Every button drawn in the control panel (their hover state is part of the panel's redraw signature)
+panel_buttons = (add_ship_button, speed_up_button, speed_down_button, arrival_time_plus_button,
+                 arrival_time_minus_button, remove_from_terminal_button, emergency_button_unified) + timetable_buttons
 
 # --- Pygame Message Display ---
 pygame_message_queue = collections.deque() # Queue for messages from C client
@@ -777,11 +782,21 @@ def display_pygame_message(message_text):
     current_display_message = message_text
     last_message_display_time = pygame.time.get_ticks()
 
-def poll_for_c_client_messages():
-    global pygame_message_queue
+MESSAGE_LONG_POLL_SECONDS = 25 # Server holds the request open until a message arrives or this expires
+MESSAGE_POLL_RETRY_SECONDS = 1 # Back-off when the server is not reachable
+message_poll_session = requests.Session() # Keep-alive connection used only by the poller thread
+message_poll_etag = None # Last ETag from the server; sent back so an unchanged poll gets an empty 304
+
+def poll_for_c_client_messages(wait=MESSAGE_LONG_POLL_SECONDS):
+    """Long-polls the server for C client messages. Returns False if the server could not be reached."""
+    global pygame_message_queue, message_poll_etag
+    headers = {"If-None-Match": message_poll_etag} if message_poll_etag else {}
     try:
-        response = requests.get(GET_MESSAGES_API_URL, timeout=1)
+        response = message_poll_session.get(GET_MESSAGES_API_URL, params={"wait": wait}, headers=headers, timeout=wait + 5)
+        if response.status_code == 304:
+            return True # Nothing new
         response.raise_for_status()
+        message_poll_etag = response.headers.get("ETag")
         data = response.json()
         if data and data.get("messages"):
             for msg_entry in data["messages"]:
@@ -789,29 +804,365 @@ def poll_for_c_client_messages():
                 timestamp = msg_entry.get("timestamp", "N/A")
                 content = msg_entry.get("content", "No content")
                 full_message = f"C-Client Message ({source} @ {timestamp}): {content}"
-                pygame_message_queue.append(full_message)
+                pygame_message_queue.append(full_message) # deque appends are thread-safe
                 print(f"Pygame received new message for display: {full_message}")
-    except requests.exceptions.RequestException as e:
+        return True
+    except (requests.exceptions.RequestException, ValueError) as e:
         # print(f"Error polling for C client messages: {e}") # Suppress frequent errors
-        pass # Keep silent if server is not reachable for messages
+        return False # Keep silent if server is not reachable for messages
+
+def message_poll_loop():
+    """Runs in a background thread so the long poll never blocks the game loop."""
+    while True:
+        if not poll_for_c_client_messages():
+            time.sleep(MESSAGE_POLL_RETRY_SECONDS)
+
+message_poll_thread = threading.Thread(target=message_poll_loop, name="MessagePoller", daemon=True)
+
+
+# --- Static Background Layer ---
+# The ocean, zone gradients and port never change between frames, so they are drawn once into
+# a Surface and blitted each frame. The layer is rebuilt only when the window size or a zone radius changes.
+static_background = None
+static_background_key = None
+
+def render_static_background(size, red_dist, dark_green_dist, light_green_dist):
+    """Draws the ocean, gradient zones, zone labels and port block onto a new Surface of the given size."""
+    surface = pygame.Surface(size).convert()
+    surface.fill(BLACK)
+
+    # Draw the main ocean background
+    pygame.draw.rect(surface, BLUE, (OCEAN_START_X, 0, size[0] - OCEAN_START_X, size[1]))
+
+    port_center_x = PORT_CENTER_X
+    port_center_y = PORT_CENTER_Y
+
+    # Draw Gradient Zones (from outermost to innermost)
+    # Light Green to Dark Green gradient (from light_green_dist down to dark_green_dist)
+    if light_green_dist > dark_green_dist: # Ensure valid range
+        for r in range(light_green_dist, dark_green_dist -1, -5): # Step by 5 pixels
+            factor = (r - dark_green_dist) / (light_green_dist - dark_green_dist)
+            color = interpolate_color(DARK_GREEN, LIGHT_GREEN, factor) # interpolate from inner to outer color
+            pygame.draw.circle(surface, color, (port_center_x, port_center_y), r, 0) # Filled circle
+
+    # Dark Green to Red gradient (from dark_green_dist down to red_dist)
+    if dark_green_dist > red_dist: # Ensure valid range
+        for r in range(dark_green_dist, red_dist -1, -5): # Step by 5 pixels
+            factor = (r - red_dist) / (dark_green_dist - red_dist)
+            color = interpolate_color(RED, DARK_GREEN, factor) # interpolate from inner to outer color
+            pygame.draw.circle(surface, color, (port_center_x, port_center_y), r, 0) # Filled circle
+
+    # Red Zone core (filled)
+    pygame.draw.circle(surface, RED, (port_center_x, port_center_y), red_dist, 0)
+
+    # Zone Labels (can be drawn as outlines or above the gradients)
+    light_green_label = text_cache.render(font, "Light Green Zone", BLACK)
+    dark_green_label = text_cache.render(font, "Dark Green Zone", BLACK)
+    red_label = text_cache.render(font, "Red Zone", WHITE) # White for red background
+
+    surface.blit(light_green_label, (port_center_x - light_green_label.get_width() // 2, port_center_y - light_green_dist + 10))
+    surface.blit(dark_green_label, (port_center_x - dark_green_label.get_width() // 2, port_center_y - dark_green_dist + 10))
+    surface.blit(red_label, (port_center_x - red_label.get_width() // 2, port_center_y - red_dist + 10))
+
+    # Draw Port Area
+    pygame.draw.rect(surface, DARK_GREY, (PORT_X, PORT_Y, PORT_WIDTH, PORT_HEIGHT), border_radius=10)
+    port_title = text_cache.render(title_font, "Port Control", WHITE)
+    surface.blit(port_title, (PORT_X + PORT_WIDTH // 2 - port_title.get_width() // 2, PORT_Y - 50))
+    return surface
+
+def get_static_background():
+    """Returns the cached static layer, rebuilding it if the window size or zone radii changed."""
+    global static_background, static_background_key
+    # Radii are read from the engine module so runtime changes to the zones are picked up
+    key = (screen.get_size(), port_engine.RED_ZONE_DIST_PX, port_engine.DARK_GREEN_ZONE_DIST_PX,
+           port_engine.LIGHT_GREEN_ZONE_DIST_PX)
+    if key != static_background_key:
+        static_background = render_static_background(*key)
+        static_background_key = key
+    return static_background
+
+# --- Frame Layers ---
+def timetable_rows():
+    """Text rows of the "Active Ships on Ocean" table: the current page of the sorted index."""
+    return timetable.visible_rows()
+
+def occupant_names(terminal):
+    """Names of the ships docked at a terminal (one per occupied capacity slot)."""
+    names = []
+    for ship_id in terminal['occupants']:
+        if ship_id is not None:
+            occupied_ship = engine.ships.get(ship_id)
+            names.append(occupied_ship.name if occupied_ship else "N/A")
+    return names
+
+def draw_terminals(surface):
+    """Draws the terminals (with occupancy) over the port block."""
+    # Draw Terminals within the port
+    for terminal in terminals_data:
+        terminal_rect = pygame.Rect(terminal['x'], terminal['y'], terminal['width'], terminal['height'])
+
+        # Color based on occupancy
+        terminal_color = LIGHT_GREY
+        if terminal['occupied_by'] is not None:
+            terminal_color = (180, 50, 50) # Reddish if occupied
+
+        pygame.draw.rect(surface, terminal_color, terminal_rect, border_radius=5)
+        pygame.draw.rect(surface, BLACK, terminal_rect, 2, border_radius=5) # Terminal outline
+
+        terminal_label = text_cache.render(font, f"Terminal {terminal['id']}", BLACK)
+        surface.blit(terminal_label, (terminal_rect.x + 10, terminal_rect.y + 5))
+
+        capacity_label = text_cache.render(font, f"Capacity: {terminal['capacity']}", BLACK)
+        surface.blit(capacity_label, (terminal_rect.x + 10, terminal_rect.y + 25))
+
+        if terminal['occupied_by']:
+            occupied_ship_name = ", ".join(occupant_names(terminal))
+            occupied_label = text_cache.render(font, f"Occupied by: {occupied_ship_name}", BLACK)
+            surface.blit(occupied_label, (terminal_rect.x + 10, terminal_rect.y + 45))
+
+def draw_control_panel(surface):
+    """Draws the control panel: telemetry line, buttons, dropdown, timetable and the edit panel."""
+    # Draw Control Panel Background (fills the left side)
+    pygame.draw.rect(surface, DARK_GREY, (CONTROL_PANEL_X, CONTROL_PANEL_Y, CONTROL_PANEL_WIDTH, CONTROL_PANEL_HEIGHT), border_radius=10)
+    pygame.draw.rect(surface, BLACK, (CONTROL_PANEL_X, CONTROL_PANEL_Y, CONTROL_PANEL_WIDTH, CONTROL_PANEL_HEIGHT), 2, border_radius=10)
+
+    panel_title = text_cache.render(large_font, "Control Panel", WHITE)
+    surface.blit(panel_title, (CONTROL_PANEL_X + CONTROL_PANEL_WIDTH // 2 - panel_title.get_width() // 2, CONTROL_PANEL_Y + 10))
+
+    # Telemetry pipeline health (queue depth, drops, send latency)
+    telemetry_stats = telemetry_sender.get_stats()
+    telemetry_text = text_cache.render(small_font,
+        f"Queue: {telemetry_stats['queue_depth']}  Dropped: {telemetry_stats['dropped']}  "
+        f"Latency: {telemetry_stats['last_latency_ms']:.0f} ms", WHITE)
+    surface.blit(telemetry_text, (CONTROL_PANEL_X + 15, CONTROL_PANEL_Y + 36)) # Between title and Add Ship button
+
+    # Draw UI elements within the control panel
+    add_ship_button.draw(surface) 
+    ship_dropdown.draw(surface) 
+    # Removed the global emergency button here.
+
+    # Draw Incoming Ships Timetable (now moved to the bottom section of the control panel)
+    pygame.draw.rect(surface, WHITE, timetable_rect, border_radius=10)
+    pygame.draw.rect(surface, BLACK, timetable_rect, 2, border_radius=10)
+
+    # Changed title to reflect active ships
+    table_title = text_cache.render(large_font, "Active Ships on Ocean", BLACK)
+    surface.blit(table_title, (timetable_rect.x + 10, timetable_rect.y + 10))
+
+    y_offset = timetable_rect.y + 40
+
+    for i, ship_info in enumerate(timetable_rows()):
+        # Ensure text stays within bounds (above the paging bar)
+        if y_offset + i * 25 < timetable_bar_y - 10:
+            ship_text = text_cache.render(font, ship_info, BLACK)
+            surface.blit(ship_text, (timetable_rect.x + 10, y_offset + i * 25))
+
+    # Paging and sort bar
+    for button in timetable_buttons:
+        button.draw(surface)
+    page_text = text_cache.render(small_font, timetable.page_label(), BLACK)
+    surface.blit(page_text, page_text.get_rect(midleft=(timetable_next_button.rect.right + 6, timetable_next_button.rect.centery)))
+
+    # Draw edit panel if a ship is selected on the map (now also within control panel)
+    if selected_ship_on_map:
+        # Calculate edit panel position dynamically, above the timetable
+        edit_panel_height = 180 # Increased height to accommodate new button
+        edit_panel_y = timetable_rect.y - edit_panel_height - 10 # 10 pixels above timetable
+
+        # Ensure it doesn't overlap with the dropdown or add ship button
+        min_edit_panel_y = ship_dropdown.rect.y + ship_dropdown.rect.height + 10 # Adjusted to be below dropdown
+        if edit_panel_y < min_edit_panel_y:
+            edit_panel_y = min_edit_panel_y
+            # If it's forced down, adjust its height if necessary to fit
+            if edit_panel_y + edit_panel_height > timetable_rect.y - 5: # Ensure it doesn't touch timetable
+                edit_panel_height = timetable_rect.y - 5 - edit_panel_y
+                if edit_panel_height < 0: edit_panel_height = 0 # Prevent negative height
+
+
+        edit_panel_rect = pygame.Rect(CONTROL_PANEL_X + 10, edit_panel_y, CONTROL_PANEL_WIDTH - 20, edit_panel_height)
+
+        pygame.draw.rect(surface, WHITE, edit_panel_rect, border_radius=10)
+        pygame.draw.rect(surface, BLACK, edit_panel_rect, 2, border_radius=10)
+
+        panel_title = text_cache.render(large_font, f"Edit Ship: {selected_ship_on_map.name}", BLACK)
+        surface.blit(panel_title, (edit_panel_rect.x + 10, edit_panel_rect.y + 10))
 
-# Timer for polling C client messages
-MESSAGE_POLL_EVENT = pygame.USEREVENT + 1
-pygame.time.set_timer(MESSAGE_POLL_EVENT, 1000) # Poll every 1000ms (1 second)
+        # Update button positions relative to the new edit_panel_rect
+        speed_up_button.rect.topleft = (edit_panel_rect.x + 10, edit_panel_rect.y + 40)
+        speed_down_button.rect.topleft = (edit_panel_rect.x + 100, edit_panel_rect.y + 40)
+        arrival_time_plus_button.rect.topleft = (edit_panel_rect.x + 10, edit_panel_rect.y + 80)
+        arrival_time_minus_button.rect.topleft = (edit_panel_rect.x + 140, edit_panel_rect.y + 80)
+        remove_from_terminal_button.rect.topleft = (edit_panel_rect.x + 10, edit_panel_rect.y + 120) # Moved down
+        emergency_button_unified.rect.topleft = (edit_panel_rect.x + 120, edit_panel_rect.y + 120) # Position for unified emergency button
+
+        speed_up_button.draw(surface)
+        speed_down_button.draw(surface)
+        arrival_time_plus_button.draw(surface)
+        arrival_time_minus_button.draw(surface)
+        remove_from_terminal_button.draw(surface)
+        emergency_button_unified.draw(surface) # Draw Unified Emergency Button
+
+        # Planned berth for the selected ship (below the buttons, if the panel has room)
+        if edit_panel_height >= 175:
+            plan_text = text_cache.render(small_font, berth_plan_text(selected_ship_on_map), BLACK)
+            surface.blit(plan_text, (edit_panel_rect.x + 10, edit_panel_rect.y + 158))
+    else: # If no ship is selected, draw the unified emergency button in the main control panel area
+        emergency_button_unified.rect.topleft = (CONTROL_PANEL_X + 15, ship_dropdown.rect.y + ship_dropdown.rect.height + 10)
+        emergency_button_unified.draw(surface)
+
+def terminals_signature():
+    """Everything draw_terminals shows; the terminal layer is redrawn only when this changes."""
+    signature = []
+    for terminal in terminals_data:
+        signature.append(tuple(occupant_names(terminal)))
+    return tuple(signature)
+
+def control_panel_signature():
+    """Everything draw_control_panel shows; the panel is redrawn only when this changes."""
+    telemetry_stats = telemetry_sender.get_stats()
+    return (
+        telemetry_stats['queue_depth'], telemetry_stats['dropped'], round(telemetry_stats['last_latency_ms']),
+        tuple(button.is_hovered for button in panel_buttons),
+        ship_dropdown.signature(),
+        timetable.version,
+        selected_ship_on_map.ship_id if selected_ship_on_map else None,
+        selected_ship_on_map.name if selected_ship_on_map else None,
+        berth_plan_text(selected_ship_on_map) if selected_ship_on_map else None,
+    )
+
+def overlays_active():
+    return bool((is_add_ship_dialog_active and add_ship_dialog) or
+                (is_emergency_dialog_active and emergency_message_dialog) or current_display_message)
+
+def draw_overlays(surface):
+    """Draws the modal dialogs and the C client message popup on top of everything else."""
+    global current_display_message
+    # Draw Add Ship Dialog last, so it's on top
+    if is_add_ship_dialog_active and add_ship_dialog:
+        add_ship_dialog.draw(surface)
 
+    # Draw Emergency Message Dialog last, so it's on top
+    if is_emergency_dialog_active and emergency_message_dialog:
+        emergency_message_dialog.draw(surface)
+
+    # --- Draw C Client Message Popup ---
+    if current_display_message:
+        message_surface = text_cache.render(large_font, current_display_message, BLACK)
+        message_rect = message_surface.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 50))
+
+        # Background for the message
+        bg_rect = message_rect.inflate(20, 10) # Add padding
+        pygame.draw.rect(surface, YELLOW, bg_rect, border_radius=10)
+        pygame.draw.rect(surface, BLACK, bg_rect, 2, border_radius=10)
+
+        surface.blit(message_surface, message_rect)
+
+        # Clear message after duration
+        if pygame.time.get_ticks() - last_message_display_time > MESSAGE_DISPLAY_DURATION:
+            current_display_message = None
+
+# --- Dirty-Rectangle Rendering ---
+# In "dirty" mode only the screen regions that changed are redrawn and pushed with display.update(rects):
+# ships are DirtySprites in the all_sprites LayeredDirty group, the ocean + terminals are its clear background,
+# and the control panel is a sprite on a higher layer that is re-rendered only when its signature changes.
+# "full" repaints everything and flips every frame, as before.
+RENDER_MODE = "dirty" # "dirty" or "full"
+SHIP_LAYER = 0
+PANEL_LAYER = 1
+
+class PanelSprite(pygame.sprite.DirtySprite):
+    """The control panel as one opaque sprite covering the strip left of the ocean."""
+    def __init__(self):
+        super().__init__()
+        self._layer = PANEL_LAYER
+        self.rect = pygame.Rect(0, 0, OCEAN_START_X, SCREEN_HEIGHT)
+        self.image = pygame.Surface(self.rect.size).convert()
+        self.signature = None
+
+    def refresh(self):
+        signature = control_panel_signature()
+        if signature != self.signature:
+            self.signature = signature
+            self.image.fill(BLACK)
+            draw_control_panel(self.image) # Panel coordinates are screen coordinates; the sprite sits at (0, 0)
+            self.dirty = 1
+
+panel_sprite = PanelSprite()
+all_sprites.add(panel_sprite)
+world_layer = None # Static background + terminals, used to erase moved sprites
+world_layer_key = None
+overlays_were_active = False
+
+def draw_ship_labels(surface, ships, areas=None):
+    """
+    Draws the "ID:n" labels over the ship hulls. With areas (the dirty rects just redrawn), only
+    labels of ships inside them are drawn, clipped to each area and kept off the control panel.
+    """
+    if areas is None:
+        for ship in ships:
+            ship_atlas.draw_label(surface, ship.ship_id, ship.rect)
+        return
+    ships = list(ships)
+    ship_rects = [ship.rect for ship in ships]
+    ocean_rect = pygame.Rect(OCEAN_START_X, 0, SCREEN_WIDTH - OCEAN_START_X, SCREEN_HEIGHT)
+    previous_clip = surface.get_clip()
+    for area in areas:
+        area = area.clip(ocean_rect)
+        if not area:
+            continue
+        surface.set_clip(area)
+        for i in area.collidelistall(ship_rects):
+            ship_atlas.draw_label(surface, ships[i].ship_id, ship_rects[i])
+    surface.set_clip(previous_clip)
+
+def render_dirty_frame():
+    """Redraws only what changed since the last frame and returns the screen rects to update."""
+    global world_layer, world_layer_key, overlays_were_active
+    screen_rect = screen.get_rect()
+
+    # Ocean + terminals: rebuilt when the background or any terminal's occupancy changes
+    static_layer = get_static_background()
+    key = (id(static_layer), terminals_signature())
+    if key != world_layer_key:
+        world_layer = static_layer.copy()
+        draw_terminals(world_layer)
+        world_layer_key = key
+        all_sprites.clear(screen, world_layer)
+        all_sprites.repaint_rect(screen_rect) # Rare (dock/undock); repaint everything once
+
+    # Ships: dirty only when their on-screen position moved
+    for ship in active_ships:
+        position = (int(ship.x), int(ship.y))
+        if position != ship.drawn_position:
+            ship.drawn_position = position
+            ship.dirty = 1
+
+    panel_sprite.refresh()
+
+    # Dialogs and the message popup are drawn straight onto the screen, so repaint under them
+    # while they are up and once more after they close
+    overlays = overlays_active()
+    if overlays or overlays_were_active:
+        all_sprites.repaint_rect(screen_rect)
+    overlays_were_active = overlays
+
+    dirty_rects = all_sprites.draw(screen)
+    draw_ship_labels(screen, active_ships, dirty_rects)
+    if overlays:
+        draw_overlays(screen)
+        return [screen_rect]
+    return dirty_rects
 
 # --- Game Loop ---
+telemetry_sender.start()
+message_poll_thread.start()
 running = True
+frame_dt = 0.0 # Seconds since the previous frame, fed to the engine
 while running:
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
             running = False
 
-        if event.type == MESSAGE_POLL_EVENT:
-            poll_for_c_client_messages()
-            if pygame_message_queue and not current_display_message:
-                display_pygame_message(pygame_message_queue.popleft())
-
         # If any dialog is active, only handle its events
         if is_add_ship_dialog_active and add_ship_dialog:
             if add_ship_dialog.handle_event(event):
@@ -826,14 +1177,13 @@ while running:
 
         # Handle dropdown events
         if ship_dropdown.handle_event(event):
-            if ship_dropdown.selected_option:
-                # Find the selected ship data
-                selected_id_str = ship_dropdown.selected_option.split(' ')[0].split(':')[1]
-                selected_ship_data = next((s for s in all_ship_data if str(s['ship_id']) == selected_id_str), None)
+            if ship_dropdown.selected_value is not None:
+                # Find the selected ship data (the option's value is the ship_id)
+                selected_ship_data = ship_registry.get_queued(ship_dropdown.selected_value)
                 
                 if selected_ship_data:
                     # Check if ship is already active on map
-                    current_ship_on_map = next((s for s in active_ships if s.ship_id == selected_ship_data['ship_id']), None)
+                    current_ship_on_map = ship_registry.get_active(selected_ship_data['ship_id'])
 
                     if not current_ship_on_map:
                         # Spawn the ship on the map at a random open sea position
@@ -847,16 +1197,14 @@ while running:
                             spawn_x, spawn_y, # Spawn location
                             selected_ship_data['initial_speed']
                         )
+                        engine.add_ship(new_ship)
                         active_ships.add(new_ship)
                         all_sprites.add(new_ship)
+                        timetable.update(new_ship)
                         
-                        # Remove from all_ship_data and update dropdown
-                        for i, s_data in enumerate(all_ship_data):
-                            if s_data['ship_id'] == selected_ship_data['ship_id']:
-                                all_ship_data.pop(i)
-                                break
-                        update_dropdown_options() # Refresh dropdown to reflect removal
-                        ship_dropdown.selected_option = None # Clear selected option in dropdown
+                        # Move from the queue to the map (drops it from the dropdown)
+                        ship_registry.activate(new_ship)
+                        ship_dropdown.clear_selection() # Clear selected option in dropdown
 
                         if selected_ship_on_map:
                             selected_ship_on_map.is_selected_for_edit = False
@@ -874,6 +1222,12 @@ while running:
 
         # Handle Add Ship button
         add_ship_button.handle_event(event)
+
+        # Timetable paging/sort buttons and mouse-wheel scrolling over the table
+        for button in timetable_buttons:
+            button.handle_event(event)
+        if event.type == pygame.MOUSEWHEEL and timetable_rect.collidepoint(pygame.mouse.get_pos()):
+            timetable.scroll_by(-event.y)
         # The global emergency button is removed, its functionality is now merged into the unified one.
 
 
@@ -899,30 +1253,19 @@ while running:
             if event.button == 1:
                 if selected_ship_on_map and selected_ship_on_map.is_dragging:
                     selected_ship_on_map.stop_drag()
-                    selected_ship_on_map.update_speed_and_zone() # Final update after drag
+                    engine.update_ship(selected_ship_on_map) # Final update after drag
 
                     # Check for drag-to-delete
                     if DELETE_ZONE_RECT.colliderect(selected_ship_on_map.rect):
-                        # Make API call for ship deletion
-                        selected_ship_on_map.send_api_data("ship_deleted")
+                        # Reports ship_deleted and releases the terminal if it was parked
+                        engine.delete_ship(selected_ship_on_map)
 
                         print(f"Ship {selected_ship_on_map.name} (ID:{selected_ship_on_map.ship_id}) deleted by drag-to-delete.")
                         # Remove from active_ships and all_sprites
                         active_ships.remove(selected_ship_on_map)
                         all_sprites.remove(selected_ship_on_map)
                         
-                        # Remove from all_ship_data (if it was somehow still there)
-                        for i, s_data in enumerate(all_ship_data):
-                            if s_data['ship_id'] == selected_ship_on_map.ship_id:
-                                all_ship_data.pop(i)
-                                break
-                        update_dropdown_options() # Refresh dropdown
-                        
-                        # Also release terminal if it was parked
-                        for terminal in terminals_data:
-                            if terminal['occupied_by'] == selected_ship_on_map.ship_id:
-                                terminal['occupied_by'] = None
-                                break
+                        ship_registry.remove(selected_ship_on_map.ship_id)
                         selected_ship_on_map = None # Deselect the deleted ship
 
 
@@ -952,53 +1295,7 @@ while running:
             # Special handling for undock as it needs to access selected_ship_on_map directly
             if remove_from_terminal_button.handle_event(event):
                 ship_to_undock = selected_ship_on_map
-                if ship_to_undock and ship_to_undock.current_zone == "Parked":
-                    print(f"Undocking selected ship {ship_to_undock.name} (ID:{ship_to_undock.ship_id}) from terminal {ship_to_undock.parked_terminal}")
-
-                    # Make API call for leaving the terminal
-                    ship_to_undock.send_api_data("undocked", {"terminal_id": ship_to_undock.parked_terminal})
-
-                    # Release terminal
-                    for terminal in terminals_data:
-                        if terminal['occupied_by'] == ship_to_undock.ship_id:
-                            terminal['occupied_by'] = None
-                            break
-                    
-                    ship_to_undock.parked_terminal = None
-                    ship_to_undock.current_zone = "Light Green Zone" # User requested "green area"
-                    ship_to_undock.current_speed_kmh = random.uniform(40, 70) # Give it some speed
-                    
-                    # Place ship in the Light Green Zone (circular annulus)
-                    port_center_x = PORT_X + PORT_WIDTH // 2
-                    port_center_y = PORT_Y + PORT_HEIGHT // 2
-                    
-                    min_dist_for_green_zone = DARK_GREEN_ZONE_DIST_PX + 20 # Just outside dark green
-                    max_dist_for_green_zone = LIGHT_GREEN_ZONE_DIST_PX - 20 # Just inside light green
-
-                    # Randomly pick a distance within the light green zone range
-                    # Ensure min_dist is less than max_dist to avoid errors if zones are too close
-                    if min_dist_for_green_zone >= max_dist_for_green_zone:
-                        # Fallback if zones overlap too much, pick a point near the center of the outer green zone
-                        target_dist = (DARK_GREEN_ZONE_DIST_PX + LIGHT_GREEN_ZONE_DIST_PX) / 2
-                    else:
-                        target_dist = random.uniform(min_dist_for_green_zone, max_dist_for_green_zone)
-
-                    # Randomly pick an angle (0 to 2*pi radians)
-                    angle = random.uniform(0, 2 * math.pi)
-
-                    # Calculate new coordinates
-                    new_x = port_center_x + target_dist * math.cos(angle) - ship_to_undock.rect.width // 2
-                    new_y = port_center_y + target_dist * math.sin(angle) - ship_to_undock.rect.height // 2
-                    
-                    # Ensure it stays within screen bounds (basic check for the whole ocean area)
-                    # We use the OCEAN_START_X, OCEAN_WIDTH, SCREEN_HEIGHT for this
-                    new_x = max(OCEAN_START_X, min(new_x, SCREEN_WIDTH - ship_to_undock.rect.width))
-                    new_y = max(0, min(new_y, SCREEN_HEIGHT - ship_to_undock.rect.height))
-
-                    ship_to_undock.rect.topleft = (new_x, new_y)
-                    ship_to_undock.movement_direction = "outgoing" # Set direction for subsequent zone calls
-                    ship_to_undock.send_api_data("zone_change") # Update status via API (now in light green)
-                    
+                if ship_to_undock and engine.undock(ship_to_undock): # Back out to the Light Green Zone
                     # Deselect the undocked ship
                     selected_ship_on_map.is_selected_for_edit = False
                     selected_ship_on_map = None
@@ -1008,192 +1305,40 @@ while running:
             emergency_button_unified.handle_event(event) # Now this handles both
 
 
+    # Show the next C client message as soon as the poller thread has delivered one
+    if pygame_message_queue and not current_display_message:
+        display_pygame_message(pygame_message_queue.popleft())
+
     # --- Update Game State ---
     # Update ship zones and speeds if they are not being dragged
-    for ship in active_ships:
-        if not ship.is_dragging: # Only update automatically if not dragging
-            ship.update_speed_and_zone()
+    engine.step(frame_dt)
 
     # --- Drawing ---
-    # Draw the main ocean background
-    pygame.draw.rect(screen, BLUE, (OCEAN_START_X, 0, OCEAN_WIDTH, OCEAN_HEIGHT))
-
-    port_center_x = PORT_X + PORT_WIDTH // 2
-    port_center_y = PORT_Y + PORT_HEIGHT // 2
-
-    # Draw Gradient Zones (from outermost to innermost)
-    # Light Green to Dark Green gradient (from LIGHT_GREEN_ZONE_DIST_PX down to DARK_GREEN_ZONE_DIST_PX)
-    if LIGHT_GREEN_ZONE_DIST_PX > DARK_GREEN_ZONE_DIST_PX: # Ensure valid range
-        for r in range(LIGHT_GREEN_ZONE_DIST_PX, DARK_GREEN_ZONE_DIST_PX -1, -5): # Step by 5 pixels
-            factor = (r - DARK_GREEN_ZONE_DIST_PX) / (LIGHT_GREEN_ZONE_DIST_PX - DARK_GREEN_ZONE_DIST_PX)
-            color = interpolate_color(DARK_GREEN, LIGHT_GREEN, factor) # interpolate from inner to outer color
-            pygame.draw.circle(screen, color, (port_center_x, port_center_y), r, 0) # Filled circle
-
-    # Dark Green to Red gradient (from DARK_GREEN_ZONE_DIST_PX down to RED_ZONE_DIST_PX)
-    if DARK_GREEN_ZONE_DIST_PX > RED_ZONE_DIST_PX: # Ensure valid range
-        for r in range(DARK_GREEN_ZONE_DIST_PX, RED_ZONE_DIST_PX -1, -5): # Step by 5 pixels
-            factor = (r - RED_ZONE_DIST_PX) / (DARK_GREEN_ZONE_DIST_PX - RED_ZONE_DIST_PX) # Corrected line
-            color = interpolate_color(RED, DARK_GREEN, factor) # interpolate from inner to outer color
-            pygame.draw.circle(screen, color, (port_center_x, port_center_y), r, 0) # Filled circle
-
-    # Red Zone core (filled)
-    pygame.draw.circle(screen, RED, (port_center_x, port_center_y), RED_ZONE_DIST_PX, 0)
-
-    # Zone Labels (can be drawn as outlines or above the gradients)
-    light_green_label = font.render("Light Green Zone", True, BLACK)
-    dark_green_label = font.render("Dark Green Zone", True, BLACK)
-    red_label = font.render("Red Zone", True, WHITE) # White for red background
-    
-    screen.blit(light_green_label, (port_center_x - light_green_label.get_width() // 2, port_center_y - LIGHT_GREEN_ZONE_DIST_PX + 10))
-    screen.blit(dark_green_label, (port_center_x - dark_green_label.get_width() // 2, port_center_y - DARK_GREEN_ZONE_DIST_PX + 10))
-    screen.blit(red_label, (port_center_x - red_label.get_width() // 2, port_center_y - RED_ZONE_DIST_PX + 10))
-
-
-    # Draw Port Area
-    pygame.draw.rect(screen, DARK_GREY, (PORT_X, PORT_Y, PORT_WIDTH, PORT_HEIGHT), border_radius=10)
-    port_title = title_font.render("Port Control", True, WHITE)
-    screen.blit(port_title, (PORT_X + PORT_WIDTH // 2 - port_title.get_width() // 2, PORT_Y - 50))
-
-
-    # Draw Terminals within the port
-    for terminal in terminals_data:
-        terminal_rect = pygame.Rect(terminal['x'], terminal['y'], terminal['width'], terminal['height'])
-        
-        # Color based on occupancy
-        terminal_color = LIGHT_GREY
-        if terminal['occupied_by'] is not None:
-            terminal_color = (180, 50, 50) # Reddish if occupied
-        
-        pygame.draw.rect(screen, terminal_color, terminal_rect, border_radius=5)
-        pygame.draw.rect(screen, BLACK, terminal_rect, 2, border_radius=5) # Terminal outline
-
-        terminal_label = font.render(f"Terminal {terminal['id']}", True, BLACK)
-        screen.blit(terminal_label, (terminal_rect.x + 10, terminal_rect.y + 5))
-        
-        capacity_label = font.render(f"Capacity: {terminal['capacity']}", True, BLACK)
-        screen.blit(capacity_label, (terminal_rect.x + 10, terminal_rect.y + 25))
-
-        if terminal['occupied_by']:
-            occupied_ship_name = "N/A"
-            for ship in active_ships:
-                if ship.ship_id == terminal['occupied_by']:
-                    occupied_ship_name = ship.name
-                    break
-            occupied_label = font.render(f"Occupied by: {occupied_ship_name}", True, BLACK)
-            screen.blit(occupied_label, (terminal_rect.x + 10, terminal_rect.y + 45))
-
-
-    # Draw active ships
-    active_ships.draw(screen)
-
-    # Draw Control Panel Background (fills the left side)
-    pygame.draw.rect(screen, DARK_GREY, (CONTROL_PANEL_X, CONTROL_PANEL_Y, CONTROL_PANEL_WIDTH, CONTROL_PANEL_HEIGHT), border_radius=10)
-    pygame.draw.rect(screen, BLACK, (CONTROL_PANEL_X, CONTROL_PANEL_Y, CONTROL_PANEL_WIDTH, CONTROL_PANEL_HEIGHT), 2, border_radius=10)
-    
-    panel_title = large_font.render("Control Panel", True, WHITE)
-    screen.blit(panel_title, (CONTROL_PANEL_X + CONTROL_PANEL_WIDTH // 2 - panel_title.get_width() // 2, CONTROL_PANEL_Y + 10))
-
-    # Draw UI elements within the control panel
-    add_ship_button.draw(screen) 
-    ship_dropdown.draw(screen) 
-    # Removed the global emergency button here.
-
-    # Draw Incoming Ships Timetable (now moved to the bottom section of the control panel)
-    timetable_height = 200 # Fixed height for the timetable
-    # Calculate y-position from the bottom of the control panel
-    timetable_y = CONTROL_PANEL_Y + CONTROL_PANEL_HEIGHT - timetable_height - 10 # 10 pixels from bottom
-    timetable_rect = pygame.Rect(CONTROL_PANEL_X + 10, timetable_y, CONTROL_PANEL_WIDTH - 20, timetable_height)
-    pygame.draw.rect(screen, WHITE, timetable_rect, border_radius=10)
-    pygame.draw.rect(screen, BLACK, timetable_rect, 2, border_radius=10)
-    
-    # Changed title to reflect active ships
-    table_title = large_font.render("Active Ships on Ocean", True, BLACK)
-    screen.blit(table_title, (timetable_rect.x + 10, timetable_rect.y + 10))
-
-    y_offset = timetable_rect.y + 40
-    
-    # Filter for ships currently on the map (active_ships)
-    # Iterate directly over active_ships sprite group
-    active_ships_list = sorted(active_ships.sprites(), key=lambda s: s.name) # Sort by name for consistent display
-
-    for i, ship in enumerate(active_ships_list[:5]): # Show top 5 active ships
-        # Ensure text stays within bounds
-        if y_offset + i * 25 < timetable_rect.y + timetable_rect.height - 20: 
-            ship_info = f"ID:{ship.ship_id} {ship.name} (Zone: {ship.current_zone})"
-            ship_text = font.render(ship_info, True, BLACK)
-            screen.blit(ship_text, (timetable_rect.x + 10, y_offset + i * 25))
-    
-    # Draw edit panel if a ship is selected on the map (now also within control panel)
-    if selected_ship_on_map:
-        # Calculate edit panel position dynamically, above the timetable
-        edit_panel_height = 180 # Increased height to accommodate new button
-        edit_panel_y = timetable_rect.y - edit_panel_height - 10 # 10 pixels above timetable
-        
-        # Ensure it doesn't overlap with the dropdown or add ship button
-        min_edit_panel_y = ship_dropdown.rect.y + ship_dropdown.rect.height + 10 # Adjusted to be below dropdown
-        if edit_panel_y < min_edit_panel_y:
-            edit_panel_y = min_edit_panel_y
-            # If it's forced down, adjust its height if necessary to fit
-            if edit_panel_y + edit_panel_height > timetable_rect.y - 5: # Ensure it doesn't touch timetable
-                edit_panel_height = timetable_rect.y - 5 - edit_panel_y
-                if edit_panel_height < 0: edit_panel_height = 0 # Prevent negative height
-
-
-        edit_panel_rect = pygame.Rect(CONTROL_PANEL_X + 10, edit_panel_y, CONTROL_PANEL_WIDTH - 20, edit_panel_height)
-
-        pygame.draw.rect(screen, WHITE, edit_panel_rect, border_radius=10)
-        pygame.draw.rect(screen, BLACK, edit_panel_rect, 2, border_radius=10)
-        
-        panel_title = large_font.render(f"Edit Ship: {selected_ship_on_map.name}", True, BLACK)
-        screen.blit(panel_title, (edit_panel_rect.x + 10, edit_panel_rect.y + 10))
-
-        # Update button positions relative to the new edit_panel_rect
-        speed_up_button.rect.topleft = (edit_panel_rect.x + 10, edit_panel_rect.y + 40)
-        speed_down_button.rect.topleft = (edit_panel_rect.x + 100, edit_panel_rect.y + 40)
-        arrival_time_plus_button.rect.topleft = (edit_panel_rect.x + 10, edit_panel_rect.y + 80)
-        arrival_time_minus_button.rect.topleft = (edit_panel_rect.x + 140, edit_panel_rect.y + 80)
-        remove_from_terminal_button.rect.topleft = (edit_panel_rect.x + 10, edit_panel_rect.y + 120) # Moved down
-        emergency_button_unified.rect.topleft = (edit_panel_rect.x + 120, edit_panel_rect.y + 120) # Position for unified emergency button
-
-        speed_up_button.draw(screen)
-        speed_down_button.draw(screen)
-        arrival_time_plus_button.draw(screen)
-        arrival_time_minus_button.draw(screen)
-        remove_from_terminal_button.draw(screen)
-        emergency_button_unified.draw(screen) # Draw Unified Emergency Button
-    else: # If no ship is selected, draw the unified emergency button in the main control panel area
-        emergency_button_unified.rect.topleft = (CONTROL_PANEL_X + 15, ship_dropdown.rect.y + ship_dropdown.rect.height + 10)
-        emergency_button_unified.draw(screen)
-
+    if RENDER_MODE == "dirty":
+        pygame.display.update(render_dirty_frame()) # Push only the changed regions
+    else:
+        # Ocean, zone gradients, zone labels and the port block come from the cached static layer
+        screen.blit(get_static_background(), (0, 0))
 
-    # Draw Add Ship Dialog last, so it's on top
-    if is_add_ship_dialog_active and add_ship_dialog:
-        add_ship_dialog.draw(screen)
-    
-    # Draw Emergency Message Dialog last, so it's on top
-    if is_emergency_dialog_active and emergency_message_dialog:
-        emergency_message_dialog.draw(screen)
+        # Draw Terminals within the port
+        draw_terminals(screen)
 
-    # --- Draw C Client Message Popup ---
-    if current_display_message:
-        message_surface = large_font.render(current_display_message, True, BLACK)
-        message_rect = message_surface.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 50))
-        
-        # Background for the message
-        bg_rect = message_rect.inflate(20, 10) # Add padding
-        pygame.draw.rect(screen, YELLOW, bg_rect, border_radius=10)
-        pygame.draw.rect(screen, BLACK, bg_rect, 2, border_radius=10)
-        
-        screen.blit(message_surface, message_rect)
+        # Draw active ships
+        active_ships.draw(screen)
+        draw_ship_labels(screen, active_ships)
 
-        # Clear message after duration
-        if pygame.time.get_ticks() - last_message_display_time > MESSAGE_DISPLAY_DURATION:
-            current_display_message = None
+        # Draw Control Panel Background (fills the left side)
+        draw_control_panel(screen)
 
+        # Draw dialogs and the message popup last, so they're on top
+        draw_overlays(screen)
 
-    pygame.display.flip()
-    clock.tick(FPS)
+        pygame.display.flip()
+    frame_dt = clock.tick(FPS) / 1000.0
 
 # --- Quit Pygame ---
+telemetry_sender.stop() # Flush queued events before exiting
+print(telemetry_sender.format_stats())
+print(text_cache.format_stats())
 pygame.quit()
 sys.exit()
@@ -0,0 +1,77 @@
+# ship_registry.py
+# Central index of the ships the UI knows about, keyed by ship_id.
+
+
+def option_label(data):
+    """Dropdown text for a queued ship."""
+    return f"ID:{data['ship_id']} - {data['name']} (Arr: {data['arrival_time'].strftime('%H:%M')})"
+
+
+class ShipRegistry:
+    """
+    Every ship, keyed by ship_id, in one of two views:
+    queued - ship data dicts waiting in the schedule (the dropdown), in the order they were added;
+    active - Ship sprites on the map.
+    Lookups, spawns and deletions are dict operations. Dropdown labels are formatted once per ship,
+    and the option list is only rebuilt (from those labels) when the dropdown reads it after a change.
+    """
+    def __init__(self):
+        self.queued = {} # ship_id -> ship data dict
+        self.active = {} # ship_id -> Ship
+        self._labels = {} # ship_id -> dropdown label (queued ships only)
+        self._options = None # Cached [(ship_id, label)] for the dropdown; None = stale
+        self.version = 0 # Bumped whenever the queued view changes
+
+    def __len__(self):
+        return len(self.queued) + len(self.active)
+
+    def __contains__(self, ship_id):
+        return ship_id in self.queued or ship_id in self.active
+
+    # --- Queued Ships ---
+    def add_queued(self, data):
+        ship_id = data['ship_id']
+        if ship_id in self:
+            raise ValueError(f"Ship {ship_id} is already registered")
+        self.queued[ship_id] = data
+        self._labels[ship_id] = option_label(data)
+        self._queued_changed()
+
+    def get_queued(self, ship_id):
+        return self.queued.get(ship_id)
+
+    def label(self, ship_id):
+        return self._labels.get(ship_id)
+
+    def dropdown_options(self):
+        """(ship_id, label) pairs for the queued ships, in schedule order."""
+        if self._options is None:
+            labels = self._labels
+            self._options = [(ship_id, labels[ship_id]) for ship_id in self.queued]
+        return self._options
+
+    # --- Active Ships ---
+    def get_active(self, ship_id):
+        return self.active.get(ship_id)
+
+    def activate(self, ship):
+        """Moves a ship from the queue onto the map."""
+        if self.queued.pop(ship.ship_id, None) is not None:
+            del self._labels[ship.ship_id]
+            self._queued_changed()
+        self.active[ship.ship_id] = ship
+
+    def remove(self, ship_id):
+        """Forgets a ship in either view. Returns the removed data dict or Ship, or None."""
+        ship = self.active.pop(ship_id, None)
+        if ship is not None:
+            return ship
+        data = self.queued.pop(ship_id, None)
+        if data is not None:
+            del self._labels[ship_id]
+            self._queued_changed()
+        return data
+
+    def _queued_changed(self):
+        self._options = None
+        self.version += 1
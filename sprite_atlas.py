@@ -0,0 +1,70 @@
+# sprite_atlas.py
+# Shared ship graphics: one hull image per size class, and ID labels drawn from cached glyphs.
+import pygame
+
+SIZE_CLASSES = ('small', 'medium', 'large') # ShipState.size values
+
+
+class GlyphCache:
+    """
+    One rendered surface per character, so any label is a row of blits instead of a font.render call.
+    Ship IDs only use a dozen distinct characters, however many ships there are.
+    """
+    def __init__(self, font, color):
+        self.font = font
+        self.color = color
+        self._glyphs = {} # char -> surface
+
+    def glyph(self, char):
+        surface = self._glyphs.get(char)
+        if surface is None:
+            surface = self.font.render(char, True, self.color)
+            self._glyphs[char] = surface
+        return surface
+
+    def text_width(self, text):
+        return sum(self.glyph(char).get_width() for char in text)
+
+    def draw(self, surface, text, center):
+        """Blits text centred on center."""
+        x = center[0] - self.text_width(text) // 2
+        y = center[1] - self.font.get_height() // 2
+        for char in text:
+            glyph = self.glyph(char)
+            surface.blit(glyph, (x, y))
+            x += glyph.get_width()
+
+
+class ShipImageAtlas:
+    """
+    Hull images for every size class, packed side by side into one surface. Ships share these
+    images (subsurfaces of the atlas) instead of each owning a Surface; the "ID:n" label is
+    drawn on top when the ship is drawn.
+    """
+    def __init__(self, width, height, fill_color, border_color, label_font, label_color, size_classes=SIZE_CLASSES):
+        self.width = width
+        self.height = height
+        self.surface = pygame.Surface((width * len(size_classes), height))
+        self._hulls = {}
+        for i, size_class in enumerate(size_classes):
+            hull_rect = pygame.Rect(i * width, 0, width, height)
+            self.surface.fill(fill_color, hull_rect)
+            pygame.draw.rect(self.surface, border_color, hull_rect, 2) # Border
+            self._hulls[size_class] = self.surface.subsurface(hull_rect)
+        self._default_hull = self._hulls[size_classes[0]]
+        self.labels = GlyphCache(label_font, label_color)
+
+    def hull(self, size_class):
+        return self._hulls.get(size_class, self._default_hull)
+
+    def convert(self):
+        """Converts the atlas to the display format once a display mode is set (faster blits)."""
+        converted = self.surface.convert()
+        self._hulls = {size_class: converted.subsurface(hull.get_offset(), hull.get_size())
+                       for size_class, hull in self._hulls.items()}
+        self._default_hull = next(iter(self._hulls.values()))
+        self.surface = converted
+
+    def draw_label(self, surface, ship_id, rect):
+        """Draws "ID:n" centred on a ship's rect."""
+        self.labels.draw(surface, f"ID:{ship_id}", rect.center)
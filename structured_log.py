@@ -0,0 +1,65 @@
+# structured_log.py
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+
+
+class JsonLineFormatter(logging.Formatter):
+    """One compact JSON object per line: time, level, message and the record's structured fields."""
+    def format(self, record):
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created).isoformat(),
+            "level": record.levelname,
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable banner line followed by the compact JSON fields (for local debugging)."""
+    def format(self, record):
+        line = f"--- {record.getMessage()} ({datetime.datetime.fromtimestamp(record.created).isoformat()}) ---"
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += "\n" + json.dumps(fields, default=str)
+        return line
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that hands the raw record to the listener thread.
+    The stock handler formats the message in the calling thread; here the request path
+    only pays for building the record and a queue put.
+    """
+    def prepare(self, record):
+        return record
+
+
+def setup_logger(name, level="INFO", fmt="json", stream=None):
+    """
+    Creates a logger whose records are formatted and written by a background thread.
+    fmt: "json" (compact JSON lines), "text" (readable banners) or "off" (discard everything).
+    Returns (logger, listener); call listener.stop() on shutdown to flush (listener is None when off).
+    """
+    logger = logging.getLogger(name)
+    logger.handlers.clear()
+    logger.propagate = False
+    if fmt == "off":
+        logger.disabled = True
+        return logger, None
+
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonLineFormatter() if fmt == "json" else TextFormatter())
+
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(DeferredQueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+    listener.start()
+    return logger, listener
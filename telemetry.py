@@ -0,0 +1,139 @@
+# telemetry.py
+import threading
+import queue
+import time
+import requests # Import the requests library for API calls
+
+
+class TelemetrySender:
+    """
+    Background sender for ship events.
+    The game loop only pays for an enqueue: a worker thread drains a bounded queue,
+    coalesces events into batches (on a size or time window) and posts each batch
+    to the server's /log_events endpoint over one keep-alive requests.Session.
+    """
+    def __init__(self, url, max_queue_size=1000, batch_size=50, batch_interval=0.25, timeout=1):
+        self.url = url
+        self.batch_size = batch_size # Max events per batch
+        self.batch_interval = batch_interval # Max seconds to wait for a batch to fill up
+        self.timeout = timeout
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._session = requests.Session() # One keep-alive connection for all sends
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "sent": 0,
+            "failed": 0,
+            "dropped": 0,
+            "batches": 0,
+            "last_latency_ms": 0.0,
+            "max_latency_ms": 0.0,
+            "total_latency_ms": 0.0,
+        }
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="TelemetrySender", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=2.0):
+        """Stops the worker after it has flushed whatever is still queued."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self._session.close()
+
+    def submit(self, payload, block=False):
+        """
+        Queues an event for sending. Never blocks unless block=True (for offline replays that must not drop).
+        Returns False (and counts a drop) if the queue is full.
+        """
+        try:
+            self._queue.put(payload, block=block)
+            return True
+        except queue.Full:
+            with self._stats_lock:
+                self._stats["dropped"] += 1
+            return False
+
+    def get_stats(self):
+        """Returns a snapshot of queue depth, drops and send latency."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["avg_latency_ms"] = stats["total_latency_ms"] / stats["batches"] if stats["batches"] else 0.0
+        del stats["total_latency_ms"]
+        return stats
+
+    def format_stats(self):
+        stats = self.get_stats()
+        return (f"Telemetry: queue {stats['queue_depth']}, sent {stats['sent']}, "
+                f"dropped {stats['dropped']}, failed {stats['failed']}, "
+                f"latency {stats['last_latency_ms']:.0f} ms (avg {stats['avg_latency_ms']:.0f})")
+
+    def _collect_batch(self):
+        """Waits for the first event, then keeps collecting until the batch is full or the window closes."""
+        try:
+            first = self._queue.get(timeout=self.batch_interval)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.batch_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self):
+        """Takes everything still queued without waiting (used on shutdown)."""
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _send_batch(self, batch):
+        """Posts the whole batch to the /log_events endpoint in a single request."""
+        start = time.perf_counter()
+        sent = 0
+        try:
+            response = self._session.post(self.url, json=batch, timeout=self.timeout)
+            response.raise_for_status() # Raise an exception for HTTP errors (4xx or 5xx)
+            for result in response.json().get("results", []):
+                if result.get("status") == "ok":
+                    sent += 1
+                else:
+                    payload = batch[result["index"]]
+                    print(f"Server rejected {payload.get('event_type')} (Ship ID: {payload.get('ship_id')}): {result.get('detail')}")
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"API call failed for batch of {len(batch)} events: {e}")
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        with self._stats_lock:
+            self._stats["sent"] += sent
+            self._stats["failed"] += len(batch) - sent
+            self._stats["batches"] += 1
+            self._stats["last_latency_ms"] = latency_ms
+            self._stats["max_latency_ms"] = max(self._stats["max_latency_ms"], latency_ms)
+            self._stats["total_latency_ms"] += latency_ms
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            batch = self._collect_batch()
+            if batch:
+                self._send_batch(batch)
+
+        # Flush what is left so events logged right before quitting are not lost
+        batch = self._drain()
+        while batch:
+            self._send_batch(batch)
+            batch = self._drain()
@@ -0,0 +1,164 @@
+# terminals.py
+import bisect # For the position-ordered terminal list
+
+
+def _lowest_bit(word):
+    return (word & -word).bit_length() - 1
+
+
+class FreeBitmap:
+    """
+    Set of positions 0..size-1 as a 64-ary tree of bit masks: level 0 has one bit per position,
+    each level above one bit per non-empty word of the level below. add/discard change one word
+    and only climb while that word switches between empty and non-empty; a port needs more than
+    4096 berths before there is a third level, so both are O(1) in practice (O(log64 n) at worst).
+    The neighbour queries climb to the first word holding a candidate and descend with bit tricks.
+    """
+    def __init__(self, size):
+        self.size = max(1, size)
+        self.count = 0
+        self.levels = [] # levels[0] is the leaf level
+        words = self.size
+        while True:
+            words = (words + 63) // 64
+            self.levels.append([0] * words)
+            if words == 1:
+                break
+
+    def __contains__(self, pos):
+        return bool(self.levels[0][pos >> 6] >> (pos & 63) & 1)
+
+    def add(self, pos):
+        if pos in self:
+            return
+        self.count += 1
+        for words in self.levels:
+            i = pos >> 6
+            was_empty = not words[i]
+            words[i] |= 1 << (pos & 63)
+            if not was_empty:
+                break
+            pos = i # The word was empty, so set its bit one level up
+
+    def discard(self, pos):
+        if pos not in self:
+            return
+        self.count -= 1
+        for words in self.levels:
+            i = pos >> 6
+            words[i] &= ~(1 << (pos & 63))
+            if words[i]:
+                break
+            pos = i # The word is now empty, so clear its bit one level up
+
+    def next_at_or_after(self, pos):
+        """Smallest position in the set that is >= pos, or None."""
+        for level, words in enumerate(self.levels):
+            i = pos >> 6
+            if i >= len(words):
+                return None
+            word = words[i] >> (pos & 63) << (pos & 63) # Drop the bits below pos
+            if word:
+                pos = (i << 6) + _lowest_bit(word)
+                break
+            pos = i + 1 # Continue with the next word, one level up
+        else:
+            return None
+        for words in reversed(self.levels[:level]):
+            pos = (pos << 6) + _lowest_bit(words[pos])
+        return pos
+
+    def prev_at_or_before(self, pos):
+        """Largest position in the set that is <= pos, or None."""
+        pos = min(pos, self.size - 1)
+        for level, words in enumerate(self.levels):
+            if pos < 0:
+                return None
+            i = pos >> 6
+            word = words[i] & ((2 << (pos & 63)) - 1) # Drop the bits above pos
+            if word:
+                pos = (i << 6) + word.bit_length() - 1
+                break
+            pos = i - 1 # Continue with the previous word, one level up
+        else:
+            return None
+        for words in reversed(self.levels[:level]):
+            pos = (pos << 6) + words[pos].bit_length() - 1
+        return pos
+
+
+class TerminalManager:
+    """
+    Indexed berth allocation over the terminal dicts ('id', 'x', 'y', 'width', 'height', 'capacity', 'occupied_by').
+    Each terminal gets 'occupants', a list of capacity slots holding ship ids (None = free slot);
+    'occupied_by' stays the first occupant (or None) for the UI.
+    Terminals are sorted once by vertical centre; a FreeBitmap over that order marks the ones
+    with a free slot. Finding the nearest free terminal is a bisect plus two bitmap lookups
+    (O(log n)); occupy/release flip one bit (O(1), plus a scan of that terminal's own slots).
+    Ships map straight to their terminal for release.
+    """
+    def __init__(self, terminals):
+        self.terminals = terminals # Kept in the given order for drawing
+        self.by_id = {}
+        self._ship_terminal = {} # ship_id -> terminal
+        self._by_position = sorted(terminals, key=lambda terminal: terminal['y'] + terminal['height'] / 2) # Stable: ties keep the given order
+        self._position_keys = [terminal['y'] + terminal['height'] / 2 for terminal in self._by_position]
+        self._free = FreeBitmap(len(terminals)) # Positions in _by_position with a free slot
+        for position, terminal in enumerate(self._by_position):
+            terminal['occupants'] = [None] * max(1, terminal.get('capacity', 1))
+            terminal['occupied_by'] = None
+            terminal['_position'] = position
+            self.by_id[terminal['id']] = terminal
+            self._free.add(position)
+
+    def __len__(self):
+        return len(self.terminals)
+
+    def get(self, terminal_id):
+        return self.by_id.get(terminal_id)
+
+    def terminal_of(self, ship_id):
+        return self._ship_terminal.get(ship_id)
+
+    def has_free(self):
+        return self._free.count > 0
+
+    def free_count(self):
+        """Number of terminals with at least one free slot."""
+        return self._free.count
+
+    def nearest_free(self, centery):
+        """The terminal with a free slot whose centre is vertically closest to centery (ties go to the upper one)."""
+        i = bisect.bisect_left(self._position_keys, centery)
+        above = self._free.prev_at_or_before(i - 1)
+        below = self._free.next_at_or_after(i)
+        if above is None:
+            return None if below is None else self._by_position[below]
+        if below is None or centery - self._position_keys[above] <= self._position_keys[below] - centery:
+            return self._by_position[above]
+        return self._by_position[below]
+
+    def occupy(self, terminal, ship_id):
+        """Puts ship_id in the terminal's first free slot and returns the slot index."""
+        slots = terminal['occupants']
+        slot = slots.index(None) # Raises ValueError if the terminal is full
+        slots[slot] = ship_id
+        if terminal['occupied_by'] is None:
+            terminal['occupied_by'] = ship_id
+        self._ship_terminal[ship_id] = terminal
+        if None not in slots: # Now full
+            self._free.discard(terminal['_position'])
+        return slot
+
+    def release(self, ship_id):
+        """Frees the slot held by ship_id; returns its terminal, or None if it was not docked."""
+        terminal = self._ship_terminal.pop(ship_id, None)
+        if terminal is None:
+            return None
+        slots = terminal['occupants']
+        was_full = None not in slots
+        slots[slots.index(ship_id)] = None
+        terminal['occupied_by'] = next((occupant for occupant in slots if occupant is not None), None)
+        if was_full:
+            self._free.add(terminal['_position'])
+        return terminal
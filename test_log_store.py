@@ -0,0 +1,109 @@
+# test_log_store.py
+# Seq cursor, spill, index window and restart behaviour of the event log.
+#   python -m pytest test_log_store.py
+import datetime
+import random
+
+import pytest
+
+from log_store import LogStore, SQLiteEventArchive, InvalidEvent, LogBatchTooLarge, event_matches
+
+BASE_TIME = datetime.datetime(2026, 1, 1)
+
+
+def make_events(count, first=0, rng=None):
+    rng = rng or random.Random(first)
+    return [{
+        "ship_id": rng.randint(1, 20),
+        "event_type": rng.choice(("zone_change", "docked", "undocked", "emergency")),
+        "current_zone": rng.choice(("Open Sea", "Red", "Parked", None)),
+        "server_received_timestamp": (BASE_TIME + datetime.timedelta(seconds=first + i)).isoformat(),
+    } for i in range(count)]
+
+
+def small_store(tmp_path, archive=None):
+    """A store that spills, rolls segments and trims its index after a few hundred events."""
+    return LogStore(str(tmp_path / "segments"), memory_events=50, segment_bytes=4096,
+                    archive=archive, index_events=200)
+
+
+def test_invalid_event_leaves_the_log_untouched(tmp_path):
+    store = small_store(tmp_path)
+    store.append(make_events(3))
+    with pytest.raises(InvalidEvent):
+        store.append([{"ship_id": 5}, {"ship_id": 5, "current_zone": ["x"]}])
+    with pytest.raises(InvalidEvent):
+        store.append([{"ship_id": {"a": 1}}])
+    assert store.last_seq == 3
+    assert store.query(ship_id=5) == []
+
+    store.append([{"ship_id": 7}])
+    assert [event["seq"] for event in store.read_events(0, 10)] == [1, 2, 3, 4]
+    assert [event["seq"] for event in store.query(ship_id=7)] == [4]
+
+
+def test_cursor_reads_across_spill(tmp_path):
+    store = small_store(tmp_path)
+    for first in range(0, 1000, 100):
+        store.append(make_events(100, first))
+    assert len(store._segments) > 1 # Spilled into several segment files
+
+    since = 0
+    seen = []
+    while True:
+        events = store.read_events(since, 37)
+        if not events:
+            break
+        seen.extend(event["seq"] for event in events)
+        since = events[-1]["seq"]
+    assert seen == list(range(1, 1001))
+    assert [line[:7] for line in store.read_raw(10, 2)] == [b'{"ship_', b'{"ship_']
+    assert store.get_event(10)["seq"] == 10
+
+
+def test_query_matches_brute_force(tmp_path):
+    store = small_store(tmp_path)
+    everything = []
+    for first in range(0, 1000, 100):
+        events = make_events(100, first)
+        store.append(events)
+        everything.extend(events)
+    assert store.index.first_seq > 1 # Older events are only reachable through the segments
+
+    rng = random.Random(7)
+    for _ in range(200):
+        filters = {
+            "ship_id": rng.choice((None, rng.randint(1, 21))),
+            "event_type": rng.choice((None, "docked", "emergency")),
+            "zone": rng.choice((None, "Red")),
+        }
+        if rng.random() < 0.3:
+            start = (BASE_TIME + datetime.timedelta(seconds=rng.randint(0, 1000))).timestamp()
+            filters.update(start_time=start, end_time=start + rng.randint(0, 300))
+        after_seq = rng.randint(0, 1000)
+        limit = rng.randint(1, 150)
+        expected = [event["seq"] for event in everything
+                    if event["seq"] > after_seq and event_matches(event, **filters)][:limit]
+        got = [event["seq"] for event in store.query(after_seq=after_seq, limit=limit, **filters)]
+        assert got == expected, (filters, after_seq, limit)
+
+
+def test_restart_from_archive_continues_the_seq(tmp_path):
+    db = str(tmp_path / "events.db")
+    store = small_store(tmp_path, archive=SQLiteEventArchive(db, batch_interval=0.01))
+    for first in range(0, 300, 100):
+        store.append(make_events(100, first))
+    store.close() # Flushes the writer
+
+    store = small_store(tmp_path, archive=SQLiteEventArchive(db, batch_interval=0.01))
+    try:
+        assert store.last_seq == 300
+        assert [event["seq"] for event in store.read_events(0, 300)] == list(range(1, 301))
+        store.append([{"ship_id": 99}])
+        assert store.last_seq == 301
+        assert [event["seq"] for event in store.query(ship_id=99)] == [301]
+        with pytest.raises(LogBatchTooLarge):
+            store.append([{"ship_id": 1}] * (store.max_memory_events + 1))
+        assert store.last_seq == 301
+    finally:
+        store.close()
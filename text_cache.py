@@ -0,0 +1,50 @@
+# text_cache.py
+import collections # For OrderedDict
+
+
+class TextCache:
+    """
+    Bounded LRU cache of rendered text surfaces, keyed by (font, text, colour, antialias).
+    Most UI text is identical from frame to frame, so font.render only runs when a string changes.
+    Returned surfaces are shared: blit them, never draw onto them.
+    """
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._surfaces = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def render(self, font, text, color, antialias=True):
+        key = (font, text, tuple(color), antialias)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self._surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.max_entries:
+            self._surfaces.popitem(last=False) # Least recently used
+            self.evictions += 1
+        return surface
+
+    def clear(self):
+        self._surfaces.clear()
+
+    def get_stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._surfaces),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def format_stats(self):
+        stats = self.get_stats()
+        return (f"Text cache: {stats['entries']} entries, {stats['hits']} hits, {stats['misses']} misses, "
+                f"{stats['evictions']} evicted ({stats['hit_rate']:.0%} hit rate)")
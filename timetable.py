@@ -0,0 +1,110 @@
+# timetable.py
+# Sorted index behind the "Active Ships on Ocean" table.
+import bisect # For the sorted row index
+
+from port_engine import ZONE_PARKED, ZONE_RED, ZONE_DARK_GREEN, ZONE_LIGHT_GREEN, ZONE_OPEN_SEA
+
+SORT_KEYS = ("name", "zone", "arrival") # Cycled by the table's sort button
+ZONE_ORDER = {zone: rank for rank, zone in enumerate((ZONE_PARKED, ZONE_RED, ZONE_DARK_GREEN, ZONE_LIGHT_GREEN, ZONE_OPEN_SEA))}
+
+
+def timetable_row(ship):
+    return f"ID:{ship.ship_id} {ship.name} (Zone: {ship.current_zone})"
+
+
+class TimetableIndex:
+    """
+    Active ships kept sorted by the current sort key, with each ship's row text cached.
+    update() is called when a ship is spawned, renamed, moved to another zone or given a new
+    arrival time; only that ship's entry moves (bisect), so drawing a page is a slice.
+    Zone order runs from the port outwards (Parked first).
+    """
+    def __init__(self, page_size=5, sort_key="name"):
+        self.page_size = page_size
+        self.sort_key = sort_key
+        self.scroll = 0 # Index of the first row shown
+        self.version = 0 # Bumped on every change that affects the visible page
+        self._ships = {} # ship_id -> ship
+        self._keys = {} # ship_id -> its entry in _order
+        self._order = [] # Sorted (sort key..., ship_id)
+        self._rows = {} # ship_id -> cached row text
+
+    def __len__(self):
+        return len(self._order)
+
+    def _key(self, ship):
+        if self.sort_key == "zone":
+            return (ZONE_ORDER.get(ship.current_zone, len(ZONE_ORDER)), ship.name, ship.ship_id)
+        if self.sort_key == "arrival":
+            return (ship.arrival_time, ship.name, ship.ship_id)
+        return (ship.name, ship.ship_id)
+
+    # --- Changes ---
+    def update(self, ship):
+        """Adds the ship or re-files it after a change to its name, zone or arrival time."""
+        key = self._key(ship)
+        row = timetable_row(ship)
+        old_key = self._keys.get(ship.ship_id)
+        if old_key == key and self._rows.get(ship.ship_id) == row:
+            return
+        if old_key is not None:
+            del self._order[bisect.bisect_left(self._order, old_key)]
+        bisect.insort(self._order, key)
+        self._ships[ship.ship_id] = ship
+        self._keys[ship.ship_id] = key
+        self._rows[ship.ship_id] = row
+        self.version += 1
+
+    def remove(self, ship_id):
+        key = self._keys.pop(ship_id, None)
+        if key is None:
+            return
+        del self._order[bisect.bisect_left(self._order, key)]
+        del self._ships[ship_id]
+        del self._rows[ship_id]
+        self.scroll_to(self.scroll)
+        self.version += 1
+
+    def set_sort_key(self, sort_key):
+        if sort_key not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key {sort_key!r}; expected one of {SORT_KEYS}")
+        self.sort_key = sort_key
+        self._keys = {ship_id: self._key(ship) for ship_id, ship in self._ships.items()}
+        self._order = sorted(self._keys.values())
+        self.scroll = 0
+        self.version += 1
+
+    def next_sort_key(self):
+        """Switches to the next of SORT_KEYS (for the sort button)."""
+        self.set_sort_key(SORT_KEYS[(SORT_KEYS.index(self.sort_key) + 1) % len(SORT_KEYS)])
+        return True
+
+    # --- Scrolling ---
+    def scroll_to(self, first):
+        max_scroll = max(0, len(self._order) - self.page_size)
+        new_scroll = max(0, min(first, max_scroll))
+        if new_scroll != self.scroll:
+            self.scroll = new_scroll
+            self.version += 1
+
+    def scroll_by(self, rows):
+        self.scroll_to(self.scroll + rows)
+        return True
+
+    def page_up(self):
+        return self.scroll_by(-self.page_size)
+
+    def page_down(self):
+        return self.scroll_by(self.page_size)
+
+    # --- Reading ---
+    def visible_rows(self):
+        """Row text for the current page."""
+        return [self._rows[key[-1]] for key in self._order[self.scroll:self.scroll + self.page_size]]
+
+    def page_label(self):
+        """Compact position in the list, e.g. "6-10/42"."""
+        if not self._order:
+            return "0/0"
+        last = min(self.scroll + self.page_size, len(self._order))
+        return f"{self.scroll + 1}-{last}/{len(self._order)}"